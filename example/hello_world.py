@@ -138,9 +138,13 @@ def generate_and_run_with_fl(sut, initial, environment, number_of_missions):
     print("DONE")
     print(report)
     print(mission_generator.coverage)
-    print(mission_generator.report_fault_localization())
+    from houston.localization import tarantula
+    spectrum = mission_generator.report_fault_localization()
+    suspicious = spectrum.most_suspicious(tarantula, 10)
+    print(str(suspicious))
     with open("fl.json", "w") as f:
-        f.write(str(mission_generator.report_fault_localization()))
+        json.dump([{'line': str(line), 'score': score}
+                   for (line, score) in suspicious], f)
 
 
 ### Generate missions with symbolic execution
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+This script builds a persistent index from source lines to the missions that
+cover them, using a directory of coverage-enabled trace files (i.e., traces
+produced by build_traces.py using the --coverage flag).
+"""
+from typing import List
+import argparse
+import logging
+import sys
+import os
+
+from houston.coverage import MissionCoverageIndex
+
+from compare_traces import load_file as load_traces_file
+
+logger = logging.getLogger('houston')  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+DESCRIPTION = "Builds a coverage index for a directory of trace files."
+
+COVERAGE_INDEX_OUTPUT = "coverage_index.json"
+
+
+def setup_logging(verbose: bool = False) -> None:
+    log_to_stdout = logging.StreamHandler()
+    log_to_stdout.setLevel(logging.DEBUG if verbose else logging.INFO)
+    logging.getLogger('houston').addHandler(log_to_stdout)
+    logging.getLogger('experiment').addHandler(log_to_stdout)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description=DESCRIPTION)
+    p.add_argument('traces', type=str,
+                   help='path to a directory of coverage-enabled traces.')
+    p.add_argument('--output', type=str,
+                   help='the file to which the index should be written.')
+    p.add_argument('--verbose', action='store_true',
+                   help='increases logging verbosity')
+    return p.parse_args()
+
+
+def build_coverage_index(trace_filenames: List[str]) -> MissionCoverageIndex:
+    """
+    Builds a coverage index from a list of trace files. Missions whose traces
+    do not contain coverage information are omitted from the index.
+    """
+    index = MissionCoverageIndex()
+    for fn in trace_filenames:
+        mission, traces = load_traces_file(fn)
+        digest = mission.digest()
+        num_covered = 0
+        for trace in traces:
+            coverage = trace.coverage_bitset(index.index)
+            if coverage is not None:
+                index.add(digest, coverage)
+                num_covered += 1
+        if num_covered == 0:
+            logger.warning("no coverage found in trace file: %s", fn)
+    return index
+
+
+def main():
+    args = parse_args()
+    setup_logging(verbose=args.verbose)
+    dir_traces = args.traces
+    fn_output = args.output
+    if not fn_output:
+        fn_output = os.path.join(dir_traces, COVERAGE_INDEX_OUTPUT)
+
+    if not os.path.exists(dir_traces):
+        logger.error("trace directory not found: %s", dir_traces)
+        sys.exit(1)
+
+    trace_filenames = [os.path.join(dir_traces, fn)
+                       for fn in os.listdir(dir_traces)
+                       if fn.endswith('.json') and fn != COVERAGE_INDEX_OUTPUT]
+    index = build_coverage_index(trace_filenames)
+    logger.info("indexed %d missions covering %d lines",
+                len(index), len(index.index))
+    index.to_file(fn_output)
+    logger.info("saved coverage index to disk: %s", fn_output)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@
 This script is used to record execution traces for each mission within a
 provided mission suite file.
 """
-from typing import List, Iterator, Callable, Dict, Any
+from typing import List, Iterator, Callable, Dict, Any, Optional
 import os
 import argparse
 import concurrent.futures
@@ -11,14 +11,17 @@ import json
 import logging
 import contextlib
 import functools
+import attr
 import signal, psutil
 
 import bugzoo
 import bugzoo.server
 import houston
 from houston.exceptions import ConnectionLostError, NoConnectionError
+from houston.timeouts import TimeoutModel, set_timeout_model
 
 import settings
+from mutant_builder import install_binary
 
 logger = logging.getLogger('houston')  # type: logging.Logger
 logger.setLevel(logging.DEBUG)
@@ -61,8 +64,12 @@ def parse_args():
                    help='increases logging verbosity')
     p.add_argument('--coverage', action='store_true',
                    help='includes coverage information with each trace.')
+    p.add_argument('--tlog', action='store_true',
+                   help='captures the raw MAVLink messages for each trace.')
     p.add_argument('--repeats', type=int, default=1,
                    help='number of traces to generate for each mission.')
+    p.add_argument('--timeouts', type=str,
+                   help='a learned timeout model (see fit_timeouts.py).')
     p.add_argument('--threads', type=int, default=1,
                    help='number of threads to use when building trace files.')
     return p.parse_args()
@@ -73,7 +80,8 @@ def trace(index: int,
           jsn_mission: Dict[str, Any],
           num_repeats: int,
           dir_output: str,
-          collect_coverage: bool
+          collect_coverage: bool,
+          capture_tlog: bool = False
           ) -> None:
     mission = houston.Mission.from_dict(json.loads(jsn_mission))
 
@@ -88,9 +96,21 @@ def trace(index: int,
 
     try:
         traces = []  # List[MissionTrace]
-        for _ in range(num_repeats):
+        for i in range(num_repeats):
+            # tlogs are stored alongside (and relative to) the trace file
+            fn_tlog = None  # type: Optional[str]
+            if capture_tlog:
+                fn_tlog = "{}.{}.tlog".format(uid, i)
             with sandbox_factory() as sandbox:
-                t = sandbox.run_and_trace(mission.commands, collect_coverage)
+                if fn_tlog:
+                    fn_tlog_abs = os.path.join(dir_output, fn_tlog)
+                    t = sandbox.run_and_trace(mission.commands,
+                                              collect_coverage,
+                                              fn_tlog_abs)
+                    t = attr.evolve(t, tlog=fn_tlog)
+                else:
+                    t = sandbox.run_and_trace(mission.commands,
+                                              collect_coverage)
                 traces.append(t)
 
         logger.debug("saving traces to file: %s", filename)
@@ -111,12 +131,20 @@ def trace(index: int,
 @contextlib.contextmanager
 def build_sandbox(client_bugzoo: bugzoo.Client,
                   snapshot: bugzoo.Bug,
-                  jsn_mission: str
+                  jsn_mission: str,
+                  fn_binary: Optional[str] = None
                   ) -> Iterator[houston.Sandbox]:
+    """
+    Provisions a container for a given snapshot and launches a sandbox for
+    a mission inside it. If a binary is provided, it is copied into the
+    container (replacing the snapshot's binary) before the SITL is launched.
+    """
     mission = houston.Mission.from_dict(json.loads(jsn_mission))
     container = None  # type: Optional[bugzoo.Container]
     try:
         container = client_bugzoo.containers.provision(snapshot)
+        if fn_binary:
+            install_binary(container, fn_binary)
         sandbox_cls = mission.system.sandbox
         with sandbox_cls.for_container(client_bugzoo,
                                        container,
@@ -135,7 +163,8 @@ def build_traces(client_bugzoo: bugzoo.Client,
                  num_threads: int,
                  num_repeats: int,
                  dir_output: str,
-                 collect_coverage: bool
+                 collect_coverage: bool,
+                 capture_tlog: bool = False
                  ) -> None:
     futures = []
     with concurrent.futures.ProcessPoolExecutor(num_threads) as e:
@@ -152,7 +181,8 @@ def build_traces(client_bugzoo: bugzoo.Client,
                                   jsn_mission,
                                   num_repeats,
                                   dir_output,
-                                  collect_coverage)
+                                  collect_coverage,
+                                  capture_tlog)
                 futures.append(future)
 
             logger.debug("submitted all missions")
@@ -186,10 +216,13 @@ if __name__ == '__main__':
 
     os.makedirs(args.output, exist_ok=True)
 
+    if args.timeouts:
+        set_timeout_model(TimeoutModel.from_file(args.timeouts))
+
     with open(fn_missions, 'r') as f:
         jsn = json.load(f)
     jsn_missions = [json.dumps(m) for m in jsn]
 
     with bugzoo.server.ephemeral() as client_bugzoo:
         snapshot = client_bugzoo.bugs[args.snapshot]
-        build_traces(client_bugzoo, snapshot, jsn_missions, num_threads, num_repeats, args.output, collect_coverage)
+        build_traces(client_bugzoo, snapshot, jsn_missions, num_threads, num_repeats, args.output, collect_coverage, args.tlog)
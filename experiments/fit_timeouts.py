@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+This script fits a timeout model (see houston.timeouts) to the times taken
+by each command to satisfy its specification within a directory of trace
+files, and writes that model to disk, where it may be passed to
+build_traces.py using the --timeouts flag.
+"""
+from typing import List
+import concurrent.futures
+import argparse
+import logging
+import sys
+import os
+
+import houston
+from houston.timeouts import TimeoutModel, TimeoutSample, samples_from_trace
+
+from compare_traces import load_file as load_traces_file
+
+logger = logging.getLogger('houston')  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+DESCRIPTION = "Fits a timeout model to a corpus of traces."
+
+
+def setup_logging(verbose: bool = False) -> None:
+    log_to_stdout = logging.StreamHandler()
+    log_to_stdout.setLevel(logging.DEBUG if verbose else logging.INFO)
+    formatter = logging.Formatter('%(processName)s - %(message)s')
+    log_to_stdout.setFormatter(formatter)
+    logging.getLogger('houston').addHandler(log_to_stdout)
+    logging.getLogger('experiment').addHandler(log_to_stdout)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description=DESCRIPTION)
+    p.add_argument('traces', type=str,
+                   help='path to a directory of trace files.')
+    p.add_argument('output', type=str,
+                   help='the file to which the model should be written.')
+    p.add_argument('--quantile', type=float, default=0.99,
+                   help='the quantile of durations covered by each timeout.')
+    p.add_argument('--margin', type=float, default=1.2,
+                   help='the factor by which each timeout is multiplied.')
+    p.add_argument('--min-samples', type=int, default=10,
+                   help='the minimum number of samples for each command and specification.')  # noqa: pycodestyle
+    p.add_argument('--threads', type=int, default=1,
+                   help='number of processes to use when reading traces.')
+    p.add_argument('--verbose', action='store_true',
+                   help='increases logging verbosity')
+    return p.parse_args()
+
+
+def samples_from_file(fn_trace: str) -> List[TimeoutSample]:
+    mission, traces = load_traces_file(fn_trace)
+    return [s for trace in traces for s in samples_from_trace(mission, trace)]
+
+
+def collect_samples(trace_filenames: List[str],
+                    num_workers: int = 1
+                    ) -> List[TimeoutSample]:
+    """
+    Collects the samples within a list of trace files using a pool of
+    processes.
+    """
+    samples = []  # type: List[TimeoutSample]
+    with concurrent.futures.ProcessPoolExecutor(num_workers) as e:
+        futures = {e.submit(samples_from_file, fn): fn
+                   for fn in trace_filenames}
+        for future in concurrent.futures.as_completed(futures):
+            fn = futures[future]
+            try:
+                samples += future.result()
+            except Exception:
+                logger.exception("failed to read trace file: %s", fn)
+    return samples
+
+
+def main():
+    args = parse_args()
+    setup_logging(verbose=args.verbose)
+    dir_traces = args.traces
+    if not os.path.exists(dir_traces):
+        logger.error("trace directory not found: %s", dir_traces)
+        sys.exit(1)
+
+    trace_filenames = [os.path.join(dir_traces, fn)
+                       for fn in os.listdir(dir_traces)
+                       if fn.endswith('.json')]
+    samples = collect_samples(trace_filenames, args.threads)
+    logger.info("collected %d samples from %d trace files",
+                len(samples), len(trace_filenames))
+
+    model = TimeoutModel.fit(samples,
+                             quantile=args.quantile,
+                             margin=args.margin,
+                             min_samples=args.min_samples)
+    model.to_file(args.output)
+    logger.info("saved timeout model to disk: %s", args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+from typing import Optional
 import json
 import logging
 import argparse
@@ -7,6 +8,7 @@ import random
 from houston.mission import Mission
 from houston.generator.rand import RandomMissionGenerator
 from houston.generator.resources import ResourceLimits
+from houston.generator.shard import generate_sharded
 
 from settings import sut, initial, environment, build_config
 
@@ -32,6 +34,14 @@ def parse_args():
     parser.add_argument('--output', action='store', type=str,
                         default='missions.json',
                         help='the file where the results will be stored')
+    parser.add_argument('--shards', action='store', type=str,
+                        help='generates missions in shards, written to JSONL files in the given directory, rather than to a single file.')
+    parser.add_argument('--shard-size', action='store', type=int,
+                        default=10000,
+                        help='the number of missions in each shard.')
+    parser.add_argument('--workers', action='store', type=int,
+                        default=1,
+                        help='the number of processes used to generate shards.')
     return parser.parse_args()
 
 
@@ -39,13 +49,22 @@ def generate(num_missions: int,
              max_num_commands: int,
              seed: int,
              output_file: str,
-             speedup: int
+             speedup: int,
+             dir_shards: Optional[str] = None,
+             shard_size: int = 10000,
+             num_workers: int = 1
              ) -> None:
     random.seed(seed)
     config = build_config(speedup)
     mission_generator = RandomMissionGenerator(sut, initial, environment, config, max_num_commands=max_num_commands)
+    if dir_shards:
+        # the resulting missions do not depend on the number of workers
+        generate_sharded(mission_generator, seed, num_missions, dir_shards,
+                         shard_size=shard_size, workers=num_workers)
+        return
+
     resource_limits = ResourceLimits(num_missions)
-    missions = mission_generator.generate(None, resource_limits)
+    missions = mission_generator.generate(seed, resource_limits)
     with open(output_file, "w") as f:
         mission_descriptions = list(map(Mission.to_dict, missions))
         json.dump(mission_descriptions, f, indent=2)
@@ -58,4 +77,7 @@ if __name__ == "__main__":
              max_num_commands=args.max_num_commands,
              seed=args.seed,
              output_file=args.output,
-             speedup=args.speedup)
+             speedup=args.speedup,
+             dir_shards=args.shards,
+             shard_size=args.shard_size,
+             num_workers=args.workers)
@@ -1,21 +1,16 @@
 from typing import Iterator, Tuple, Set, List, Dict, Any, Optional, Type
 from uuid import UUID, uuid4
-import concurrent.futures
 import argparse
 import functools
 import contextlib
-import attr
 import logging
 import json
 import sys
 import os
-import signal
-import psutil
-import time
 import hashlib
+import threading
 
 from ruamel.yaml import YAML
-from ruamel.yaml.scalarstring import PreservedScalarString
 import yaml
 import bugzoo
 import houston
@@ -24,12 +19,17 @@ from bugzoo import BugZoo as BugZooDaemon
 from houston import System
 from houston.mission import Mission
 from houston.trace import CommandTrace, MissionTrace
+from houston.coverage import MissionCoverageIndex, lines_modified_by_diff
+from houston.metrics import CampaignMetrics, get_metrics, set_metrics, \
+    serve_metrics
 from houston.ardu.copter import ArduCopter
 
 from compare_traces import load_file as load_traces_file
 from compare_traces import matches_ground_truth
 from build_traces import build_sandbox
 from filter_truth import filter_truth_traces, VALID_LIST_OUTPUT
+from mutant_builder import MutantBuilderPool, FailedToBuildMutant
+from mutant_pipeline import DatabaseEntry, MutantPipeline
 
 logger = logging.getLogger('houston')  # type: logging.Logger
 logger.setLevel(logging.DEBUG)
@@ -44,34 +44,6 @@ class FailedToCreateMutantSnapshot(houston.exceptions.HoustonException):
     """
 
 
-@attr.s
-class DatabaseEntry(object):
-    diff = attr.ib(type=str)
-    fn_inconsistent_traces = attr.ib(type=Tuple[Tuple[str, str], ...])
-    fn_consistent_traces = attr.ib(type=Tuple[Tuple[str, str], ...])
-
-    def to_dict(self) -> Dict[str, Any]:
-        return {'diff': PreservedScalarString(self.diff),
-                'inconsistent':  [{'oracle': o,
-                                   'trace': t} for o, t in self.fn_inconsistent_traces],
-                'consistent':  [{'oracle': o,
-                                 'trace': t} for o, t in self.fn_consistent_traces]
-                }
-
-
-def kill_child_processes(parent_pid, sig=signal.SIGTERM):
-    try:
-        parent = psutil.Process(parent_pid)
-    except psutil.NoSuchProcess:
-        return
-    children = parent.children(recursive=True)
-    for process in children:
-        if process.name() != "python":
-            continue
-        logger.debug("killing process %d", process.pid)
-        process.send_signal(sig)
-
-
 def setup_logging(verbose: bool = False) -> None:
     log_to_stdout = logging.StreamHandler()
     log_to_stdout.setLevel(logging.DEBUG if verbose else logging.INFO)
@@ -91,10 +63,35 @@ def parse_args():
     p.add_argument('--verbose', action='store_true',
                    help='increases logging verbosity')
     p.add_argument('--threads', type=int, default=1,
-                   help='number of threads to use when building trace files.')
+                   help='the maximum number of containers that may be used at once.')
+    p.add_argument('--max-live-mutants', type=int,
+                   help='the maximum number of mutants that may be built at once (defaults to the number of threads).')
+    p.add_argument('--stop-on-detect', action='store_true',
+                   help='stops evaluating a mutant once a mission has detected it.')
+    p.add_argument('--incremental', action='store_true',
+                   help='builds mutants incrementally in warm build containers (one per worker, at most) rather than creating an image for each mutant.')
+    p.add_argument('--coverage-index', type=str,
+                   help='path to a coverage index (see build_coverage_index.py) used to skip missions that do not reach the mutated lines.')
+    p.add_argument('--metrics-port', type=int,
+                   help='serves live metrics, in the Prometheus text format, at /metrics on the given port.')
     return p.parse_args()
 
 
+def select_traces(index: MissionCoverageIndex,
+                  trace_digests: Dict[str, str],
+                  diff: str
+                  ) -> List[str]:
+    """
+    Selects the oracle traces whose missions execute at least one of the lines
+    modified by a given mutant. Missions that are absent from the coverage
+    index are conservatively retained.
+    """
+    modified = lines_modified_by_diff(diff)
+    covering = index.missions_covering(modified)
+    return [fn for (fn, digest) in trace_digests.items()
+            if digest not in index or digest in covering]
+
+
 @contextlib.contextmanager
 def build_mutant_snapshot(bz: BugZooClient,
                           snapshot: bugzoo.Bug,
@@ -152,75 +149,98 @@ def build_mutant_snapshot(bz: BugZooClient,
             bz.docker.delete_image(name_image)
 
 
-def process_mutation(system: Type[System],
-                     client_bugzoo: BugZooClient,
-                     snapshot_orig: bugzoo.Bug,
-                     trace_filenames: List[str],
-                     dir_mutant_traces: str,
-                     diff: str
-                     ) -> Optional[DatabaseEntry]:
-    bz = client_bugzoo
-    sandbox_cls = system.sandbox
+@contextlib.contextmanager
+def prepare_mutant(client_bugzoo: BugZooClient,
+                   snapshot: bugzoo.Bug,
+                   builders: Optional[MutantBuilderPool],
+                   diff: str
+                   ) -> Iterator[Tuple[bugzoo.Bug, Optional[str]]]:
+    """
+    Prepares a mutant for execution, yielding the snapshot that should be used
+    to provision its sandboxes, and (if a pool of builders is given, for
+    incremental builds) the mutant binary that should be installed into those
+    sandboxes.
+    """
+    if builders:
+        with builders.mutant(diff) as fn_binary:
+            yield snapshot, fn_binary
+    else:
+        with build_mutant_snapshot(client_bugzoo, snapshot, diff) as mutant:
+            yield mutant, None
 
-    inconsistent_results = []
-    consistent_results = []
 
-    # build an ephemeral image for the mutant
-    try:
-        with build_mutant_snapshot(client_bugzoo, snapshot_orig, diff) as snapshot:
-            def obtain_trace(mission: houston.Mission) -> MissionTrace:
-                jsn_mission = json.dumps(mission.to_dict())  # FIXME hack
-                with build_sandbox(client_bugzoo, snapshot, jsn_mission) as sandbox:
-                    return sandbox.run_and_trace(mission.commands)
-
-            for fn_trace in trace_filenames:
-                logger.debug("evaluating oracle trace: %s", fn_trace)
-                mission, oracle_traces = load_traces_file(fn_trace)
-
-                # write mutant trace to file
-                h = hashlib.sha256()
-                h.update(diff.encode())
-                h.update(fn_trace.encode())
-                identifier = h.hexdigest()
-                logger.debug("id %s", identifier)
-                fn_trace_mut_rel = "{}.json".format(identifier)
-                fn_trace_mut = os.path.join(dir_mutant_traces, fn_trace_mut_rel)
- 
-                try:
-                    if os.path.exists(fn_trace_mut):
-                        logger.info("Already evaluated! %s", fn_trace_mut_rel)
-                        _, trace_mutant = load_traces_file(fn_trace_mut)
-                    else:
-                        trace_mutant = obtain_trace(mission)
-                        jsn = {'mission': mission.to_dict(),
-                               'traces': [trace_mutant.to_dict()]}
-                        with open(fn_trace_mut, 'w') as f:
-                            json.dump(jsn, f)
-                except:
-                    logger.exception("failed to build trace %s for mutant: %s", fn_trace, diff)
-                    continue
-                try:
-                    if not matches_ground_truth(trace_mutant, oracle_traces):
-                        logger.info("found an acceptable mutant!")
-                        inconsistent_results.append((fn_trace, fn_trace_mut))
-                    else:
-                        logger.debug("mutant is not sufficiently different for given mission.")
-                        consistent_results.append((fn_trace, fn_trace_mut))
-                except houston.exceptions.HoustonException as e:
-                    logger.exception("failed to check matching of traces %s", e)
-                    continue
-
-    except FailedToCreateMutantSnapshot:
-        logger.error("failed to build snapshot for mutant: %s", diff)
-    except Exception:
-        logger.exception("failed to obtain data for mutant: %s", diff)
-    except (houston.exceptions.NoConnectionError, houston.exceptions.ConnectionLostError):
-        logger.error("mutant resulted in crash")
-    finally:
-        if inconsistent_results or consistent_results:
-            return DatabaseEntry(diff, tuple(inconsistent_results), tuple(consistent_results))
-        else:
-            return None
+def evaluate_mission(client_bugzoo: BugZooClient,
+                     dir_mutant_traces: str,
+                     mutant: Tuple[bugzoo.Bug, Optional[str]],
+                     diff: str,
+                     fn_trace: str
+                     ) -> Tuple[str, bool]:
+    """
+    Obtains a trace for a built mutant using the mission from a given oracle
+    trace file, and determines whether that trace is inconsistent with the
+    oracle. Returns the name of the mutant trace file, relative to the
+    output directory, together with the result of that check.
+    """
+    snapshot, fn_binary = mutant
+    logger.debug("evaluating oracle trace: %s", fn_trace)
+    mission, oracle_traces = load_traces_file(fn_trace)
+
+    # write mutant trace to file
+    h = hashlib.sha256()
+    h.update(diff.encode())
+    h.update(fn_trace.encode())
+    identifier = h.hexdigest()
+    logger.debug("id %s", identifier)
+    fn_trace_mut_rel = "{}.json".format(identifier)
+    fn_trace_mut = os.path.join(dir_mutant_traces, fn_trace_mut_rel)
+
+    if os.path.exists(fn_trace_mut):
+        logger.info("Already evaluated! %s", fn_trace_mut_rel)
+        _, trace_mutant = load_traces_file(fn_trace_mut)
+    else:
+        metrics = get_metrics()
+        if metrics:
+            metrics.missions_started.inc()
+        jsn_mission = json.dumps(mission.to_dict())  # FIXME hack
+        try:
+            with build_sandbox(client_bugzoo, snapshot, jsn_mission, fn_binary) as sandbox:
+                trace_mutant = sandbox.run_and_trace(mission.commands)
+        except Exception:
+            if metrics:
+                metrics.missions_crashed.inc()
+            raise
+        if metrics:
+            metrics.missions_completed.inc()
+            if trace_mutant.abort:
+                metrics.missions_failed.inc()
+        jsn = {'mission': mission.to_dict(),
+               'traces': [trace_mutant.to_dict()]}
+        with open(fn_trace_mut, 'w') as f:
+            json.dump(jsn, f)
+
+    inconsistent = not matches_ground_truth(trace_mutant, oracle_traces)
+    if not inconsistent:
+        logger.debug("mutant is not sufficiently different for given mission.")
+    return fn_trace_mut, inconsistent
+
+
+def save_database(fn_output_database: str,
+                  dir_oracle: str,
+                  name_snapshot: str,
+                  db_entries: List[DatabaseEntry]
+                  ) -> None:
+    """
+    Atomically writes the ground truth dataset to disk.
+    """
+    jsn = {
+        'oracle-directory': dir_oracle,
+        'snapshot': name_snapshot,
+        'entries': [e.to_dict() for e in db_entries]
+    }
+    fn_temp = "{}.tmp".format(fn_output_database)
+    with open(fn_temp, 'w') as f:
+        YAML().dump(jsn, f)
+    os.replace(fn_temp, fn_output_database)
 
 
 def main():
@@ -267,60 +287,101 @@ def main():
     trace_filenames = [os.path.join(dir_oracle, fn) for fn in trace_filenames]
     logger.info("Total number of %d valid truth", len(trace_filenames))
 
-    db_entries = []  # type: List[DatabaseEntry]
-    futures = []
-    with bugzoo.server.ephemeral() as client_bugzoo:
-        with concurrent.futures.ProcessPoolExecutor(max_workers=num_threads) as executor:
-            try:
-                snapshot = client_bugzoo.bugs[name_snapshot]
-                process = functools.partial(process_mutation,
-                                            system,
-                                            client_bugzoo,
-                                            snapshot,
-                                            trace_filenames,
-                                            dir_output)
-                for diff in diffs:
-                    future = executor.submit(process, diff)
-                    futures.append(future)
-
-                for future in concurrent.futures.as_completed(futures):
-                    entry = future.result()
-                    if entry:
-                        db_entries.append(entry)
-            except (KeyboardInterrupt, SystemExit):
-                logger.info("Received keyboard interrupt. Shutting down...")
-                for fut in futures:
-                    logger.debug("Cancelling: %s", fut)
-                    fut.cancel()
-                    logger.debug("Cancelled: %s", fut.cancelled())
-                logger.info("Shutting down the process pool")
-                executor.shutdown(wait=False)
-                kill_child_processes(os.getpid())
-                logger.info("Cancelled all jobs and shutdown executor.")
-                time.sleep(5)
-                client_bugzoo.containers.clear()
-                logger.info("Killed all containers")
-                logger.info("Removing all images")
-                bug_names = [b for b in client_bugzoo.bugs if 'houston-mutant' in b]
-                for b in bug_names:
-                    logger.debug("Removing image %s", b)
-                    del client_bugzoo.bugs[b]
-                    if client_bugzoo.docker.has_image(b):
-                        client_bugzoo.docker.delete_image(b)
-
-                logger.debug("Removed all images")
+    # load the coverage index, if provided, and find the digest of the
+    # mission for each oracle trace
+    coverage_index = None  # type: Optional[MissionCoverageIndex]
+    trace_digests = {}  # type: Dict[str, str]
+    if args.coverage_index:
+        coverage_index = MissionCoverageIndex.from_file(args.coverage_index)
+        logger.info("loaded coverage index for %d missions",
+                    len(coverage_index))
+        for fn in trace_filenames:
+            mission, _ = load_traces_file(fn)
+            trace_digests[fn] = mission.digest()
+
+    # determine which missions should be used to evaluate each mutant
+    mutants = []  # type: List[Tuple[str, List[str]]]
+    for diff in diffs:
+        if coverage_index:
+            selected = select_traces(coverage_index, trace_digests, diff)
+            logger.info("selected %d of %d missions for mutant",
+                        len(selected), len(trace_filenames))
+        else:
+            selected = trace_filenames
+        if selected:
+            mutants.append((diff, selected))
+
+    # each worker uses at most one container at a time: either a sandbox or,
+    # for incremental builds, one of the warm build containers. since builds
+    # are performed by workers, at most one builder per worker (or per live
+    # mutant, if fewer) is ever needed.
+    num_containers = num_threads
+    num_builders = min(num_threads, args.max_live_mutants or num_threads)
+
+    with contextlib.ExitStack() as stack:
+        client_bugzoo = stack.enter_context(bugzoo.server.ephemeral())
+        snapshot = client_bugzoo.bugs[name_snapshot]
+        builders = None  # type: Optional[MutantBuilderPool]
+        if args.incremental:
+            builders = MutantBuilderPool(client_bugzoo, snapshot, num_builders)
+            stack.enter_context(builders)
+        prepare = functools.partial(prepare_mutant,
+                                    client_bugzoo,
+                                    snapshot,
+                                    builders)
+        evaluate = functools.partial(evaluate_mission,
+                                     client_bugzoo,
+                                     dir_output)
+        db_entries = []  # type: List[DatabaseEntry]
+        db_lock = threading.Lock()
+
+        # write each entry to disk as soon as it is produced
+        def on_entry(entry: DatabaseEntry) -> None:
+            with db_lock:
+                db_entries.append(entry)
+                save_database(fn_output_database,
+                              dir_oracle,
+                              name_snapshot,
+                              db_entries)
+
+        pipeline = MutantPipeline(prepare,
+                                  evaluate,
+                                  num_containers=num_containers,
+                                  max_live_mutants=args.max_live_mutants,
+                                  stop_on_detect=args.stop_on_detect,
+                                  on_entry=on_entry)
+
+        metrics_server = None
+        if args.metrics_port is not None:
+            metrics = CampaignMetrics()
+            metrics.queue_depth.set_function(lambda: pipeline.queue_depth)
+            set_metrics(metrics)
+            metrics_server = serve_metrics(metrics, port=args.metrics_port)
 
+        try:
+            pipeline.run(mutants)
+        except (KeyboardInterrupt, SystemExit):
+            logger.info("Received keyboard interrupt. Shutting down...")
+            pipeline.stop()
+            client_bugzoo.containers.clear()
+            logger.info("Killed all containers")
+            logger.info("Removing all images")
+            bug_names = [b for b in client_bugzoo.bugs if 'houston-mutant' in b]
+            for b in bug_names:
+                logger.debug("Removing image %s", b)
+                del client_bugzoo.bugs[b]
+                if client_bugzoo.docker.has_image(b):
+                    client_bugzoo.docker.delete_image(b)
+            logger.debug("Removed all images")
+        finally:
+            if metrics_server:
+                metrics_server.stop()
 
     # save to disk
     logger.info("finished constructing evaluation dataset.")
     logger.debug("saving evaluation dataset to disk.")
-    jsn = {
-        'oracle-directory': dir_oracle,
-        'snapshot': name_snapshot,
-        'entries': [e.to_dict() for e in db_entries]
-    }
-    with open(fn_output_database, 'w') as f:
-        YAML().dump(jsn, f)
+    with db_lock:
+        save_database(fn_output_database, dir_oracle, name_snapshot, db_entries)
     logger.info("saved evaluation dataset to disk")
 
 
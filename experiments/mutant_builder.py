@@ -0,0 +1,301 @@
+"""
+Provides a service for building mutants incrementally within long-lived
+build containers, and for installing the resulting binaries into
+sandbox containers provisioned from the original snapshot.
+
+Rather than provisioning a fresh container, rebuilding ArduPilot from scratch
+and committing a new Docker image for every mutant, the builder keeps a warm
+build tree (including waf's build state and ccache's cache). For each mutant,
+it applies the diff, rebuilds only those objects that are affected by the
+change, extracts the binary, and restores the original source files.
+"""
+__all__ = ['MutantBuilder', 'MutantBuilderPool', 'FailedToBuildMutant',
+           'install_binary']
+
+from typing import Dict, Iterator, List, Optional
+import contextlib
+import hashlib
+import io
+import os
+import queue
+import tarfile
+import tempfile
+import threading
+import logging
+
+import docker
+import bugzoo
+from bugzoo import Client as BugZooClient
+from bugzoo.core.container import Container
+
+import houston
+
+logger = logging.getLogger('houston')  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+FN_BINARY = '/opt/ardupilot/build/sitl/bin/arducopter'
+
+# waf only recompiles objects whose (hashed) inputs have changed, and ccache
+# allows restored source files to reuse previously-compiled objects.
+CMD_BUILD = ' && '.join([
+    'source /.environment',
+    'export CCACHE_DIR=/tmp/ccache',
+    'cd /opt/ardupilot',
+    './waf copter'])
+
+
+# the Docker API client that is shared by all builders
+_DOCKER_API = None  # type: Optional[docker.APIClient]
+_DOCKER_API_LOCK = threading.Lock()
+
+
+class FailedToBuildMutant(houston.exceptions.HoustonException):
+    """
+    Thrown when the build service fails to patch or build a mutant.
+    """
+
+
+def _docker_api() -> docker.APIClient:
+    """
+    Returns the shared Docker API client, creating it if necessary.
+    """
+    global _DOCKER_API
+    with _DOCKER_API_LOCK:
+        if _DOCKER_API is None:
+            _DOCKER_API = docker.from_env().api
+        return _DOCKER_API
+
+
+def _copy_from_container(container: Container,
+                         fn_container: str,
+                         fn_host: str
+                         ) -> None:
+    api = _docker_api()
+    stream, _ = api.get_archive(container.id, fn_container)
+    archive = io.BytesIO(b''.join(stream))
+    with tarfile.open(fileobj=archive) as tar:
+        member = tar.getmembers()[0]
+        with tar.extractfile(member) as f_in, open(fn_host, 'wb') as f_out:
+            f_out.write(f_in.read())
+
+
+def install_binary(container: Container,
+                   fn_host: str,
+                   fn_container: str = FN_BINARY
+                   ) -> None:
+    """
+    Copies a binary from the host into a given container, replacing the
+    binary that was built as part of the container's image.
+    """
+    api = _docker_api()
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode='w') as tar:
+        info = tar.gettarinfo(fn_host, arcname=os.path.basename(fn_container))
+        info.mode = 0o755
+        with open(fn_host, 'rb') as f:
+            tar.addfile(info, f)
+    archive.seek(0)
+    dir_container = os.path.dirname(fn_container)
+    if not api.put_archive(container.id, dir_container, archive.getvalue()):
+        m = "failed to copy binary into container: {}".format(container.uid)
+        raise FailedToBuildMutant(m)
+    logger.debug("installed binary [%s] into container [%s]",
+                 fn_host, container.uid)
+
+
+class MutantBuilder(object):
+    """
+    Builds mutant binaries incrementally inside a warm build container.
+    Builds are serialised, since they share a single build tree; use a
+    MutantBuilderPool to perform several builds at once.
+    """
+    def __init__(self,
+                 client_bugzoo: BugZooClient,
+                 snapshot: bugzoo.Bug,
+                 dir_output: Optional[str] = None,
+                 fn_binary: str = FN_BINARY,
+                 cmd_build: str = CMD_BUILD
+                 ) -> None:
+        self.__bz = client_bugzoo
+        self.__snapshot = snapshot
+        self.__fn_binary = fn_binary
+        self.__cmd_build = cmd_build
+        self.__dir_output = dir_output or tempfile.mkdtemp(prefix='mutants')
+        self.__container = None  # type: Optional[Container]
+        self.__lock = threading.Lock()
+
+    def __enter__(self) -> 'MutantBuilder':
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """
+        Provisions the build container and warms its build tree.
+        """
+        with self.__lock:
+            if self.__container:
+                return
+            bz = self.__bz
+            self.__container = bz.containers.provision(self.__snapshot)
+            logger.debug("provisioned build container: %s",
+                         self.__container.uid)
+            self.__build()
+
+    def stop(self) -> None:
+        """
+        Destroys the build container.
+        """
+        with self.__lock:
+            if self.__container:
+                del self.__bz.containers[self.__container.uid]
+                self.__container = None
+
+    def __build(self) -> None:
+        bzc = self.__bz.containers
+        cmd = "/bin/bash -c '{}'".format(self.__cmd_build)
+        outcome = bzc.command(self.__container, cmd)
+        if outcome.code != 0:
+            logger.error("build failure:\n%s", outcome.output)
+            raise FailedToBuildMutant("incremental build failed")
+
+    def build(self, diff: str) -> str:
+        """
+        Builds the mutant described by a given diff and returns the path to
+        its binary on the host. The source tree of the build container is
+        restored to its original state before this method returns.
+
+        Raises:
+            FailedToBuildMutant: if the mutant could not be patched or built.
+        """
+        bz = self.__bz
+        patch = bugzoo.Patch.from_unidiff(diff)
+        digest = hashlib.sha256(diff.encode()).hexdigest()[:16]
+        fn_out = os.path.join(self.__dir_output, '{}.bin'.format(digest))
+        with self.__lock:
+            container = self.__container
+            assert container, "build container has not been started"
+            originals = {fn: bz.files.read(container, fn)
+                         for fn in patch.files}  # type: Dict[str, str]
+            try:
+                if not bz.containers.patch(container, patch):
+                    m = "failed to patch using diff: {}".format(diff)
+                    raise FailedToBuildMutant(m)
+                logger.debug("patched using diff: %s", diff)
+                self.__build()
+                _copy_from_container(container, self.__fn_binary, fn_out)
+            finally:
+                for fn, contents in originals.items():
+                    bz.files.write(container, fn, contents)
+        logger.debug("built mutant binary: %s", fn_out)
+        return fn_out
+
+    @contextlib.contextmanager
+    def mutant(self, diff: str) -> Iterator[str]:
+        """
+        Builds a mutant binary and removes it from the host upon leaving the
+        context.
+        """
+        fn_binary = self.build(diff)
+        try:
+            yield fn_binary
+        finally:
+            if os.path.exists(fn_binary):
+                os.remove(fn_binary)
+
+
+class MutantBuilderPool(object):
+    """
+    Maintains a bounded pool of warm mutant builders, allowing up to `size`
+    mutants to be built concurrently. Builders are started lazily, the first
+    time that they are needed, and are reused by subsequent builds.
+    """
+    def __init__(self,
+                 client_bugzoo: BugZooClient,
+                 snapshot: bugzoo.Bug,
+                 size: int
+                 ) -> None:
+        assert size >= 1
+        self.__bz = client_bugzoo
+        self.__snapshot = snapshot
+        self.__size = size
+        self.__idle = queue.Queue()  # type: queue.Queue
+        self.__builders = []  # type: List[MutantBuilder]
+        self.__lock = threading.Lock()
+
+    def __enter__(self) -> 'MutantBuilderPool':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    @property
+    def size(self) -> int:
+        """
+        The maximum number of builders that may be used at once.
+        """
+        return self.__size
+
+    def stop(self) -> None:
+        """
+        Destroys the build containers of all builders in the pool.
+        """
+        with self.__lock:
+            builders = self.__builders
+            self.__builders = []
+        for builder in builders:
+            try:
+                builder.stop()
+            except Exception:
+                logger.exception("failed to stop mutant builder")
+
+    def __acquire(self) -> MutantBuilder:
+        try:
+            return self.__idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.__lock:
+            create = len(self.__builders) < self.__size
+            if create:
+                builder = MutantBuilder(self.__bz, self.__snapshot)
+                self.__builders.append(builder)
+        if not create:
+            return self.__idle.get()
+        try:
+            builder.start()
+        except Exception:
+            with self.__lock:
+                self.__builders.remove(builder)
+            builder.stop()
+            raise
+        return builder
+
+    def build(self, diff: str) -> str:
+        """
+        Builds the mutant described by a given diff using an idle builder,
+        waiting for one to become available if necessary, and returns the
+        path to its binary on the host.
+
+        Raises:
+            FailedToBuildMutant: if the mutant could not be patched or built.
+        """
+        builder = self.__acquire()
+        try:
+            return builder.build(diff)
+        finally:
+            self.__idle.put(builder)
+
+    @contextlib.contextmanager
+    def mutant(self, diff: str) -> Iterator[str]:
+        """
+        Builds a mutant binary and removes it from the host upon leaving the
+        context. The builder is released as soon as the build has finished.
+        """
+        fn_binary = self.build(diff)
+        try:
+            yield fn_binary
+        finally:
+            if os.path.exists(fn_binary):
+                os.remove(fn_binary)
@@ -0,0 +1,249 @@
+"""
+Provides a pipeline for evaluating mutants against a set of oracle missions.
+
+Rather than evaluating each mutant's missions serially, the pipeline schedules
+individual (mutant, mission) pairs across a fixed number of workers, each of
+which uses at most one container at a time. The number of workers therefore
+acts as a global container budget. Pending missions always take priority over
+mutant builds, and only a bounded number of mutants are kept alive at once,
+so that builds are interleaved with trace collection without accumulating a
+large number of mutant images.
+"""
+__all__ = ['DatabaseEntry', 'MutantPipeline']
+
+from typing import Any, Callable, ContextManager, Dict, List, Optional, \
+    Tuple
+import contextlib
+import functools
+import itertools
+import logging
+import queue
+import threading
+
+import attr
+from ruamel.yaml.scalarstring import PreservedScalarString
+
+logger = logging.getLogger('houston')  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+# priorities used by the work queue
+_PRIORITY_MISSION = 0
+_PRIORITY_BUILD = 1
+_PRIORITY_STOP = 2
+
+
+@attr.s
+class DatabaseEntry(object):
+    diff = attr.ib(type=str)
+    fn_inconsistent_traces = attr.ib(type=Tuple[Tuple[str, str], ...])
+    fn_consistent_traces = attr.ib(type=Tuple[Tuple[str, str], ...])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'diff': PreservedScalarString(self.diff),
+                'inconsistent':  [{'oracle': o,
+                                   'trace': t} for o, t in self.fn_inconsistent_traces],
+                'consistent':  [{'oracle': o,
+                                 'trace': t} for o, t in self.fn_consistent_traces]
+                }
+
+
+class _MutantJob(object):
+    """
+    Tracks the state of a single mutant within the pipeline.
+    """
+    def __init__(self, diff: str, trace_filenames: List[str]) -> None:
+        self.diff = diff
+        self.trace_filenames = trace_filenames
+        self.remaining = len(trace_filenames)
+        self.inconsistent = []  # type: List[Tuple[str, str]]
+        self.consistent = []  # type: List[Tuple[str, str]]
+        self.stack = contextlib.ExitStack()
+        self.mutant = None  # type: Any
+        self.killed = False
+
+    def to_entry(self) -> Optional[DatabaseEntry]:
+        if not self.inconsistent and not self.consistent:
+            return None
+        return DatabaseEntry(self.diff,
+                             tuple(self.inconsistent),
+                             tuple(self.consistent))
+
+
+class MutantPipeline(object):
+    """
+    Evaluates a collection of mutants using a bounded number of containers.
+
+    The pipeline is parameterised by two functions: `prepare`, which accepts
+    the diff for a mutant and returns a context manager that builds the mutant
+    (and frees its resources upon exit); and `evaluate`, which accepts the
+    built mutant, its diff, and the name of an oracle trace file, and returns
+    a tuple containing the name of the resulting mutant trace file and a flag
+    indicating whether that trace is inconsistent with the oracle.
+    """
+    def __init__(self,
+                 prepare: Callable[[str], ContextManager[Any]],
+                 evaluate: Callable[[Any, str, str], Tuple[str, bool]],
+                 num_containers: int = 1,
+                 max_live_mutants: Optional[int] = None,
+                 stop_on_detect: bool = False,
+                 on_entry: Optional[Callable[[DatabaseEntry], None]] = None
+                 ) -> None:
+        assert num_containers >= 1
+        if max_live_mutants is None:
+            max_live_mutants = num_containers
+        assert max_live_mutants >= 1
+        self.__prepare = prepare
+        self.__evaluate = evaluate
+        self.__num_containers = num_containers
+        self.__max_live_mutants = max_live_mutants
+        self.__stop_on_detect = stop_on_detect
+        self.__on_entry = on_entry
+
+        self.__lock = threading.Lock()
+        self.__queue = queue.PriorityQueue()  # type: queue.PriorityQueue
+        self.__counter = itertools.count()
+        self.__waiting = []  # type: List[_MutantJob]
+        self.__num_live = 0
+        self.__entries = []  # type: List[DatabaseEntry]
+        self.__done = threading.Event()
+        self.__stopped = False
+
+    @property
+    def entries(self) -> List[DatabaseEntry]:
+        """
+        The database entries that have been produced thus far.
+        """
+        with self.__lock:
+            return list(self.__entries)
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        The number of tasks (i.e., builds and missions) that are waiting to
+        be performed.
+        """
+        return self.__queue.qsize()
+
+    def __put(self, priority: int, task: Optional[Callable[[], None]]) -> None:
+        self.__queue.put((priority, next(self.__counter), task))
+
+    def __admit(self) -> None:
+        """
+        Schedules the builds of waiting mutants, provided that the limit on
+        live mutants has not been reached. Should be called with the lock.
+        """
+        while self.__waiting and self.__num_live < self.__max_live_mutants:
+            job = self.__waiting.pop(0)
+            self.__num_live += 1
+            self.__put(_PRIORITY_BUILD, functools.partial(self.__build, job))
+        if not self.__waiting and self.__num_live == 0:
+            self.__done.set()
+
+    def __build(self, job: _MutantJob) -> None:
+        if self.__stopped:
+            self.__finish(job)
+            return
+        try:
+            job.mutant = job.stack.enter_context(self.__prepare(job.diff))
+        except Exception:
+            logger.exception("failed to build mutant: %s", job.diff)
+            self.__finish(job)
+            return
+        if job.remaining == 0:
+            self.__finish(job)
+            return
+        for fn_trace in job.trace_filenames:
+            task = functools.partial(self.__run, job, fn_trace)
+            self.__put(_PRIORITY_MISSION, task)
+
+    def __run(self, job: _MutantJob, fn_trace: str) -> None:
+        if not job.killed and not self.__stopped:
+            logger.debug("evaluating oracle trace: %s", fn_trace)
+            try:
+                fn_trace_mut, inconsistent = \
+                    self.__evaluate(job.mutant, job.diff, fn_trace)
+            except Exception:
+                logger.exception("failed to evaluate trace %s for mutant: %s",
+                                 fn_trace, job.diff)
+            else:
+                with self.__lock:
+                    if inconsistent:
+                        logger.info("found an acceptable mutant!")
+                        job.inconsistent.append((fn_trace, fn_trace_mut))
+                        if self.__stop_on_detect and not job.killed:
+                            logger.debug("killing remaining work for mutant")
+                            job.killed = True
+                    else:
+                        job.consistent.append((fn_trace, fn_trace_mut))
+        with self.__lock:
+            job.remaining -= 1
+            finished = job.remaining == 0
+        if finished:
+            self.__finish(job)
+
+    def __finish(self, job: _MutantJob) -> None:
+        """
+        Frees the resources used by a mutant, reports its entry (if any), and
+        admits the next waiting mutant.
+        """
+        try:
+            job.stack.close()
+        except Exception:
+            logger.exception("failed to destroy mutant: %s", job.diff)
+        entry = job.to_entry()
+        if entry and self.__on_entry:
+            try:
+                self.__on_entry(entry)
+            except Exception:
+                logger.exception("failed to report entry for mutant: %s",
+                                 job.diff)
+        with self.__lock:
+            if entry:
+                self.__entries.append(entry)
+            self.__num_live -= 1
+            self.__admit()
+
+    def __work(self) -> None:
+        while True:
+            _, _, task = self.__queue.get()
+            if task is None:
+                return
+            task()
+
+    def run(self,
+            mutants: List[Tuple[str, List[str]]]
+            ) -> List[DatabaseEntry]:
+        """
+        Evaluates a list of mutants, given as a list of tuples containing the
+        diff for each mutant and the names of the oracle trace files that it
+        should be evaluated against, and returns the resulting entries.
+        Blocks until all mutants have been evaluated or the pipeline is
+        stopped.
+        """
+        workers = [threading.Thread(target=self.__work, daemon=True)
+                   for _ in range(self.__num_containers)]
+        with self.__lock:
+            self.__done.clear()
+            self.__waiting = [_MutantJob(d, list(fns)) for d, fns in mutants]
+            self.__admit()
+        for worker in workers:
+            worker.start()
+        try:
+            while not self.__done.wait(0.5):
+                pass
+        finally:
+            self.stop()
+            for worker in workers:
+                worker.join()
+        return self.entries
+
+    def stop(self) -> None:
+        """
+        Stops the pipeline. Pending missions and builds are discarded, but
+        any work that is already in progress will run to completion.
+        """
+        self.__stopped = True
+        with self.__lock:
+            self.__waiting = []
+        for _ in range(self.__num_containers):
+            self.__put(_PRIORITY_STOP, None)
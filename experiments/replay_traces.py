@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+This script rebuilds the traces in a directory of trace files from the tlogs
+that were captured alongside them (i.e., traces produced by build_traces.py
+using the --tlog flag), without re-running any missions. An alternative
+State class may be provided, allowing traces to be produced for new or
+modified state definitions.
+"""
+from typing import List, Optional, Type
+import concurrent.futures
+import importlib
+import argparse
+import logging
+import json
+import sys
+import os
+
+import houston
+from houston import Mission, State
+from houston.ardu.replay import replay
+
+logger = logging.getLogger('houston')  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+DESCRIPTION = "Rebuilds traces from their captured MAVLink logs."
+
+
+def setup_logging(verbose: bool = False) -> None:
+    log_to_stdout = logging.StreamHandler()
+    log_to_stdout.setLevel(logging.DEBUG if verbose else logging.INFO)
+    formatter = logging.Formatter('%(processName)s - %(message)s')
+    log_to_stdout.setFormatter(formatter)
+    logging.getLogger('houston').addHandler(log_to_stdout)
+    logging.getLogger('experiment').addHandler(log_to_stdout)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description=DESCRIPTION)
+    p.add_argument('traces', type=str,
+                   help='path to a directory of trace files with tlogs.')
+    p.add_argument('output', type=str,
+                   help='the directory to which the traces should be written.')
+    p.add_argument('--state', type=str,
+                   help='the State class that should be used, given in the form module:Class.')  # noqa: pycodestyle
+    p.add_argument('--threads', type=int, default=1,
+                   help='number of processes to use when replaying traces.')
+    p.add_argument('--verbose', action='store_true',
+                   help='increases logging verbosity')
+    return p.parse_args()
+
+
+def load_state_class(name: str) -> Type[State]:
+    name_module, name_class = name.split(':')
+    return getattr(importlib.import_module(name_module), name_class)
+
+
+def replay_file(fn_trace: str,
+                dir_output: str,
+                name_state: Optional[str] = None
+                ) -> bool:
+    """
+    Rebuilds each of the traces within a given trace file from its tlog,
+    and writes them to a trace file with the same name in a given output
+    directory. Traces that do not have a tlog are omitted.
+
+    Returns:
+        True if at least one trace was rebuilt, or False if not.
+    """
+    state_cls = load_state_class(name_state) if name_state else None
+    dir_trace = os.path.dirname(fn_trace)
+    with open(fn_trace, 'r') as f:
+        jsn = json.load(f)
+    mission = Mission.from_dict(jsn['mission'])
+
+    traces = []
+    for jsn_trace in jsn['traces']:
+        fn_tlog = jsn_trace.get('tlog')
+        if not fn_tlog:
+            logger.warning("no tlog for trace in file: %s", fn_trace)
+            continue
+        fn_tlog_abs = os.path.join(dir_trace, fn_tlog)
+        trace = replay(mission, fn_tlog_abs, state_cls)
+        trace.tlog = fn_tlog
+        traces.append(trace)
+
+    if not traces:
+        return False
+
+    fn_output = os.path.join(dir_output, os.path.basename(fn_trace))
+    with open(fn_output, 'w') as f:
+        json.dump({'mission': mission.to_dict(),
+                   'traces': [t.to_dict() for t in traces]}, f)
+    logger.debug("replayed traces for file: %s", fn_trace)
+    return True
+
+
+def replay_all(trace_filenames: List[str],
+               dir_output: str,
+               name_state: Optional[str] = None,
+               num_workers: int = 1
+               ) -> int:
+    """
+    Replays a list of trace files using a pool of processes, and returns the
+    number of files that were successfully replayed.
+    """
+    num_replayed = 0
+    with concurrent.futures.ProcessPoolExecutor(num_workers) as e:
+        futures = {e.submit(replay_file, fn, dir_output, name_state): fn
+                   for fn in trace_filenames}
+        for future in concurrent.futures.as_completed(futures):
+            fn = futures[future]
+            try:
+                if future.result():
+                    num_replayed += 1
+            except Exception:
+                logger.exception("failed to replay trace file: %s", fn)
+    return num_replayed
+
+
+def main():
+    args = parse_args()
+    setup_logging(verbose=args.verbose)
+    dir_traces = args.traces
+    dir_output = args.output
+
+    if not os.path.exists(dir_traces):
+        logger.error("trace directory not found: %s", dir_traces)
+        sys.exit(1)
+    if args.state:
+        load_state_class(args.state)  # fail early
+
+    os.makedirs(dir_output, exist_ok=True)
+    trace_filenames = [os.path.join(dir_traces, fn)
+                       for fn in os.listdir(dir_traces)
+                       if fn.endswith('.json')]
+    num_replayed = replay_all(trace_filenames,
+                              dir_output,
+                              args.state,
+                              args.threads)
+    logger.info("replayed %d of %d trace files",
+                num_replayed, len(trace_filenames))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,9 @@
 import copy
 import json
 import logging
+import os
+import tempfile
+import time
 
 import argparse
 import bugzoo
@@ -14,6 +17,8 @@ from houston.generator.rand import RandomMissionGenerator
 from houston.generator.resources import ResourceLimits
 from houston.mission import Mission
 from houston.runner import MissionRunnerPool
+from houston.fingerprint import deduplicate
+from houston.sink import OutcomeSink, read_outcomes
 #from houston.ardu.common.goto import CircleBasedGotoGenerator
 from houston.root_cause.delta_debugging import DeltaDebugging
 from houston.root_cause.symex import SymbolicExecution
@@ -43,6 +48,8 @@ def setup_arg_parser():
                         help='if given fault localization will be done at the end.')
     parser.add_argument('--not_record', default=True, action="store_false",
                         help='if given the results will not be recorded.')
+    parser.add_argument('--dedup', default=False, action="store_true",
+                        help='skips missions that are near duplicates of earlier missions.')
     parser.add_argument('--threads', default=5,
                         help='number of threads to be used for this run.')
     args = parser.parse_args()
@@ -59,52 +66,59 @@ def run_single_mission_with_coverage(sandbox, mission):
     print(coverage)
 
 ### Run all missions stored in a JSON file
-def run_all_missions(bz, snapshot_name, sut, mission_file, coverage=False, record=True, threads=5):
+def run_all_missions(bz, snapshot_name, sut, mission_file, coverage=False, record=True, threads=5, dedup=False):
     missions = []
     with open(mission_file, "r") as f:
         missions_json = json.load(f)
         missions = list(map(Mission.from_dict, missions_json))
+    if dedup:
+        num_missions = len(missions)
+        missions = deduplicate(missions, sut)
+        print("Skipping {} near-duplicate missions".format(num_missions - len(missions)))
     assert isinstance(missions, list)
 
 
-    outcomes = {}
+    # outcomes are streamed to disk as they arrive; only coverage (if any)
+    # is kept in memory, since it is needed for fault localization. each run
+    # writes to its own directory so that earlier outcomes are not reported.
     coverages = {}
+    passed = {}
+    os.makedirs("outcomes", exist_ok=True)
+    outcomes_dir = tempfile.mkdtemp(prefix=time.strftime("%Y%m%d-%H%M%S-"),
+                                    dir="outcomes")
+    print("Writing outcomes to {}".format(outcomes_dir))
+    sink = OutcomeSink(outcomes_dir)
     def record_outcome(mission, outcome, coverage=None):
-        outcomes[mission] = outcome
-        coverages[mission] = coverage
+        sink(mission, outcome, coverage)
+        if coverage is not None:
+            coverages[mission] = coverage
+            passed[mission] = outcome.passed
 
     runner_pool = MissionRunnerPool(bz, snapshot_name, sut, threads, missions, record_outcome, coverage, record)
     print("Started running")
-    runner_pool.run()
+    try:
+        runner_pool.run()
+    finally:
+        sink.close()
     print("Done running")
-    print(outcomes)
 
     with open("failed.json", "w") as f:
-        for m in outcomes:
-            if not outcomes[m].passed:
-                f.write(str(m.to_dict()))
+        for r in read_outcomes(outcomes_dir):
+            if r.outcome is None or not r.outcome.passed:
+                f.write(str(r.mission.to_dict()))
                 f.write("\n")
 
     if coverage:
-        from bugzoo.core.coverage import TestSuiteCoverage
-        from bugzoo.core.spectra import Spectra
-        from bugzoo.localization import Localization
-        from bugzoo.localization.suspiciousness import tarantula
-        test_suite_coverage_dict = {}
-        counter = 0
-        for m in coverages:
-            test = {
-                    'test': 't{}'.format(counter),
-                    'outcome': outcomes[m].to_test_outcome_json(0),
-                    'coverage': coverages[m].to_dict()
-            }
-            test_suite_coverage_dict['t{}'.format(counter)] = test
-            counter += 1
-        spectra = Spectra.from_coverage(TestSuiteCoverage.from_dict(test_suite_coverage_dict))
-        l = Localization.from_spectra(spectra, tarantula)
-        print(str(l.get_most_suspicious_lines()))
+        from houston.localization import Spectrum, tarantula
+        spectrum = Spectrum.from_coverage(coverages, passed)
+        scores = spectrum.localize()
+        print(str(spectrum.most_suspicious(tarantula, 10)))
         with open("localization.json", "w") as f:
-            f.write(str(l))
+            jsn = {}
+            for i, line in enumerate(spectrum.index):
+                jsn[str(line)] = {name: float(s[i])
+                                  for (name, s) in scores.items()}
+            json.dump(jsn, f)
 
 
 if __name__ == "__main__":
@@ -113,4 +127,4 @@ if __name__ == "__main__":
     bz = BugZoo()
 
     run_all_missions(bz, args.snapshot, sut, args.input_file, args.coverage,
-                     args.not_record, args.threads)
+                     args.not_record, args.threads, args.dedup)
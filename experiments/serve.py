@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+This script launches a long-lived Houston service for a given snapshot, to
+which missions may be submitted over HTTP (see houston.service).
+"""
+import argparse
+import logging
+import time
+
+import bugzoo
+import bugzoo.server
+from houston.metrics import CampaignMetrics
+from houston.service import HoustonService, serve
+from houston.timeouts import TimeoutModel, set_timeout_model
+
+logger = logging.getLogger('houston')  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+DESCRIPTION = "Runs a Houston service that accepts missions over HTTP."
+
+
+def setup_logging(verbose: bool = False) -> None:
+    log_to_stdout = logging.StreamHandler()
+    log_to_stdout.setLevel(logging.DEBUG if verbose else logging.INFO)
+    formatter = logging.Formatter('%(threadName)s - %(message)s')
+    log_to_stdout.setFormatter(formatter)
+    logging.getLogger('houston').addHandler(log_to_stdout)
+    logging.getLogger('experiment').addHandler(log_to_stdout)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description=DESCRIPTION)
+    p.add_argument('snapshot', help='the name of the BugZoo snapshot')
+    p.add_argument('--host', type=str, default='0.0.0.0',
+                   help='the address on which the service should listen.')
+    p.add_argument('--port', type=int, default=8000,
+                   help='the port on which the service should listen.')
+    p.add_argument('--threads', type=int, default=1,
+                   help='the number of missions that may be run at once.')
+    p.add_argument('--timeouts', type=str,
+                   help='a learned timeout model (see fit_timeouts.py).')
+    p.add_argument('--verbose', action='store_true',
+                   help='increases logging verbosity')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_logging(verbose=args.verbose)
+    assert args.threads > 0
+
+    if args.timeouts:
+        set_timeout_model(TimeoutModel.from_file(args.timeouts))
+
+    with bugzoo.server.ephemeral() as client_bugzoo:
+        service = HoustonService(client_bugzoo,
+                                 args.snapshot,
+                                 num_workers=args.threads,
+                                 metrics=CampaignMetrics())
+        service.start()
+        server = serve(service, args.host, args.port)
+        try:
+            while True:
+                time.sleep(1.0)
+        except (KeyboardInterrupt, SystemExit):
+            logger.info("Received keyboard interrupt. Shutting down...")
+        finally:
+            server.stop()
+            service.stop()
+            client_bugzoo.containers.clear()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+This script checks the traces within a directory of trace files against the
+specifications of their commands, and reports the number of violations of
+each specification, without re-running any missions.
+"""
+from typing import Any, Dict, List, Tuple
+import concurrent.futures
+import argparse
+import logging
+import json
+import sys
+import os
+
+import houston
+from houston.verify import CommandCheck, check_trace, summarise
+
+from compare_traces import load_file as load_traces_file
+
+logger = logging.getLogger('houston')  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+DESCRIPTION = "Checks recorded traces against command specifications."
+
+
+def setup_logging(verbose: bool = False) -> None:
+    log_to_stdout = logging.StreamHandler()
+    log_to_stdout.setLevel(logging.DEBUG if verbose else logging.INFO)
+    formatter = logging.Formatter('%(processName)s - %(message)s')
+    log_to_stdout.setFormatter(formatter)
+    logging.getLogger('houston').addHandler(log_to_stdout)
+    logging.getLogger('experiment').addHandler(log_to_stdout)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description=DESCRIPTION)
+    p.add_argument('traces', type=str,
+                   help='path to a directory of trace files.')
+    p.add_argument('--output', type=str,
+                   help='the file to which the report should be written.')
+    p.add_argument('--intermediate', action='store_true',
+                   help='checks postconditions against all intermediate states.')  # noqa: pycodestyle
+    p.add_argument('--threads', type=int, default=1,
+                   help='number of processes to use when checking traces.')
+    p.add_argument('--verbose', action='store_true',
+                   help='increases logging verbosity')
+    return p.parse_args()
+
+
+def verify_file(fn_trace: str,
+                intermediate: bool
+                ) -> List[Tuple[int, CommandCheck]]:
+    """
+    Checks each trace within a given trace file, and returns a list of
+    the checks that were performed, together with the index of the trace
+    to which they belong.
+    """
+    mission, traces = load_traces_file(fn_trace)
+    return [(i, check)
+            for (i, trace) in enumerate(traces)
+            for check in check_trace(mission, trace, intermediate)]
+
+
+def verify_all(trace_filenames: List[str],
+               intermediate: bool = False,
+               num_workers: int = 1
+               ) -> Dict[str, List[Tuple[int, CommandCheck]]]:
+    """
+    Checks a list of trace files using a pool of processes, and returns the
+    checks for each file that could be checked.
+    """
+    results = {}  # type: Dict[str, List[Tuple[int, CommandCheck]]]
+    with concurrent.futures.ProcessPoolExecutor(num_workers) as e:
+        futures = {e.submit(verify_file, fn, intermediate): fn
+                   for fn in trace_filenames}
+        for future in concurrent.futures.as_completed(futures):
+            fn = futures[future]
+            try:
+                results[fn] = future.result()
+            except Exception:
+                logger.exception("failed to check trace file: %s", fn)
+    return results
+
+
+def build_report(results: Dict[str, List[Tuple[int, CommandCheck]]]
+                 ) -> Dict[str, Any]:
+    checks = [c for checks in results.values() for (_, c) in checks]
+    summary = summarise(checks)
+    violations = [{'file': fn, 'trace': i, 'check': c.to_dict()}
+                  for (fn, checks) in results.items()
+                  for (i, c) in checks if not c.passed]
+    return {'specifications': [r.to_dict() for r in summary.values()],
+            'violations': violations}
+
+
+def main():
+    args = parse_args()
+    setup_logging(verbose=args.verbose)
+    dir_traces = args.traces
+    if not os.path.exists(dir_traces):
+        logger.error("trace directory not found: %s", dir_traces)
+        sys.exit(1)
+
+    trace_filenames = [os.path.join(dir_traces, fn)
+                       for fn in os.listdir(dir_traces)
+                       if fn.endswith('.json')]
+    results = verify_all(trace_filenames, args.intermediate, args.threads)
+    report = build_report(results)
+    for r in sorted(report['specifications'],
+                    key=lambda r: (r['command'], r['spec'])):
+        logger.info("%s [%s]: %d violations in %d checks",
+                    r['command'], r['spec'],
+                    r['num_violations'], r['num_checked'])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info("saved report to disk: %s", args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import random
 import geopy
+import numpy
 import os
 import logging
 import yaml
@@ -7,7 +8,8 @@ from typing import Dict, Any, Type, List
 
 from .connection import CommandLong
 from ..valueRange import ContinuousValueRange, DiscreteValueRange
-from ..command import Parameter, Command, CommandMeta
+from ..command import Parameter, Command, CommandMeta, CommandBatch
+from ..geo import destinations
 from ..specification import Idle
 
 logger = logging.getLogger(__name__)  # type: logging.Logger
@@ -32,6 +34,22 @@ def circle_based_generator(cls: Type[Command],
     return command
 
 
+def circle_based_generator_batch(cls: Type[Command],
+                                 size: int,
+                                 rng: numpy.random.Generator
+                                 ) -> CommandBatch:
+    """
+    Generates a batch of commands in the same manner as
+    circle_based_generator, computing all destinations at once.
+    """
+    (lat, lon) = (-35.3632607, 149.1652351)  # FIXME
+    heading = rng.uniform(0.0, 360.0, size)
+    dist = rng.uniform(0.0, 2.0, size)  # FIXME
+    params = {p.name: p.generate_batch(size, rng) for p in cls.parameters}
+    params['lat'], params['lon'] = destinations(lat, lon, dist, heading)
+    return CommandBatch(cls, size, params)
+
+
 def create_command(command: Dict[str, Any]) -> Type[Command]:
     """
     From a given dictionary, generates the Command class.
@@ -102,6 +120,8 @@ def create_command(command: Dict[str, Any]) -> Type[Command]:
 
     if generator == 'circle_based_generator':
         setattr(C, 'generate', classmethod(circle_based_generator))
+        setattr(C, 'generate_batch',
+                classmethod(circle_based_generator_batch))
 
     logger.info("Command class generated: %s", C)
     return C
@@ -1,7 +1,9 @@
 __all__ = ['MAVLinkMessage', 'CommandLong', 'MAVLinkConnection']
 
 import logging
-from typing import Any, List, Callable, Dict
+import time
+from timeit import default_timer as timer
+from typing import Any, List, Callable, Dict, Sequence
 import pymavlink
 from pymavlink.mavutil import mavlink
 import attr
@@ -91,10 +93,64 @@ class MAVLinkConnection(Connection[MAVLinkGeneralMessage]):
 
         self.__conn.add_message_listener('*', recv)
 
+    def message_type(self, message: MAVLinkGeneralMessage) -> str:
+        if isinstance(message, MAVLinkMessage):
+            return message.name
+        return super().message_type(message)
+
     @property
     def conn(self):
         return self.__conn
 
+    @property
+    def last_heartbeat(self) -> float:
+        """
+        The number of seconds since the last heartbeat was received.
+        """
+        return self.__conn.last_heartbeat
+
+    def upload_mission(self, items: Sequence[dronekit.Command],
+                       timeout: float
+                       ) -> None:
+        """
+        Uploads a mission, given as a sequence of commands, to the vehicle.
+        """
+        vcmds = self.__conn.commands
+        vcmds.clear()
+        for item in items:
+            vcmds.add(item)
+        vcmds.upload(timeout=timeout)
+        vcmds.wait_ready()
+
+    def set_mode(self, name: str, timeout: float) -> bool:
+        """
+        Switches the vehicle to a given flight mode, and waits for the
+        vehicle to report that mode. Returns False if the timeout expires.
+        """
+        mode = dronekit.VehicleMode(name)
+        time_start = timer()
+        self.__conn.mode = mode
+        while self.__conn.mode != mode:
+            if timer() - time_start >= timeout:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def arm(self, timeout: float) -> bool:
+        """
+        Arms the vehicle and waits for it to report that it is armed.
+        Returns False if the timeout expires.
+        """
+        time_start = timer()
+        while True:
+            self.__conn.armed = True
+            if self.__conn.armed:
+                return True
+            if timer() - time_start >= timeout:
+                return False
+            logger.debug("waiting for the vehicle to be armed...")
+            time.sleep(0.1)
+
     def send(self, message: MAVLinkGeneralMessage) -> None:
         mav = self.__conn.message_factory
         if isinstance(message, CommandLong):
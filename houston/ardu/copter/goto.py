@@ -3,6 +3,7 @@ __all__ = ['GoTo']
 import random
 import dronekit
 import geopy
+import numpy
 from pymavlink.mavutil import mavlink
 
 from ..connection import CommandLong
@@ -10,7 +11,8 @@ from ..common import GotoLoiter
 from ...connection import Message
 from ...specification import Specification
 from ...configuration import Configuration
-from ...command import Command, Parameter
+from ...command import Command, CommandBatch, Parameter
+from ...geo import destinations
 from ...state import State
 from ...specification import Specification
 from ...environment import Environment
@@ -79,6 +81,20 @@ class GoTo(Command):
         command = cls(**params)
         return command
 
+    @classmethod
+    def generate_batch(cls,
+                       size: int,
+                       rng: numpy.random.Generator
+                       ) -> CommandBatch:
+        (lat, lon) = (-35.3632607, 149.1652351)  # FIXME
+        heading = rng.uniform(0.0, 360.0, size)
+        dist = rng.uniform(0.0, 2.0, size)  # FIXME
+        latitude, longitude = destinations(lat, lon, dist, heading)
+        params = {'latitude': latitude,
+                  'longitude': longitude,
+                  'altitude': numpy.full(size, 5.0)}  # FIXME
+        return CommandBatch(cls, size, params)
+
     def to_message(self) -> Message:
         return CommandLong(target_system=0,
                            target_component=0,
@@ -0,0 +1,189 @@
+"""
+Provides a streaming monitor that watches the states and STATUSTEXT messages
+produced by a vehicle during a mission, and detects situations in which the
+current command can no longer complete (e.g., the vehicle has stalled,
+crashed, or entered a failsafe mode), allowing the mission to be aborted
+without waiting for the command to time out.
+"""
+__all__ = ['MissionAbort', 'MissionMonitor', 'STALL', 'CRASH', 'PARACHUTE',
+           'FAILSAFE', 'UNCOMMANDED_MODE']
+
+from typing import Callable, FrozenSet, Optional, Tuple
+import logging
+import threading
+
+import attr
+
+from .connection import MAVLinkMessage
+from ..command import Command
+from ..state import State
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+STALL = 'stall'
+CRASH = 'crash'
+PARACHUTE = 'parachute'
+FAILSAFE = 'failsafe'
+UNCOMMANDED_MODE = 'uncommanded-mode'
+
+# the modes that the vehicle may only enter if commanded to do so
+FAILSAFE_MODES = frozenset(['LAND', 'RTL'])
+
+# the variables that must remain unchanged for the vehicle to have stalled
+_POSITION = ('latitude', 'longitude', 'altitude')
+_VELOCITY = ('vx', 'vy', 'vz')
+
+# the fragments of command UIDs for which the vehicle is expected to hold
+# its position. UIDs are matched case-insensitively, since hand-written
+# commands use lower-case UIDs (e.g., ardu:copter:parachute) and factory
+# commands use MAVLink names (e.g., factory.MAV_CMD_DO_PARACHUTE).
+_STATIONARY_COMMANDS = ('loiter', 'delay', 'mav_cmd_do_')
+
+# the fragments of command UIDs for which a parachute release is expected
+_PARACHUTE_COMMANDS = ('parachute',)
+
+
+def _uid_matches(command: Command, fragments: Tuple[str, ...]) -> bool:
+    uid = command.uid.lower()
+    return any(fragment in uid for fragment in fragments)
+
+
+@attr.s(frozen=True)
+class MissionAbort(object):
+    """
+    Describes the reason that a mission was aborted.
+
+    Attributes:
+        reason: the kind of problem that was detected (e.g., STALL).
+        description: a human-readable description of the problem.
+        time_offset: the time at which the problem was detected.
+    """
+    reason = attr.ib(type=str)
+    description = attr.ib(type=str)
+    time_offset = attr.ib(type=Optional[float], default=None)
+
+
+class MissionMonitor(object):
+    """
+    Watches the execution of a mission and decides whether it should be
+    aborted. States should be passed to observe_state, STATUSTEXT messages
+    to observe_message, and the command that is currently being executed to
+    expect. The first problem that is detected is reported, exactly once, to
+    a given callback.
+    """
+    def __init__(self,
+                 speedup: float = 1.0,
+                 stall_time: float = 60.0,
+                 on_abort: Optional[Callable[[MissionAbort], None]] = None
+                 ) -> None:
+        """
+        Parameters:
+            speedup: the speedup of the simulation.
+            stall_time: the number of simulated seconds for which the
+                vehicle may make no progress before the mission is aborted.
+            on_abort: called when a problem is first detected.
+        """
+        self.__lock = threading.Lock()
+        self.__stall_time = stall_time / speedup
+        self.__on_abort = on_abort
+        self.__abort = None  # type: Optional[MissionAbort]
+        self.__command = None  # type: Optional[Command]
+        self.__anchor = None  # type: Optional[State]
+
+    @property
+    def abort(self) -> Optional[MissionAbort]:
+        """
+        The reason that the mission should be aborted, or None if no problem
+        has been detected.
+        """
+        return self.__abort
+
+    def expect(self, command: Optional[Command]) -> None:
+        """
+        Informs the monitor of the command that is currently being executed,
+        or None if the vehicle is not executing a command.
+        """
+        with self.__lock:
+            self.__command = command
+            self.__anchor = None
+
+    def observe_state(self, state: State) -> None:
+        with self.__lock:
+            command = self.__command
+            if self.__abort or command is None:
+                return
+
+            mode = state['mode'] if 'mode' in state.variables else None
+            if mode in FAILSAFE_MODES and \
+                    mode not in self.__commanded_modes(command):
+                d = "vehicle entered mode {} during command: {}"
+                d = d.format(mode, command)
+                self.__trigger(MissionAbort(UNCOMMANDED_MODE, d,
+                                            state.time_offset))
+                return
+
+            if self.__expects_stationary(command):
+                return
+            if not self.__is_stationary(state):
+                self.__anchor = None
+                return
+            if self.__anchor is None:
+                self.__anchor = state
+                return
+            duration = state.time_offset - self.__anchor.time_offset
+            if duration >= self.__stall_time:
+                d = "vehicle made no progress for {:.1f} seconds: {}"
+                d = d.format(duration, command)
+                self.__trigger(MissionAbort(STALL, d, state.time_offset))
+
+    def observe_message(self, message: MAVLinkMessage) -> None:
+        if message.name != 'STATUSTEXT':
+            return
+        text = message.message.text
+        if isinstance(text, bytes):
+            text = text.decode('utf-8', 'ignore')
+        text_lower = text.lower()
+        with self.__lock:
+            command = self.__command
+            if self.__abort:
+                return
+            commanded = command is not None and \
+                _uid_matches(command, _PARACHUTE_COMMANDS)
+            if 'crash' in text_lower:
+                self.__trigger(MissionAbort(CRASH, text))
+            elif 'parachute' in text_lower and not commanded:
+                self.__trigger(MissionAbort(PARACHUTE, text))
+            elif 'failsafe' in text_lower:
+                self.__trigger(MissionAbort(FAILSAFE, text))
+
+    def __trigger(self, abort: MissionAbort) -> None:
+        logger.info("aborting mission (%s): %s",
+                    abort.reason, abort.description)
+        self.__abort = abort
+        if self.__on_abort:
+            self.__on_abort(abort)
+
+    @staticmethod
+    def __commanded_modes(command: Command) -> FrozenSet[str]:
+        if any(p.name == 'mode' for p in command):
+            return frozenset([command['mode']])
+        return frozenset()
+
+    @staticmethod
+    def __expects_stationary(command: Command) -> bool:
+        return _uid_matches(command, _STATIONARY_COMMANDS)
+
+    def __is_stationary(self, state: State) -> bool:
+        variables = state.__class__.variables
+        for name in _VELOCITY:
+            if name in variables and not variables[name].eq(0.0, state[name]):
+                return False
+        anchor = self.__anchor
+        if anchor is None:
+            return True
+        for name in _POSITION:
+            if name in variables and \
+                    not variables[name].eq(anchor[name], state[name]):
+                return False
+        return True
@@ -0,0 +1,350 @@
+"""
+Provides a lightweight MAVLink connection that is built directly on top of
+pymavlink, rather than dronekit.
+
+dronekit maintains a large number of attribute caches, several background
+threads, and performs a number of (slow) handshakes upon connecting. In
+contrast, RawMAVLinkConnection uses a single receiver thread, and caches
+only those attributes that are read by the State classes for ArduPilot
+systems.
+"""
+__all__ = ['VehicleCache', 'RawMAVLinkConnection']
+
+from typing import Any, Dict, Optional, Sequence
+from timeit import default_timer as timer
+import queue
+import threading
+import time
+import logging
+
+import attr
+from pymavlink import mavutil
+from pymavlink.mavutil import mavlink
+
+from ..connection import Connection
+from ..exceptions import NoConnectionError
+from .connection import MAVLinkGeneralMessage, MAVLinkMessage, CommandLong, \
+    HOOK_TYPE
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+# the interval (in seconds) at which heartbeats are sent to the vehicle
+HEARTBEAT_INTERVAL = 1.0
+
+# the rate (in Hz) at which the vehicle is asked to stream its telemetry;
+# matches the rate requested by dronekit
+STREAM_RATE = 4
+
+
+@attr.s(frozen=True)
+class Location(object):
+    lat = attr.ib(type=float)
+    lon = attr.ib(type=float)
+    alt = attr.ib(type=float)
+
+
+@attr.s(frozen=True)
+class Locations(object):
+    global_relative_frame = attr.ib(type=Location)
+
+
+@attr.s(frozen=True)
+class Attitude(object):
+    pitch = attr.ib(type=float)
+    yaw = attr.ib(type=float)
+    roll = attr.ib(type=float)
+
+
+@attr.s(frozen=True)
+class Mode(object):
+    name = attr.ib(type=str)
+
+
+class VehicleCache(object):
+    """
+    Maintains the decoded values of the vehicle attributes that are read by
+    the State classes for ArduPilot systems, using the same names and
+    semantics as the corresponding dronekit.Vehicle attributes.
+    """
+    def __init__(self) -> None:
+        self.home_location = None  # type: Optional[Location]
+        self.location = Locations(Location(None, None, None))
+        self.velocity = [None, None, None]
+        self.attitude = Attitude(None, None, None)
+        self.heading = None  # type: Optional[int]
+        self.airspeed = None  # type: Optional[float]
+        self.groundspeed = None  # type: Optional[float]
+        self.armed = False
+        self.mode = Mode('UNKNOWN')
+        self.channels = {str(i): None for i in range(1, 9)}  # type: Dict[str, Optional[int]]  # noqa: pycodestyle
+        self.system_status = None  # type: Optional[int]
+        self.mav_type = None  # type: Optional[int]
+        self.gps_fix_type = None  # type: Optional[int]
+        self.time_last_heartbeat = None  # type: Optional[float]
+        self.__ekf_flags = 0
+
+    @property
+    def last_heartbeat(self) -> float:
+        """
+        The number of seconds since the last heartbeat was received.
+        """
+        if self.time_last_heartbeat is None:
+            return float('inf')
+        return timer() - self.time_last_heartbeat
+
+    @property
+    def ekf_ok(self) -> bool:
+        flags = self.__ekf_flags
+        poshorizabs = (flags & mavlink.EKF_POS_HORIZ_ABS) > 0
+        constposmode = (flags & mavlink.EKF_CONST_POS_MODE) > 0
+        predposhorizabs = (flags & mavlink.EKF_PRED_POS_HORIZ_ABS) > 0
+        if self.armed:
+            return poshorizabs and not constposmode
+        return poshorizabs or predposhorizabs
+
+    @property
+    def is_armable(self) -> bool:
+        predposhorizabs = \
+            (self.__ekf_flags & mavlink.EKF_PRED_POS_HORIZ_ABS) > 0
+        return self.mode.name != 'INITIALISING' \
+            and self.gps_fix_type is not None \
+            and self.gps_fix_type > 1 \
+            and predposhorizabs
+
+    def update(self, message: Any) -> None:
+        """
+        Updates the cache using a given pymavlink message.
+        """
+        name = message.get_type()
+        if name == 'HEARTBEAT':
+            if message.type == mavlink.MAV_TYPE_GCS:
+                return
+            self.time_last_heartbeat = timer()
+            self.mav_type = message.type
+            self.system_status = message.system_status
+            self.armed = \
+                (message.base_mode & mavlink.MAV_MODE_FLAG_SAFETY_ARMED) != 0
+            modes = mavutil.mode_mapping_bynumber(message.type) or {}
+            self.mode = Mode(modes.get(message.custom_mode, 'UNKNOWN'))
+        elif name == 'GLOBAL_POSITION_INT':
+            self.location = Locations(Location(message.lat / 1.0e7,
+                                               message.lon / 1.0e7,
+                                               message.relative_alt / 1000.0))
+            self.velocity = [message.vx / 100.0,
+                             message.vy / 100.0,
+                             message.vz / 100.0]
+        elif name == 'ATTITUDE':
+            self.attitude = Attitude(message.pitch,
+                                     message.yaw,
+                                     message.roll)
+        elif name == 'VFR_HUD':
+            self.heading = message.heading
+            self.airspeed = message.airspeed
+            self.groundspeed = message.groundspeed
+        elif name == 'GPS_RAW_INT':
+            self.gps_fix_type = message.fix_type
+        elif name == 'EKF_STATUS_REPORT':
+            self.__ekf_flags = message.flags
+        elif name == 'HOME_POSITION':
+            self.home_location = Location(message.latitude / 1.0e7,
+                                          message.longitude / 1.0e7,
+                                          message.altitude / 1000.0)
+        elif name in ('RC_CHANNELS', 'RC_CHANNELS_RAW'):
+            channels = dict(self.channels)
+            for i in range(1, 9):
+                channels[str(i)] = getattr(message, 'chan{}_raw'.format(i))
+            self.channels = channels
+
+
+class RawMAVLinkConnection(Connection[MAVLinkGeneralMessage]):
+    """
+    Uses pymavlink to provide a MAVLink connection to a system under test.
+    Provides the same interface as MAVLinkConnection, but exposes a
+    VehicleCache, rather than a dronekit.Vehicle, via its `conn` property.
+    """
+    def __init__(self,
+                 url: str,
+                 hooks: HOOK_TYPE = None,
+                 timeout: int = 30
+                 ) -> None:
+        super().__init__(hooks)
+        self.__cache = VehicleCache()
+        self.__lock_send = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__mission_messages = None  # type: Optional[queue.Queue]
+
+        self.__master = mavutil.mavlink_connection(url, source_system=255)
+        heartbeat = self.__master.wait_heartbeat(timeout=timeout)
+        if not heartbeat:
+            self.__master.close()
+            raise NoConnectionError
+        self.__cache.update(heartbeat)
+
+        # ArduPilot only streams telemetry (e.g., GLOBAL_POSITION_INT,
+        # ATTITUDE and RC_CHANNELS) once it has been asked to do so
+        with self.__lock_send:
+            self.__master.mav.request_data_stream_send(
+                self.__master.target_system,
+                self.__master.target_component,
+                mavlink.MAV_DATA_STREAM_ALL, STREAM_RATE, 1)
+
+        self.__receiver = threading.Thread(target=self.__receive)
+        self.__receiver.daemon = True
+        self.__receiver.start()
+        self.__heartbeat = threading.Thread(target=self.__send_heartbeats)
+        self.__heartbeat.daemon = True
+        self.__heartbeat.start()
+
+        # wait for the vehicle to report its home location
+        time_start = timer()
+        while self.__cache.home_location is None:
+            if timer() - time_start > timeout:
+                self.close()
+                raise NoConnectionError
+            self.__send_command(mavlink.MAV_CMD_GET_HOME_POSITION)
+            time.sleep(0.5)
+
+    @property
+    def conn(self) -> VehicleCache:
+        return self.__cache
+
+    @property
+    def last_heartbeat(self) -> float:
+        return self.__cache.last_heartbeat
+
+    def message_type(self, message: MAVLinkGeneralMessage) -> str:
+        if isinstance(message, MAVLinkMessage):
+            return message.name
+        return super().message_type(message)
+
+    def __receive(self) -> None:
+        master = self.__master
+        while not self.__stopped.is_set():
+            try:
+                message = master.recv_match(blocking=True, timeout=0.5)
+            except Exception:
+                if self.__stopped.is_set():
+                    return
+                logger.exception("failed to receive MAVLink message")
+                continue
+            if message is None:
+                continue
+            name = message.get_type()
+            if name == 'BAD_DATA':
+                continue
+            if message.get_srcSystem() != master.target_system:
+                continue
+            self.__cache.update(message)
+            mission_messages = self.__mission_messages
+            if mission_messages and name.startswith('MISSION_'):
+                mission_messages.put(message)
+            self.receive(MAVLinkMessage(name, message))
+
+    def __send_heartbeats(self) -> None:
+        while not self.__stopped.wait(HEARTBEAT_INTERVAL):
+            with self.__lock_send:
+                self.__master.mav.heartbeat_send(
+                    mavlink.MAV_TYPE_GCS, mavlink.MAV_AUTOPILOT_INVALID,
+                    0, 0, 0)
+
+    def __send_command(self, cmd_id: int, *params: float) -> None:
+        params = tuple(params) + (0.0,) * (7 - len(params))
+        master = self.__master
+        with self.__lock_send:
+            master.mav.command_long_send(master.target_system,
+                                         master.target_component,
+                                         cmd_id, 0, *params)
+
+    def send(self, message: MAVLinkGeneralMessage) -> None:
+        if isinstance(message, CommandLong):
+            with self.__lock_send:
+                self.__master.mav.command_long_send(message.target_system,
+                                                    message.target_component,
+                                                    message.cmd_id,
+                                                    message.confirmation,
+                                                    message.param_1,
+                                                    message.param_2,
+                                                    message.param_3,
+                                                    message.param_4,
+                                                    message.param_5,
+                                                    message.param_6,
+                                                    message.param_7)
+
+    def upload_mission(self, items: Sequence[Any], timeout: float) -> None:
+        """
+        Uploads a mission, given as a sequence of MISSION_ITEM messages
+        (e.g., dronekit.Command objects), to the vehicle.
+
+        Raises:
+            TimeoutError: if the upload did not complete within the timeout.
+            ValueError: if the vehicle rejected the mission.
+        """
+        master = self.__master
+        ts = master.target_system
+        tc = master.target_component
+        messages = queue.Queue()  # type: queue.Queue
+        self.__mission_messages = messages
+        try:
+            with self.__lock_send:
+                master.mav.mission_count_send(ts, tc, len(items))
+            time_start = timer()
+            while True:
+                remaining = timeout - (timer() - time_start)
+                if remaining <= 0:
+                    raise TimeoutError("mission upload timed out")
+                try:
+                    message = messages.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+                name = message.get_type()
+                if name in ('MISSION_REQUEST', 'MISSION_REQUEST_INT'):
+                    item = items[message.seq]
+                    with self.__lock_send:
+                        master.mav.mission_item_send(
+                            ts, tc, message.seq, item.frame, item.command,
+                            0, item.autocontinue,
+                            item.param1, item.param2, item.param3,
+                            item.param4, item.x, item.y, item.z)
+                elif name == 'MISSION_ACK':
+                    if message.type != mavlink.MAV_MISSION_ACCEPTED:
+                        m = "vehicle rejected mission: {}"
+                        raise ValueError(m.format(message.type))
+                    return
+        finally:
+            self.__mission_messages = None
+
+    def set_mode(self, name: str, timeout: float) -> bool:
+        """
+        Switches the vehicle to a given flight mode, and waits for the
+        vehicle to report that mode. Returns False if the timeout expires.
+        """
+        mapping = mavutil.mode_mapping_byname(self.__cache.mav_type) or {}
+        mode_id = mapping[name]
+        time_start = timer()
+        while True:
+            with self.__lock_send:
+                self.__master.set_mode(mode_id)
+            if self.__cache.mode.name == name:
+                return True
+            if timer() - time_start >= timeout:
+                return False
+            time.sleep(0.1)
+
+    def arm(self, timeout: float) -> bool:
+        """
+        Arms the vehicle and waits for it to report that it is armed.
+        Returns False if the timeout expires.
+        """
+        time_start = timer()
+        while True:
+            self.__send_command(mavlink.MAV_CMD_COMPONENT_ARM_DISARM, 1)
+            if self.__cache.armed:
+                return True
+            if timer() - time_start >= timeout:
+                return False
+            time.sleep(0.1)
+
+    def close(self) -> None:
+        self.__stopped.set()
+        self.__master.close()
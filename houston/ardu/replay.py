@@ -0,0 +1,150 @@
+"""
+Provides an offline replay engine that rebuilds mission traces from captured
+MAVLink logs (see houston.tlog), without the need for a SITL.
+
+Messages are fed, in order, through a VehicleCache, which plays the role of
+the connection that is read by the variables of a given State class. Command
+boundaries are recovered from the MISSION_CURRENT and MISSION_ITEM_REACHED
+messages within the log, using the same rules as Sandbox.run_and_trace.
+Replay makes it possible to produce traces for new (or modified) State
+definitions from an existing corpus of logs.
+"""
+__all__ = ['ReplayConnection', 'mission_item_mapping', 'replay']
+
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+import logging
+
+from .connection import MAVLinkMessage
+from .raw_connection import VehicleCache, Location
+from ..command import Command
+from ..mission import Mission
+from ..state import State
+from ..tlog import read_tlog
+from ..trace import CommandTrace, MissionTrace
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+
+class ReplayConnection(object):
+    """
+    Mimics the parts of a live connection (or sandbox) that are read by the
+    variables of ArduPilot State classes.
+    """
+    def __init__(self, cache: VehicleCache) -> None:
+        self.__cache = cache
+
+    @property
+    def conn(self) -> VehicleCache:
+        return self.__cache
+
+    @property
+    def connection(self) -> VehicleCache:
+        return self.__cache
+
+
+def mission_item_mapping(commands: Sequence[Command]
+                         ) -> Tuple[int, Dict[int, int]]:
+    """
+    Determines the number of items in the mission that is uploaded to the
+    vehicle for a given sequence of commands, and a mapping from the index of
+    each mission item to the index of the command that produced it. Mirrors
+    the conversion that is performed by Sandbox.run_and_trace: the mission
+    begins with a home waypoint, and each DO command is followed by a delay.
+    """
+    mapping = {}  # type: Dict[int, int]
+    num_items = 1
+    for i, cmd in enumerate(commands):
+        mapping[num_items] = i
+        num_items += 1
+        if 'MAV_CMD_DO_' in cmd.__class__.uid:
+            mapping[num_items] = i
+            num_items += 1
+    return num_items, mapping
+
+
+def replay(mission: Mission,
+           fn_tlog: str,
+           state_cls: Optional[Type[State]] = None,
+           time_offset: float = 0.0
+           ) -> MissionTrace:
+    """
+    Rebuilds the trace for a given mission from a tlog that was captured
+    during its execution.
+
+    Parameters:
+        mission: the mission that was executed.
+        fn_tlog: the name of the tlog file.
+        state_cls: the State class that should be used to describe the
+            states within the trace. Defaults to the state class for the
+            mission's system.
+        time_offset: the time offset of the first message in the log.
+
+    Returns:
+        a trace for the mission. If the log ends before the mission was
+        completed, the trace will only contain those commands that were
+        completed.
+    """
+    if state_cls is None:
+        state_cls = mission.system.state
+    commands = mission.commands
+    num_items, mapping = mission_item_mapping(commands)
+
+    cache = VehicleCache()
+    conn = ReplayConnection(cache)
+    initial = mission.initial_state
+    if 'home_latitude' in initial.variables:
+        cache.home_location = Location(initial['home_latitude'],
+                                       initial['home_longitude'],
+                                       0.0)
+
+    state = None  # type: Optional[State]
+    states = []  # type: List[State]
+    traces = {}  # type: Dict[int, CommandTrace]
+    # [wp that has last been reached, wp running at the moment]
+    last_wp = [0, 0]
+    time_start = None  # type: Optional[float]
+
+    for timestamp, message in read_tlog(fn_tlog):
+        if time_start is None:
+            time_start = timestamp
+        cache.update(message)
+        name = message.get_type()
+        t = time_offset + (timestamp - time_start)
+
+        # some variables cannot be read until the relevant messages arrive
+        try:
+            if state is None:
+                values = {n: v.read(conn)
+                          for (n, v) in state_cls.variables.items()}
+                state = state_cls(time_offset=t, **values)
+            else:
+                state = state.evolve(MAVLinkMessage(name, message), t, conn)
+        except (AttributeError, KeyError, TypeError):
+            pass
+        else:
+            states.append(state)
+
+        # detect the completion of mission items
+        reached = False
+        if name == 'MISSION_ITEM_REACHED':
+            if message.seq == num_items - 1:
+                last_wp[1] = int(message.seq) + 1
+                reached = True
+        elif name == 'MISSION_CURRENT':
+            if message.seq > last_wp[1] and message.seq > last_wp[0]:
+                last_wp[1] = message.seq
+                reached = True
+        if not reached:
+            continue
+
+        if last_wp[0] > 0:
+            cmd_index = mapping[last_wp[0]]
+            traces[cmd_index] = CommandTrace(commands[cmd_index],
+                                             tuple(states))
+        states = []
+        last_wp[0] = last_wp[1]
+        if last_wp[0] > num_items - 1:
+            break
+
+    return MissionTrace(tuple(traces[k] for k in sorted(traces)), fn_tlog)
@@ -1,4 +1,5 @@
-from typing import Optional, Sequence
+from typing import Optional, Sequence, Type, Union, Iterator
+from contextlib import contextmanager
 import time
 from timeit import default_timer as timer
 import os
@@ -6,16 +7,22 @@ import sys
 import threading
 import logging
 
+import attr
 import docker
 import dronekit
 from bugzoo.client import Client as BugZooClient
 from pymavlink import mavutil
 
 from .connection import CommandLong, MAVLinkConnection, MAVLinkMessage
+from .monitor import MissionMonitor
+from .raw_connection import RawMAVLinkConnection
 from ..util import Stopwatch
 from ..sandbox import Sandbox as BaseSandbox
 from ..command import Command, CommandOutcome
 from ..connection import Message
+from ..ingest import Ingestor, IngestionStats
+from ..timeouts import get_timeout_model
+from ..tlog import TlogWriter
 from ..mission import MissionOutcome
 from ..trace import MissionTrace, CommandTrace, TraceRecorder
 from ..exceptions import NoConnectionError, \
@@ -28,6 +35,13 @@ logger.setLevel(logging.DEBUG)
 
 TIME_LOST_CONNECTION = 5.0
 
+# the maximum number of messages that may await state evolution
+INGESTION_CAPACITY = 256
+
+# the number of simulated seconds for which the vehicle may make no progress
+# before a mission is aborted
+STALL_TIME = 60.0
+
 
 def detect_lost_connection(f):
     """
@@ -44,11 +58,18 @@ def detect_lost_connection(f):
 
 
 class Sandbox(BaseSandbox):
+    # the class used to connect to the vehicle. RawMAVLinkConnection may be
+    # used in place of MAVLinkConnection to avoid the overhead of dronekit.
+    connection_cls = \
+        MAVLinkConnection  # type: Type[Union[MAVLinkConnection, RawMAVLinkConnection]]  # noqa: pycodestyle
+
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.__connection = None
+        self.__ingestor = None  # type: Optional[Ingestor[MAVLinkMessage]]
         self.__sitl_thread = None
         self.__fn_log = None  # type: Optional[str]
+        self.__monitor = None  # type: Optional[MissionMonitor]
 
     @property
     def connection(self,
@@ -81,6 +102,16 @@ class Sandbox(BaseSandbox):
             raise NoConnectionError()
         return self.connection.conn
 
+    @property
+    def ingestion_stats(self) -> Optional[IngestionStats]:
+        """
+        Describes the messages that have been used to evolve the state of
+        this sandbox, or None if no connection has been established.
+        """
+        if not self.__ingestor:
+            return None
+        return self.__ingestor.stats()
+
     def read_logs(self) -> str:
         """
         Reads the contents of the log file for this sandbox.
@@ -97,6 +128,9 @@ class Sandbox(BaseSandbox):
             if self.recorder:
                 self.recorder.record_state(state)
                 self.recorder.record_message(message)
+        monitor = self.__monitor
+        if monitor:
+            monitor.observe_state(state)
 
     def _launch_sitl(self,
                      name_bin: str = 'ardurover',
@@ -131,12 +165,13 @@ class Sandbox(BaseSandbox):
 
         docker_client = docker.from_env()  # FIXME
         docker_api = docker_client.api
-        resp = docker_api.exec_create(self.container.id,
-                                      cmd,
-                                      tty=True,
-                                      stdout=True,
-                                      stderr=True)
-        output = docker_api.exec_start(resp['Id'], stream=verbose)
+        with self.timeline.span('sitl'):
+            resp = docker_api.exec_create(self.container.id,
+                                          cmd,
+                                          tty=True,
+                                          stdout=True,
+                                          stderr=True)
+            output = docker_api.exec_start(resp['Id'], stream=verbose)
         logger.debug("started SITL")
         if verbose:
             for line in output:
@@ -185,10 +220,16 @@ class Sandbox(BaseSandbox):
         ip = str(bzc.ip_address(self.container))
         url = "{}:{}:{}".format(protocol, ip, port)
         logger.debug("connecting to SITL at %s", url)
+        # states are evolved on a separate thread, coalescing bursts of
+        # messages of the same type, to avoid blocking dronekit's receiver
+        self.__ingestor = Ingestor(self.update,
+                                   key=lambda m: m.name,
+                                   capacity=INGESTION_CAPACITY)
+        hooks = {'update': self.__ingestor.push}
         try:
-            self.__connection = MAVLinkConnection(url,
-                                                  {'update': self.update},
-                                                  timeout=timeout_mavlink)
+            with self.timeline.span('connect'):
+                self.__connection = \
+                    self.connection_cls(url, hooks, timeout=timeout_mavlink)
         except dronekit.APIException:
             raise NoConnectionError
         # wait for longitude and latitude to match their expected values, and
@@ -199,38 +240,41 @@ class Sandbox(BaseSandbox):
         v = self.state_initial.__class__.variables
 
         # FIXME wait for 3D fix
-        time.sleep(timeout_3d_fix)
+        with self.timeline.span('gps'):
+            time.sleep(timeout_3d_fix)
 
         stopwatch.reset()
         stopwatch.start()
-        while True:
-            ready_lon = v['longitude'].eq(initial_lon, self.state['longitude'])
-            ready_lat = v['latitude'].eq(initial_lat, self.state['latitude'])
-            ready_armable = self.state['armable'] == initial_armable
-            if ready_lon and ready_lat and ready_armable:
-                break
-            if stopwatch.duration > timeout_state:
-                raise VehicleNotReadyError
-            time.sleep(0.05)
+        with self.timeline.span('ready'):
+            while True:
+                ready_lon = \
+                    v['longitude'].eq(initial_lon, self.state['longitude'])
+                ready_lat = \
+                    v['latitude'].eq(initial_lat, self.state['latitude'])
+                ready_armable = self.state['armable'] == initial_armable
+                if ready_lon and ready_lat and ready_armable:
+                    break
+                if stopwatch.duration > timeout_state:
+                    raise VehicleNotReadyError
+                time.sleep(0.05)
 
-        if not self._on_connected():
-            raise PostConnectionSetupFailed
+        with self.timeline.span('post-connect'):
+            if not self._on_connected():
+                raise PostConnectionSetupFailed
 
         # wait until the vehicle is in GUIDED mode
-        guided_mode = dronekit.VehicleMode('GUIDED')
-        self.vehicle.mode = guided_mode
-        stopwatch.reset()
-        stopwatch.start()
-        while self.vehicle.mode != guided_mode:
-            if stopwatch.duration > timeout_set_mode:
+        with self.timeline.span('guided'):
+            if not self.connection.set_mode('GUIDED', timeout_set_mode):
                 raise VehicleNotReadyError
-            time.sleep(0.05)
 
     def stop(self) -> None:
         logger.debug("Stopping SITL")
         bzc = self._bugzoo.containers
         if self.has_connection():
             self.connection.close()
+        if self.__ingestor:
+            self.__ingestor.stop(timeout=5)
+            logger.debug("ingestion stats: %s", self.__ingestor.stats())
         ps_cmd = 'ps aux | grep -i sitl | awk {\'"\'"\'print $2,$11\'"\'"\'}'
 
         out = bzc.command(self.container, ps_cmd)
@@ -255,10 +299,24 @@ class Sandbox(BaseSandbox):
         """
         return True
 
-    @detect_lost_connection
+    @contextmanager
+    def capture(self, filename: str) -> Iterator[TlogWriter]:
+        """
+        Writes every MAVLink message that is received from the vehicle while
+        inside this context to a given tlog file.
+        """
+        writer = TlogWriter(filename)
+        self.connection.add_hook('tlog', lambda m: writer.write(m.message))
+        try:
+            yield writer
+        finally:
+            self.connection.remove_hook('tlog')
+            writer.close()
+
     def run_and_trace(self,
                       commands: Sequence[Command],
-                      collect_coverage: bool = False
+                      collect_coverage: bool = False,
+                      fn_tlog: Optional[str] = None
                       ) -> 'MissionTrace':
         """
         Executes a mission, represented as a sequence of commands, and
@@ -271,10 +329,26 @@ class Sandbox(BaseSandbox):
                 should be incorporated into the trace. If True (i.e., coverage
                 collection is enabled), this function expects the sandbox to be
                 properly instrumented.
+            fn_tlog: the name of the file, if any, to which the raw MAVLink
+                messages received during the mission should be written. The
+                file is linked from the resulting trace.
 
         Returns:
             a trace describing the execution of a sequence of commands.
         """
+        if not fn_tlog:
+            trace = self.__run_and_trace(commands, collect_coverage)
+        else:
+            with self.capture(fn_tlog):
+                trace = self.__run_and_trace(commands, collect_coverage)
+            trace = attr.evolve(trace, tlog=fn_tlog)
+        return attr.evolve(trace, timings=self.timeline.spans)
+
+    @detect_lost_connection
+    def __run_and_trace(self,
+                        commands: Sequence[Command],
+                        collect_coverage: bool
+                        ) -> 'MissionTrace':
         config = self.configuration
         env = self.environment
         speedup = config.speedup
@@ -314,13 +388,9 @@ class Sandbox(BaseSandbox):
                          len(cmds), dronekitcmd_to_cmd_mapping)
 
             # uploading the mission to the vehicle
-            vcmds = self.vehicle.commands
-            vcmds.clear()
-            for cmd in cmds:
-                vcmds.add(cmd)
-            vcmds.upload(timeout=timeout_mission_upload)
+            with self.timeline.span('upload'):
+                self.connection.upload_mission(cmds, timeout_mission_upload)
             logger.debug("Mission uploaded")
-            vcmds.wait_ready()
 
             # maps each wp to the final state and time when wp was reached
             wp_to_state = {}  # Dict[int, Tuple[State, float]]
@@ -332,105 +402,190 @@ class Sandbox(BaseSandbox):
             wp_event = threading.Event()
 
             # NOTE dronekit connection must not use its own heartbeat checking
-            def heartbeat_listener(_, __, value):
-                if value > TIME_LOST_CONNECTION:
-                    connection_lost.set()
-                    wp_event.set()
-            self.vehicle.add_attribute_listener('last_heartbeat',
-                                                heartbeat_listener)
-
-            def check_for_reached(m):
-                name = m.name
-                message = m.message
-                if name == 'MISSION_ITEM_REACHED':
-                    logger.debug("**MISSION_ITEM_REACHED: %d", message.seq)
-                    if message.seq == len(cmds) - 1:
-                        logger.info("Last item reached")
-                        with wp_lock:
-                            last_wp[1] = int(message.seq) + 1
-                            wp_event.set()
-                elif name == 'MISSION_CURRENT':
-                    logger.debug("**MISSION_CURRENT: %d", message.seq)
-                    logger.debug("STATE: {}".format(self.state))
-                    if message.seq > last_wp[1]:
-                        with wp_lock:
-                            if message.seq > last_wp[0]:
-                                last_wp[1] = message.seq
-                                logger.debug("SET EVENT")
+            mission_finished = threading.Event()
+
+            def watch_heartbeat():
+                while not mission_finished.wait(0.1):
+                    if self.connection.last_heartbeat > TIME_LOST_CONNECTION:
+                        connection_lost.set()
+                        wp_event.set()
+                        return
+            watchdog = threading.Thread(target=watch_heartbeat)
+            watchdog.daemon = True
+            watchdog.start()
+
+            # the hooks and watchdog are removed even if the mission fails
+            try:
+
+                def check_for_reached(m):
+                    name = m.name
+                    message = m.message
+                    if name == 'MISSION_ITEM_REACHED':
+                        logger.debug("**MISSION_ITEM_REACHED: %d", message.seq)
+                        if message.seq == len(cmds) - 1:
+                            logger.info("Last item reached")
+                            with wp_lock:
+                                last_wp[1] = int(message.seq) + 1
                                 wp_event.set()
-                elif name == 'MISSION_ACK':
-                    logger.debug("**MISSION_ACK: %s", message.type)
-
-            self.connection.add_hooks({'check_for_reached': check_for_reached})
-
-            stopwatch = Stopwatch()
-            stopwatch.start()
-            self.vehicle.armed = True
-            while not self.vehicle.armed:
-                if stopwatch.duration >= timeout_arm:
-                    raise VehicleNotReadyError
-                logger.debug("waiting for the rover to be armed...")
-                self.vehicle.armed = True
-                time.sleep(0.1)
-
-            # starting the mission
-            self.vehicle.mode = dronekit.VehicleMode("AUTO")
-            initial_state = self.state
-            start_message = CommandLong(
-                0, 0, 300, 0, 1, len(cmds) + 1, 0, 0, 0, 0, 4)
-            self.connection.send(start_message)
-            logger.debug("sent mission start message to vehicle")
-            time_start = timer()
-
-            wp_to_traces = {}
-            with self.record() as recorder:
-                while last_wp[0] <= len(cmds) - 1:
-                    logger.debug("waiting for command")
-                    not_reached_timeout = wp_event.wait(timeout_command)
-                    logger.debug("Event set %s", last_wp)
-                    if not not_reached_timeout:
-                        logger.error("Timeout occured %d", last_wp[0])
-                        break
-                    if connection_lost.is_set():
-                        logger.error("Connection to vehicle was lost.")
-                        raise ConnectionLostError
-                    with wp_lock:
-                        # self.observe()
-                        logger.info("last_wp: %s len: %d",
-                                    str(last_wp),
-                                    len(cmds))
+                    elif name == 'MISSION_CURRENT':
+                        logger.debug("**MISSION_CURRENT: %d", message.seq)
                         logger.debug("STATE: {}".format(self.state))
-                        current_time = timer()
-                        time_passed = current_time - time_start
-                        time_start = current_time
-                        states, messages = recorder.flush()
-                        if last_wp[0] > 0:
-                            cmd_index = dronekitcmd_to_cmd_mapping[last_wp[0]]
-                            wp_to_state[cmd_index] = (self.state, time_passed)
-                            cmd = commands[cmd_index]
-                            trace = CommandTrace(cmd, states)
-                            wp_to_traces[cmd_index] = trace
-
-                            # if appropriate, store coverage files
-                            if collect_coverage:
-                                cm_directory = "command{}".format(cmd_index)
-                                self.__copy_coverage_files(cm_directory)
-
-                        last_wp[0] = last_wp[1]
-                        wp_event.clear()
-
-            self.connection.remove_hook('check_for_reached')
-            logger.debug("Removed hook")
+                        if message.seq > last_wp[1]:
+                            with wp_lock:
+                                if message.seq > last_wp[0]:
+                                    last_wp[1] = message.seq
+                                    logger.debug("SET EVENT")
+                                    wp_event.set()
+                    elif name == 'MISSION_ACK':
+                        logger.debug("**MISSION_ACK: %s", message.type)
+
+                self.connection.add_hook('check_for_reached',
+                                         check_for_reached,
+                                         ['MISSION_ITEM_REACHED',
+                                          'MISSION_CURRENT',
+                                          'MISSION_ACK'])
+
+                # aborts the mission if the vehicle stalls, crashes, or enters
+                # a failsafe
+                monitor = MissionMonitor(speedup,
+                                         STALL_TIME,
+                                         on_abort=lambda a: wp_event.set())
+                self.connection.add_hook('monitor',
+                                         monitor.observe_message,
+                                         ['STATUSTEXT'])
+                self.__monitor = monitor
+                abort = None  # type: Optional[str]
+
+                with self.timeline.span('arm'):
+                    if not self.connection.arm(timeout_arm):
+                        raise VehicleNotReadyError
+
+                # starting the mission
+                self.connection.set_mode('AUTO', timeout=0)
+                initial_state = self.state
+                start_message = CommandLong(
+                    0, 0, 300, 0, 1, len(cmds) + 1, 0, 0, 0, 0, 4)
+                self.connection.send(start_message)
+                logger.debug("sent mission start message to vehicle")
+                time_start = timer()
+
+                wp_to_traces = {}
+                with self.record() as recorder:
+                    while last_wp[0] <= len(cmds) - 1:
+                        logger.debug("waiting for command")
+                        cmd_index = \
+                            dronekitcmd_to_cmd_mapping.get(last_wp[0])
+                        if cmd_index is None:
+                            monitor.expect(None)
+                        else:
+                            monitor.expect(commands[cmd_index])
+                        # use a learned timeout for the last mission item of
+                        # each command (i.e., the item that forms its trace)
+                        timeout = timeout_command
+                        next_index = \
+                            dronekitcmd_to_cmd_mapping.get(last_wp[0] + 1)
+                        if cmd_index is not None and cmd_index != next_index:
+                            learned = \
+                                self.__learned_timeout(commands[cmd_index])
+                            if learned is not None:
+                                timeout = min(learned, timeout_command)
+                        # the event may have been cleared after an abort
+                        not_reached_timeout = \
+                            monitor.abort is not None or wp_event.wait(timeout)
+                        logger.debug("Event set %s", last_wp)
+                        if not not_reached_timeout:
+                            logger.error("Timeout occured %d", last_wp[0])
+                            break
+                        if connection_lost.is_set():
+                            logger.error("Connection to vehicle was lost.")
+                            raise ConnectionLostError
+                        if monitor.abort:
+                            logger.error("Aborted mission: %s",
+                                         monitor.abort.description)
+                            abort = monitor.abort.reason
+                            break
+                        # ensure that the recorder has caught up
+                        if not self.__ingestor.wait_until_idle(timeout=1.0):
+                            logger.warning("state evolution is lagging: %s",
+                                           self.__ingestor.stats())
+                        with wp_lock:
+                            # self.observe()
+                            logger.info("last_wp: %s len: %d",
+                                        str(last_wp),
+                                        len(cmds))
+                            logger.debug("STATE: {}".format(self.state))
+                            current_time = timer()
+                            time_passed = current_time - time_start
+                            time_start = current_time
+                            states, messages = recorder.flush()
+                            if last_wp[0] > 0:
+                                cmd_index = \
+                                    dronekitcmd_to_cmd_mapping[last_wp[0]]
+                                wp_to_state[cmd_index] = \
+                                    (self.state, time_passed)
+                                cmd = commands[cmd_index]
+                                trace = CommandTrace(cmd, states)
+                                wp_to_traces[cmd_index] = trace
+                                self.timeline.record(
+                                    'command',
+                                    current_time - time_passed,
+                                    time_passed,
+                                    cmd.uid)
+
+                                # if appropriate, store coverage files
+                                if collect_coverage:
+                                    cm_directory = \
+                                        "command{}".format(cmd_index)
+                                    with self.timeline.span('coverage'):
+                                        self.__copy_coverage_files(
+                                            cm_directory)
+
+                            last_wp[0] = last_wp[1]
+                            wp_event.clear()
+            finally:
+                self.connection.remove_hook('check_for_reached')
+                self.connection.remove_hook('monitor')
+                self.__monitor = None
+                mission_finished.set()
+                logger.debug("Removed hook")
 
             if collect_coverage:
                 for cmd_index, command in enumerate(commands):
                     if cmd_index in wp_to_traces:
                         directory = 'command{}'.format(cmd_index)
-                        coverage = self.__get_coverage(directory=directory)
+                        with self.timeline.span('coverage'):
+                            coverage = \
+                                self.__get_coverage(directory=directory)
                         wp_to_traces[cmd_index].add_coverage(coverage)
 
             traces = [wp_to_traces[k] for k in sorted(wp_to_traces.keys())]
-            return MissionTrace(tuple(traces))
+            return MissionTrace(tuple(traces), abort=abort)
+
+    def __learned_timeout(self, command: Command) -> Optional[float]:
+        """
+        Uses the learned timeout model, if any, to compute a timeout for a
+        given command, starting from the current state. Returns None if
+        there is no model, or if the model does not cover the command. The
+        timeout is computed by Specification.timeout, which bounds it from
+        below by a fraction of the hand-written timeout.
+        """
+        model = get_timeout_model()
+        if model is None:
+            return None
+        state = self.state
+        env = self.environment
+        config = self.configuration
+        try:
+            spec = command.resolve(state, env, config)
+        except Exception:
+            logger.debug("failed to resolve specification: %s", command)
+            return None
+        if (command.uid, spec.name) not in model:
+            return None
+        timeout = spec.timeout(command, state, env, config)
+        logger.debug("using learned timeout for command [%s]: %.3f",
+                     command, timeout)
+        return timeout
 
     def __get_coverage(self, directory: str) -> "FileLineSet":
         """
@@ -1,18 +1,24 @@
-__all__ = ['Command', 'Parameter', 'CommandOutcome']
+__all__ = ['Command', 'Parameter', 'CommandOutcome', 'SpecificationResolver',
+           'CommandBatch', 'cached_resolution']
 
 from typing import List, Dict, Any, Optional, Type, Generic, \
-    TypeVar, Iterator
+    TypeVar, Iterator, Sequence, Tuple
+from contextlib import contextmanager
 import random
 import logging
+import threading
 
 import attr
+import numpy
 
+from . import exceptions
 from .connection import Message
 from .specification import Specification
 from .configuration import Configuration
 from .state import State
 from .environment import Environment
 from .valueRange import ValueRange
+from .vectorized import CompiledExpression, StateTable
 
 logger = logging.getLogger(__name__)   # type: logging.Logger
 logger.setLevel(logging.DEBUG)
@@ -35,6 +41,15 @@ class Parameter(Generic[T]):
         """
         return self.values.sample(rng)
 
+    def generate_batch(self,
+                       size: int,
+                       rng: numpy.random.Generator
+                       ) -> numpy.ndarray:
+        """
+        Returns an array of randomly-generated values for this parameter.
+        """
+        return self.values.sample_batch(size, rng)
+
     @property
     def type(self) -> Type[T]:
         """
@@ -50,6 +65,95 @@ class Parameter(Generic[T]):
         return "__{}".format(self.name)
 
 
+class SpecificationResolver(object):
+    """
+    Decides which of the specifications for a given command class should be
+    observed when that command is executed in a particular state.
+
+    Specifications are tried in order. Their preconditions are compiled to
+    vectorized predicates (see houston.vectorized) over concrete values for
+    the state and command parameters, the first time that they are used with
+    a given State class. Preconditions that cannot be compiled, or that refer
+    to the state after the command, are decided using Z3.
+    """
+    def __init__(self, specifications: Sequence[Specification]) -> None:
+        self.__specifications = tuple(specifications)
+        self.__deciders = \
+            {}  # type: Dict[Type[State], List[Optional[CompiledExpression]]]
+
+    def __compile(self,
+                  state_cls: Type[State],
+                  command_cls: Type['Command']
+                  ) -> List[Optional[CompiledExpression]]:
+        deciders = []  # type: List[Optional[CompiledExpression]]
+        for spec in self.__specifications:
+            try:
+                compiled = spec.precondition.compile(state_cls, command_cls)
+            except exceptions.UnsupportedExpression:
+                logger.debug("using Z3 for precondition of spec [%s]",
+                             spec.name)
+                compiled = None
+            if compiled is not None and compiled.uses_state_after:
+                compiled = None
+            deciders.append(compiled)
+        return deciders
+
+    def resolve(self,
+                command: 'Command',
+                state: State,
+                environment: Environment,
+                config: Configuration
+                ) -> Specification:
+        state_cls = state.__class__
+        try:
+            deciders = self.__deciders[state_cls]
+        except KeyError:
+            deciders = self.__compile(state_cls, command.__class__)
+            self.__deciders[state_cls] = deciders
+
+        table = None  # type: Optional[StateTable]
+        for spec, decider in zip(self.__specifications, deciders):
+            if decider is None:
+                sat = spec.precondition.is_satisfied(command,
+                                                     state,
+                                                     None,
+                                                     environment,
+                                                     config)
+            else:
+                if table is None:
+                    table = StateTable.from_states([state])
+                sat = bool(decider.evaluate(command, state, table)[0])
+            if sat:
+                return spec
+        raise Exception("failed to resolve specification")
+
+
+class _ResolutionCache(threading.local):
+    def __init__(self) -> None:
+        self.entries = \
+            None  # type: Optional[Dict[Tuple[Any, ...], Specification]]
+
+
+_RESOLUTION_CACHE = _ResolutionCache()
+
+
+@contextmanager
+def cached_resolution() -> Iterator[None]:
+    """
+    Caches the specifications that are resolved by Command.resolve on the
+    current thread, for each pair of command and state, until the context is
+    closed. Nested contexts share the cache of the outermost context.
+    """
+    if _RESOLUTION_CACHE.entries is not None:
+        yield
+        return
+    _RESOLUTION_CACHE.entries = {}
+    try:
+        yield
+    finally:
+        _RESOLUTION_CACHE.entries = None
+
+
 class CommandMeta(type):
     def __new__(mcl,
                 cls_name: str,
@@ -133,6 +237,7 @@ class CommandMeta(type):
 
         # FIXME build a FrozenDict
         ns['specifications'] = list(specs)
+        ns['resolver'] = SpecificationResolver(specs)
         logger.debug("built specifications")
 
         logger.debug("constructing properties")
@@ -345,16 +450,22 @@ class Command(object, metaclass=CommandMeta):
         """
         Returns the specification that the system is expected to satisfy when
         completing this command in a given state, environment, and
-        configuration.
+        configuration. Within a cached_resolution context, the specification
+        for a given command and state is only resolved once.
         """
-        for spec in self.__class__.specifications:
-            if spec.precondition.is_satisfied(self,
-                                              state,
-                                              None,
-                                              environment,
-                                              config):
-                return spec
-        raise Exception("failed to resolve specification")
+        resolver = self.__class__.resolver  # type: SpecificationResolver
+        cache = _RESOLUTION_CACHE.entries
+        if cache is None:
+            return resolver.resolve(self, state, environment, config)
+
+        params = tuple(self[p.name] for p in self.__class__.parameters)
+        key = (self.__class__, params, state)
+        try:
+            return cache[key]
+        except KeyError:
+            spec = resolver.resolve(self, state, environment, config)
+            cache[key] = spec
+            return spec
 
     def to_message(self) -> Message:
         """
@@ -372,6 +483,58 @@ class Command(object, metaclass=CommandMeta):
         command = cls(**params)
         return command
 
+    @classmethod
+    def generate_batch(cls,
+                       size: int,
+                       rng: numpy.random.Generator
+                       ) -> 'CommandBatch':
+        """
+        Generates a batch of commands of this type, using a NumPy random
+        generator. Parameter values are sampled as arrays, and commands are
+        only constructed when they are accessed.
+        """
+        params = {p.name: p.generate_batch(size, rng) for p in cls.parameters}
+        return CommandBatch(cls, size, params)
+
+
+class CommandBatch(object):
+    """
+    A batch of commands of a single type, stored as an array of values for
+    each parameter. Individual commands are materialised on demand.
+    """
+    def __init__(self,
+                 command_class: Type[Command],
+                 size: int,
+                 parameters: Dict[str, numpy.ndarray]
+                 ) -> None:
+        assert all(len(values) == size for values in parameters.values())
+        self.__command_class = command_class
+        self.__size = size
+        self.__parameters = parameters
+
+    @property
+    def command_class(self) -> Type[Command]:
+        return self.__command_class
+
+    @property
+    def parameters(self) -> Dict[str, numpy.ndarray]:
+        """
+        The values of each parameter, indexed by the name of the parameter.
+        """
+        return dict(self.__parameters)
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __getitem__(self, index: int) -> Command:
+        params = {name: values[index].item()
+                  for (name, values) in self.__parameters.items()}
+        return self.__command_class(**params)
+
+    def __iter__(self) -> Iterator[Command]:
+        for i in range(self.__size):
+            yield self[i]
+
 
 @attr.s(frozen=True)
 class CommandOutcome(object):
@@ -386,16 +549,18 @@ class CommandOutcome(object):
     time_elapsed = attr.ib(type=float)  # FIXME use time delta
 
     @staticmethod
-    def from_json(jsn: Dict[str, Any]) -> 'CommandOutcome':
-        return CommandOutcome(Command.from_json(jsn['command']),
-                              jsn['successful'],
-                              State.from_json(jsn['start_state']),
-                              State.from_json(jsn['end_state']),
-                              jsn['time_elapsed'])
-
-    def to_json(self) -> Dict[str, Any]:
-        return {'command': self.__command.to_json(),
-                'successful': self.__successful,
-                'start_state': self.start_state.to_json(),
-                'end_state': self.end_state.to_json(),
-                'time_elapsed': self.__time_elapsed}
+    def from_dict(d: Dict[str, Any],
+                  system: Type['System']
+                  ) -> 'CommandOutcome':
+        return CommandOutcome(Command.from_dict(d['command']),
+                              d['successful'],
+                              system.state.from_dict(d['start_state']),
+                              system.state.from_dict(d['end_state']),
+                              d['time_elapsed'])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'command': self.command.to_dict(),
+                'successful': self.successful,
+                'start_state': self.start_state.to_dict(),
+                'end_state': self.end_state.to_dict(),
+                'time_elapsed': self.time_elapsed}
@@ -1,9 +1,12 @@
 __all__ = ['Message', 'Connection']
 
-from typing import Generic, TypeVar, List, Callable, Dict
+from typing import Generic, TypeVar, List, Callable, Dict, Optional, \
+    Iterable, Tuple, FrozenSet, Set
+from collections import OrderedDict
 import threading
 
 T = TypeVar('T')
+Hook = Callable[[T], None]
 
 
 class Message(object):
@@ -15,8 +18,18 @@ class Message(object):
 class Connection(Generic[T]):
     """
     Provides a connection to the system under test using a given protocol.
+
+    Hooks may either subscribe to all messages, or to messages of particular
+    types (as determined by `message_type`). Hooks are dispatched using an
+    immutable table, mapping each message type to the tuple of hooks that
+    should be called for it. The table is replaced (rather than modified)
+    whenever hooks are added or removed, allowing messages to be dispatched
+    without holding a lock.
     """
-    def __init__(self, hooks: Dict[str, Callable[[T], None]]) -> None:
+    def __init__(self,
+                 hooks: Dict[str, Callable[[T], None]],
+                 message_types: Optional[Iterable[str]] = None
+                 ) -> None:
         """
         Establishes a new connection.
 
@@ -24,18 +37,38 @@ class Connection(Generic[T]):
             hooks: A dictionary of string (name of the hook) to callables
                 that should be callednupon receiving a message via this
                 connection.
+            message_types: The types of message to which the given hooks
+                should subscribe. If left unspecified, the hooks will be
+                called for every message.
         """
         self.__lock = threading.Lock()
-        self.__hooks = hooks if hooks else {}
+        # maps the name of each hook to its subscribed types and callable
+        self.__hooks = \
+            OrderedDict()  # type: Dict[str, Tuple[Optional[FrozenSet[str]], Hook]]  # noqa: pycodestyle
+        # a pair containing the dispatch table and the tuple of hooks that
+        # should be used for messages whose type does not appear in it
+        self.__dispatch = \
+            ({}, ())  # type: Tuple[Dict[str, Tuple[Hook, ...]], Tuple[Hook, ...]]  # noqa: pycodestyle
+        if hooks:
+            self.add_hooks(hooks, message_types)
+
+    def message_type(self, message: T) -> str:
+        """
+        Returns the name of the type of a given message, used to determine
+        the hooks to which that message should be dispatched.
+        """
+        return message.__class__.__name__
 
     def receive(self, message: T) -> None:
         """
         Forwards any received messages using the hooks attached to this
         connection.
         """
-        with self.__lock:
-            for hook in self.__hooks.values():
-                hook(message)
+        # the table is never mutated; reading the reference is atomic
+        table, wildcard = self.__dispatch
+        hooks = table.get(self.message_type(message), wildcard)
+        for hook in hooks:
+            hook(message)
 
     def send(self, message: T) -> None:
         """
@@ -49,13 +82,49 @@ class Connection(Generic[T]):
         """
         raise NotImplementedError
 
-    def add_hooks(self, hooks: Dict[str, Callable[[T], None]]) -> None:
+    def __rebuild(self) -> None:
+        """
+        Rebuilds the dispatch table. Should be called with the lock.
+        Hooks are called in the order in which they were added.
+        """
+        hooks = list(self.__hooks.values())
+        wildcard = tuple(h for (types, h) in hooks if types is None)
+        message_types = set()  # type: Set[str]
+        for (types, _) in hooks:
+            if types is not None:
+                message_types.update(types)
+        table = {t: tuple(h for (types, h) in hooks
+                          if types is None or t in types)
+                 for t in message_types}
+        self.__dispatch = (table, wildcard)
+
+    def add_hook(self,
+                 name: str,
+                 hook: Callable[[T], None],
+                 message_types: Optional[Iterable[str]] = None
+                 ) -> None:
+        """
+        Adds a named hook that should be called whenever a message of one of
+        the given types is received. If no types are given, the hook will be
+        called for every message.
+        """
+        self.add_hooks({name: hook}, message_types)
+
+    def add_hooks(self,
+                  hooks: Dict[str, Callable[[T], None]],
+                  message_types: Optional[Iterable[str]] = None
+                  ) -> None:
         """
         Adds a dictionary of hooks to the set of hooks to be called
         when messages are received.
         """
+        types = frozenset(message_types) if message_types is not None \
+            else None
         with self.__lock:
-            self.__hooks.update(hooks)
+            for (name, hook) in hooks.items():
+                self.__hooks.pop(name, None)
+                self.__hooks[name] = (types, hook)
+            self.__rebuild()
 
     def remove_hook(self, hook_name: str) -> None:
         """
@@ -64,3 +133,4 @@ class Connection(Generic[T]):
         with self.__lock:
             if hook_name in self.__hooks:
                 self.__hooks.pop(hook_name)
+                self.__rebuild()
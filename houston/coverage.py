@@ -0,0 +1,511 @@
+__all__ = ['LineIndex', 'CoverageBitset', 'CoverageMatrix',
+           'MissionCoverageIndex', 'lines_modified_by_diff', 'popcount']
+
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Sequence, \
+    Set, Union
+import base64
+import json
+import os
+import re
+import threading
+import logging
+
+import numpy as np
+from bugzoo.core.fileline import FileLine, FileLineSet
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+# the number of set bits within each possible byte value
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+# matches the header of a hunk within a unified diff
+_HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+def popcount(bits: np.ndarray) -> np.ndarray:
+    """
+    Returns the number of set bits within an array of packed bits, counted
+    along its last axis (e.g., the number of set bits in each row of a
+    two-dimensional array).
+    """
+    return _POPCOUNT[bits].sum(axis=-1, dtype=np.int64)
+
+
+def _num_bytes(num_bits: int) -> int:
+    return (num_bits + 7) // 8
+
+
+def _pad(bits: np.ndarray, num_bytes: int) -> np.ndarray:
+    """
+    Right-pads a packed bit array with zero bytes to a given length.
+    """
+    if bits.shape[-1] >= num_bytes:
+        return bits
+    width = [(0, 0)] * (bits.ndim - 1) + [(0, num_bytes - bits.shape[-1])]
+    return np.pad(bits, width, mode='constant')
+
+
+class LineIndex(object):
+    """
+    Interns (file, line) pairs as dense integer identifiers, allowing
+    coverage to be represented as packed bit arrays. Identifiers are
+    assigned in order of first appearance and are never reused, so bit
+    arrays built against an earlier version of the index remain valid as the
+    index grows.
+    """
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> 'LineIndex':
+        index = LineIndex()
+        for fn, num in d['lines']:
+            index.add(FileLine(fn, num))
+        return index
+
+    def __init__(self, lines: Optional[Iterable[FileLine]] = None) -> None:
+        self.__lock = threading.Lock()
+        self.__line_to_id = {}  # type: Dict[FileLine, int]
+        self.__lines = []  # type: List[FileLine]
+        if lines:
+            for line in lines:
+                self.add(line)
+
+    def __len__(self) -> int:
+        return len(self.__lines)
+
+    def __iter__(self) -> Iterator[FileLine]:
+        yield from self.__lines[:]
+
+    def __contains__(self, line: object) -> bool:
+        return line in self.__line_to_id
+
+    def __getitem__(self, line: FileLine) -> int:
+        """
+        Returns the identifier of a given line.
+
+        Raises:
+            KeyError: if the line has not been added to this index.
+        """
+        return self.__line_to_id[line]
+
+    def line(self, i: int) -> FileLine:
+        """
+        Returns the line associated with a given identifier.
+        """
+        return self.__lines[i]
+
+    def add(self, line: FileLine) -> int:
+        """
+        Returns the identifier for a given line, adding that line to the index
+        if it is not already present.
+        """
+        try:
+            return self.__line_to_id[line]
+        except KeyError:
+            pass
+        with self.__lock:
+            if line not in self.__line_to_id:
+                self.__line_to_id[line] = len(self.__lines)
+                self.__lines.append(line)
+            return self.__line_to_id[line]
+
+    def ids(self,
+            lines: Iterable[FileLine],
+            add: bool = True
+            ) -> np.ndarray:
+        """
+        Returns an array of the identifiers for a collection of lines. If
+        `add` is False, lines that are not in the index are ignored.
+        """
+        if add:
+            ids = [self.add(line) for line in lines]
+        else:
+            ids = [self.__line_to_id[line] for line in lines
+                   if line in self.__line_to_id]
+        return np.array(ids, dtype=np.int64)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'lines': [[line.filename, line.num] for line in self.__lines]}
+
+
+class CoverageBitset(object):
+    """
+    An immutable set of covered lines, stored as a packed bit array over the
+    identifiers of a shared LineIndex.
+    """
+    @staticmethod
+    def from_file_lines(index: LineIndex,
+                        lines: Iterable[FileLine]
+                        ) -> 'CoverageBitset':
+        """
+        Builds a bitset from a collection of lines (e.g., a FileLineSet),
+        adding any unseen lines to the given index.
+        """
+        ids = index.ids(lines)
+        size = len(index)
+        unpacked = np.zeros(size, dtype=np.uint8)
+        unpacked[ids] = 1
+        return CoverageBitset(index, np.packbits(unpacked))
+
+    @staticmethod
+    def from_dict(index: LineIndex, d: Dict[str, Any]) -> 'CoverageBitset':
+        raw = base64.b64decode(d['bits'].encode('ascii'))
+        bits = np.frombuffer(raw, dtype=np.uint8).copy()
+        return CoverageBitset(index, bits)
+
+    def __init__(self, index: LineIndex, bits: np.ndarray) -> None:
+        assert bits.dtype == np.uint8
+        assert bits.ndim == 1
+        self.__index = index
+        self.__bits = bits
+        self.__bits.setflags(write=False)
+
+    @property
+    def index(self) -> LineIndex:
+        """
+        The index used to interpret the bits of this set.
+        """
+        return self.__index
+
+    @property
+    def bits(self) -> np.ndarray:
+        """
+        A read-only, packed bit array describing the contents of this set.
+        """
+        return self.__bits
+
+    def padded(self, num_lines: int) -> np.ndarray:
+        """
+        Returns the packed bits of this set, padded to cover a given number of
+        lines.
+        """
+        return _pad(self.__bits, _num_bytes(num_lines))
+
+    def ids(self) -> np.ndarray:
+        """
+        Returns a sorted array of the identifiers of the lines in this set.
+        """
+        return np.flatnonzero(np.unpackbits(self.__bits))
+
+    def __len__(self) -> int:
+        return int(popcount(self.__bits))
+
+    def __iter__(self) -> Iterator[FileLine]:
+        for i in self.ids():
+            yield self.__index.line(int(i))
+
+    def __contains__(self, line: object) -> bool:
+        if line not in self.__index:
+            return False
+        i = self.__index[line]
+        byte, offset = divmod(i, 8)
+        if byte >= self.__bits.shape[0]:
+            return False
+        return bool(self.__bits[byte] & (0x80 >> offset))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CoverageBitset):
+            return False
+        size = max(self.__bits.shape[0], other.bits.shape[0])
+        return bool(np.array_equal(_pad(self.__bits, size),
+                                   _pad(other.bits, size)))
+
+    def __hash__(self) -> int:
+        return hash(np.trim_zeros(self.__bits, 'b').tobytes())
+
+    def __combine(self, others: Sequence['CoverageBitset'], op) -> np.ndarray:
+        assert all(o.index is self.__index for o in others)
+        size = max([self.__bits.shape[0]] + [o.bits.shape[0] for o in others])
+        bits = _pad(self.__bits, size)
+        for other in others:
+            bits = op(bits, _pad(other.bits, size))
+        return bits
+
+    def union(self, *others: 'CoverageBitset') -> 'CoverageBitset':
+        bits = self.__combine(others, np.bitwise_or)
+        return CoverageBitset(self.__index, bits)
+
+    def intersection(self, *others: 'CoverageBitset') -> 'CoverageBitset':
+        bits = self.__combine(others, np.bitwise_and)
+        return CoverageBitset(self.__index, bits)
+
+    def difference(self, *others: 'CoverageBitset') -> 'CoverageBitset':
+        bits = self.__combine(others,
+                              lambda x, y: np.bitwise_and(x, ~y))
+        return CoverageBitset(self.__index, bits)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def to_file_lines(self) -> FileLineSet:
+        return FileLineSet.from_iter(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns a compact, JSON-ready description of this set. The index
+        must be serialised separately.
+        """
+        bits = np.trim_zeros(self.__bits, 'b')
+        return {'bits': base64.b64encode(bits.tobytes()).decode('ascii')}
+
+
+class CoverageMatrix(object):
+    """
+    Stores the coverage of a sequence of executions (e.g., missions or
+    commands) as a (rows x lines) packed bit matrix, allowing aggregate
+    queries to be computed for all lines at once.
+    """
+    @staticmethod
+    def from_bitsets(index: LineIndex,
+                     rows: Sequence[CoverageBitset]
+                     ) -> 'CoverageMatrix':
+        matrix = CoverageMatrix(index)
+        for row in rows:
+            matrix.append(row)
+        return matrix
+
+    def __init__(self, index: LineIndex) -> None:
+        self.__index = index
+        self.__rows = []  # type: List[np.ndarray]
+        self.__cache = None  # type: Optional[np.ndarray]
+
+    @property
+    def index(self) -> LineIndex:
+        return self.__index
+
+    def __len__(self) -> int:
+        """
+        Returns the number of rows in this matrix.
+        """
+        return len(self.__rows)
+
+    def __getitem__(self, i: int) -> CoverageBitset:
+        return CoverageBitset(self.__index, self.__rows[i])
+
+    def append(self, coverage: CoverageBitset) -> int:
+        """
+        Appends a row to this matrix and returns its position.
+        """
+        assert coverage.index is self.__index
+        self.__rows.append(coverage.bits)
+        self.__cache = None
+        return len(self.__rows) - 1
+
+    def packed(self) -> np.ndarray:
+        """
+        Returns the contents of this matrix as a (rows x bytes) array of
+        packed bits, covering every line in the index.
+        """
+        num_bytes = _num_bytes(len(self.__index))
+        cache = self.__cache
+        if cache is None or cache.shape != (len(self.__rows), num_bytes):
+            cache = np.zeros((len(self.__rows), num_bytes), dtype=np.uint8)
+            for i, row in enumerate(self.__rows):
+                cache[i, :row.shape[0]] = row
+            self.__cache = cache
+        return cache
+
+    def unpacked(self) -> np.ndarray:
+        """
+        Returns the contents of this matrix as a (rows x lines) boolean array.
+        """
+        num_lines = len(self.__index)
+        bits = np.unpackbits(self.packed(), axis=1)[:, :num_lines]
+        return bits.astype(np.bool_)
+
+    def hits(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Returns the number of rows that cover each line in the index.
+
+        Parameters:
+            rows: an optional boolean mask or array of row positions that
+                should be included in the count. If omitted, all rows are
+                counted.
+        """
+        bits = self.unpacked()
+        if rows is not None:
+            bits = bits[rows]
+        return bits.sum(axis=0, dtype=np.int64)
+
+    def counts(self) -> np.ndarray:
+        """
+        Returns the number of lines covered by each row.
+        """
+        return popcount(self.packed())
+
+    def union(self, rows: Optional[np.ndarray] = None) -> CoverageBitset:
+        packed = self.packed()
+        if rows is not None:
+            packed = packed[rows]
+        bits = np.bitwise_or.reduce(packed, axis=0) if len(packed) else \
+            np.zeros(packed.shape[1], dtype=np.uint8)
+        return CoverageBitset(self.__index, bits)
+
+    def intersection(self, rows: Optional[np.ndarray] = None
+                     ) -> CoverageBitset:
+        packed = self.packed()
+        if rows is not None:
+            packed = packed[rows]
+        bits = np.bitwise_and.reduce(packed, axis=0) if len(packed) else \
+            np.zeros(packed.shape[1], dtype=np.uint8)
+        return CoverageBitset(self.__index, bits)
+
+
+class MissionCoverageIndex(object):
+    """
+    A persistent inverted index from source lines to the missions whose
+    coverage includes those lines. Missions are identified by their digest
+    (see Mission.digest).
+    """
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> 'MissionCoverageIndex':
+        index = LineIndex.from_dict(d['lines'])
+        missions = MissionCoverageIndex(index)
+        for digest, bits in d['missions'].items():
+            missions.add(digest, CoverageBitset.from_dict(index, bits))
+        return missions
+
+    @staticmethod
+    def from_file(filename: str) -> 'MissionCoverageIndex':
+        with open(filename, 'r') as f:
+            return MissionCoverageIndex.from_dict(json.load(f))
+
+    def __init__(self, index: Optional[LineIndex] = None) -> None:
+        self.__index = index if index is not None else LineIndex()
+        self.__matrix = CoverageMatrix(self.__index)
+        self.__digests = []  # type: List[str]
+        self.__digest_to_row = {}  # type: Dict[str, int]
+
+    @property
+    def index(self) -> LineIndex:
+        return self.__index
+
+    def __len__(self) -> int:
+        return len(self.__digests)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.__digests[:]
+
+    def __contains__(self, digest: object) -> bool:
+        return digest in self.__digest_to_row
+
+    def __getitem__(self, digest: str) -> CoverageBitset:
+        return self.__matrix[self.__digest_to_row[digest]]
+
+    def add(self,
+            digest: str,
+            coverage: Union[FileLineSet, CoverageBitset]
+            ) -> None:
+        """
+        Adds the coverage of a given mission to this index. If the mission is
+        already indexed, its coverage is extended with the given coverage.
+        """
+        if not isinstance(coverage, CoverageBitset):
+            coverage = CoverageBitset.from_file_lines(self.__index, coverage)
+        if digest in self.__digest_to_row:
+            coverage = coverage.union(self[digest])
+            self.__rebuild(digest, coverage)
+            return
+        self.__digest_to_row[digest] = self.__matrix.append(coverage)
+        self.__digests.append(digest)
+
+    def __rebuild(self, digest: str, coverage: CoverageBitset) -> None:
+        rows = [self[d] if d != digest else coverage for d in self.__digests]
+        self.__matrix = CoverageMatrix.from_bitsets(self.__index, rows)
+
+    def missions_covering(self, lines: Iterable[FileLine]) -> Set[str]:
+        """
+        Returns the digests of all indexed missions that cover at least one of
+        the given lines.
+        """
+        ids = self.__index.ids(lines, add=False)
+        if ids.shape[0] == 0 or not self.__digests:
+            return set()
+        packed = self.__matrix.packed()
+        masks = np.right_shift(0x80, ids % 8).astype(np.uint8)
+        hits = np.bitwise_and(packed[:, ids // 8], masks) != 0
+        rows = np.flatnonzero(hits.any(axis=1))
+        return set(self.__digests[i] for i in rows)
+
+    def to_dict(self) -> Dict[str, Any]:
+        missions = {d: self[d].to_dict() for d in self.__digests}
+        return {'lines': self.__index.to_dict(), 'missions': missions}
+
+    def to_file(self, filename: str) -> None:
+        """
+        Atomically writes this index to a given file.
+        """
+        fn_temp = '{}.tmp'.format(filename)
+        with open(fn_temp, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(fn_temp, filename)
+
+
+def _diff_path(line: str) -> Optional[str]:
+    """
+    Returns the path given by a file header (i.e., a '--- ' or '+++ ' line)
+    within a unified diff, or None if that path is /dev/null.
+    """
+    path = line[4:].split('\t')[0].strip()
+    if path == '/dev/null':
+        return None
+    if path.startswith('a/') or path.startswith('b/'):
+        path = path[2:]
+    return path
+
+
+def lines_modified_by_diff(diff: str) -> FileLineSet:
+    """
+    Returns the set of original source lines that are touched by a given
+    unified diff. Deleted (or replaced) lines are reported directly; pure
+    insertions are attributed to the original lines on either side of the
+    insertion point. Files that are created by the diff have no original
+    lines, and so contribute nothing.
+    """
+    modified = {}  # type: Dict[str, Set[int]]
+    filename = None  # type: Optional[str]
+    line_num = 0
+    replacing = False
+    # the number of original and new lines that remain in the current hunk
+    old_remaining = 0
+    new_remaining = 0
+    for line in diff.split('\n'):
+        # file headers may only appear outside of a hunk; within a hunk,
+        # a removed line that begins with "-- " also begins with "--- "
+        if old_remaining <= 0 and new_remaining <= 0:
+            if line.startswith('--- '):
+                filename = _diff_path(line)
+                if filename is not None:
+                    modified.setdefault(filename, set())
+            elif line.startswith('@@ -'):
+                match = _HUNK_HEADER.match(line)
+                if not match:
+                    continue
+                old_start, old_count, _, new_count = match.groups()
+                old_remaining = int(old_count or 1)
+                new_remaining = int(new_count or 1)
+                # an empty original range refers to the line that precedes
+                # the insertion
+                line_num = int(old_start)
+                if old_remaining == 0:
+                    line_num += 1
+                replacing = False
+            continue
+
+        if line.startswith('-'):
+            old_remaining -= 1
+            if filename is not None:
+                modified[filename].add(line_num)
+            line_num += 1
+            replacing = True
+        elif line.startswith('+'):
+            new_remaining -= 1
+            if filename is not None and not replacing:
+                modified[filename].update([max(line_num - 1, 1), line_num])
+        elif line.startswith(' ') or line == '':
+            # some tools strip the trailing space from empty context lines
+            old_remaining -= 1
+            new_remaining -= 1
+            line_num += 1
+            replacing = False
+    return FileLineSet(modified)
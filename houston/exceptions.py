@@ -72,3 +72,22 @@ class UnsupportedVariableType(HoustonException):
         msg = "Houston and/or Z3 does not support variable type: {}"
         msg = msg.format(type_py.__name__)
         super().__init__(msg)
+
+
+class UnsupportedExpression(HoustonException):
+    """
+    The s-expression uses a feature that is not supported by the vectorized
+    evaluator.
+    """
+    def __init__(self, reason: str) -> None:
+        msg = "Unsupported s-expression: {}".format(reason)
+        super().__init__(msg)
+
+
+class OutcomeSinkError(HoustonException):
+    """
+    The writer thread of an outcome sink failed to write a record to disk.
+    """
+    def __init__(self, reason: str) -> None:
+        msg = "Failed to write outcomes to disk: {}".format(reason)
+        super().__init__(msg)
@@ -0,0 +1,262 @@
+"""
+Provides fingerprints for missions, and an index that uses those fingerprints
+to detect near-duplicate missions (e.g., missions whose waypoints differ by a
+few centimetres) before they are executed.
+
+The continuous parameters of each command are quantised: parameters that
+correspond to a noisy state variable (e.g., the latitude of a waypoint) are
+quantised by the noise of that variable, since the oracle cannot distinguish
+values that differ by less than that noise; all other continuous parameters
+are quantised by a fixed fraction of their range. Two missions are near
+duplicates if they share the same commands, discrete parameter values and
+context (i.e., configuration, environment and initial state), and each of
+their continuous parameters differs by no more than one quantum.
+
+Near duplicates are found using locality-sensitive hashing: each of several
+hash tables quantises missions onto a randomly offset grid, so that missions
+that straddle a grid boundary in one table are likely to share a cell in
+another.
+"""
+__all__ = ['MissionFingerprint', 'MissionFingerprinter', 'NearDuplicateIndex',
+           'deduplicate']
+
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, \
+    Tuple, Type
+import hashlib
+import json
+import threading
+
+import attr
+import numpy
+
+from .command import Command, Parameter
+from .mission import Mission
+from .system import System
+from .valueRange import ContinuousValueRange
+
+# the names of state variables that are measured by parameters with a
+# different name
+PARAMETER_ALIASES = {
+    'lat': 'latitude',
+    'lon': 'longitude',
+    'alt': 'altitude'
+}  # type: Dict[str, str]
+
+# identifies a cell within an LSH table
+Key = Tuple[Hashable, Tuple[int, ...]]
+
+
+@attr.s(frozen=True)
+class MissionFingerprint(object):
+    """
+    Describes a mission in terms of its behaviourally-relevant structure.
+
+    Attributes:
+        signature: the context of the mission, the types of its commands, and
+            the values of their discrete parameters. Only missions with the
+            same signature can be near duplicates.
+        values: the values of the continuous parameters of the mission, in
+            units of their quanta.
+    """
+    signature = attr.ib(type=Hashable)
+    values = attr.ib(type=numpy.ndarray, eq=False)
+
+
+class MissionFingerprinter(object):
+    """
+    Computes fingerprints for the missions of a given system.
+    """
+    def __init__(self,
+                 system: Type[System],
+                 resolution: int = 1000,
+                 scale: float = 1.0
+                 ) -> None:
+        """
+        Parameters:
+            system: the system under test.
+            resolution: the number of quanta into which the range of each
+                continuous parameter without a corresponding noisy state
+                variable is divided.
+            scale: a multiplier for all quanta; values below one make the
+                fingerprints more discerning.
+        """
+        assert resolution > 0
+        assert scale > 0
+        self.__system = system
+        self.__resolution = resolution
+        self.__scale = scale
+        self.__lock = threading.Lock()
+        self.__quanta = {}  # type: Dict[Type[Command], List[Tuple[Parameter, Optional[float]]]]  # noqa: pycodestyle
+        # the digest of each context, indexed by the identities of its parts,
+        # along with references to those parts (to keep the identities valid)
+        self.__contexts = {}  # type: Dict[Tuple[int, int, int], Tuple[str, Any]]  # noqa: pycodestyle
+
+    def quantum(self, parameter: Parameter) -> Optional[float]:
+        """
+        Returns the quantum for a given parameter, or None if the parameter is
+        discrete.
+        """
+        values = parameter.values
+        if not isinstance(values, ContinuousValueRange):
+            return None
+        name = PARAMETER_ALIASES.get(parameter.name, parameter.name)
+        variables = self.__system.state.variables
+        if name in variables and variables[name].noise:
+            quantum = variables[name].noise
+        else:
+            width = values.max_value - values.min_value
+            quantum = width / self.__resolution
+        return quantum * self.__scale
+
+    def __command_quanta(self,
+                         command_class: Type[Command]
+                         ) -> List[Tuple[Parameter, Optional[float]]]:
+        with self.__lock:
+            try:
+                return self.__quanta[command_class]
+            except KeyError:
+                pass
+        # parameters are stored as a set, so they are sorted by name to give
+        # fingerprints the same layout in every process
+        params = sorted(command_class.parameters, key=lambda p: p.name)
+        quanta = [(p, self.quantum(p)) for p in params]
+        with self.__lock:
+            self.__quanta[command_class] = quanta
+        return quanta
+
+    def __context(self, mission: Mission) -> str:
+        # missions produced by a generator usually share the same context
+        # objects, so their digests are cached by identity
+        parts = (mission.initial_state,
+                 mission.environment,
+                 mission.configuration)
+        key = (id(parts[0]), id(parts[1]), id(parts[2]))
+        with self.__lock:
+            entry = self.__contexts.get(key)
+        if entry is not None:
+            return entry[0]
+
+        jsn = {'environment': mission.environment.to_json(),
+               'configuration': mission.configuration.to_dict(),
+               'initial_state': mission.initial_state.to_dict()}
+        h = hashlib.sha1(json.dumps(jsn, sort_keys=True).encode('utf-8'))
+        digest = h.hexdigest()
+        with self.__lock:
+            self.__contexts[key] = (digest, parts)
+        return digest
+
+    def fingerprint(self, mission: Mission) -> MissionFingerprint:
+        signature = [self.__context(mission)]  # type: List[Any]
+        values = []  # type: List[float]
+        for command in mission:
+            command_class = command.__class__
+            quanta = self.__command_quanta(command_class)
+            discrete = []  # type: List[Any]
+            for parameter, quantum in quanta:
+                value = command[parameter.name]
+                if quantum is None:
+                    discrete.append(value)
+                else:
+                    values.append(value / quantum)
+            signature.append((command.uid, tuple(discrete)))
+        return MissionFingerprint(tuple(signature),
+                                  numpy.array(values, dtype=float))
+
+
+class NearDuplicateIndex(object):
+    """
+    Indexes missions by their fingerprints, allowing near duplicates of
+    previously indexed missions to be detected in (expected) constant time.
+    Safe to use from multiple threads.
+    """
+    def __init__(self,
+                 fingerprinter: MissionFingerprinter,
+                 num_tables: int = 4,
+                 seed: int = 0
+                 ) -> None:
+        assert num_tables > 0
+        self.__fingerprinter = fingerprinter
+        self.__lock = threading.Lock()
+        self.__rng = numpy.random.RandomState(seed)
+        # the random offset of each table along each dimension
+        self.__offsets = numpy.zeros((num_tables, 0))
+        # maps each cell of each table to the indices of its missions
+        self.__tables = \
+            [{} for _ in range(num_tables)]  # type: List[Dict[Key, List[int]]]
+        self.__missions = []  # type: List[Mission]
+        self.__fingerprints = []  # type: List[MissionFingerprint]
+
+    def __len__(self) -> int:
+        return len(self.__missions)
+
+    def __keys(self, fingerprint: MissionFingerprint) -> List[Key]:
+        size = len(fingerprint.values)
+        num_offsets = self.__offsets.shape[1]
+        if size > num_offsets:
+            extra = self.__rng.uniform(0.0, 1.0,
+                                       (len(self.__tables),
+                                        size - num_offsets))
+            self.__offsets = numpy.hstack([self.__offsets, extra])
+        cells = numpy.floor(fingerprint.values + self.__offsets[:, :size])
+        cells = cells.astype(int)
+        return [(fingerprint.signature, tuple(row.tolist())) for row in cells]
+
+    def __find(self,
+               fingerprint: MissionFingerprint,
+               keys: List[Key]
+               ) -> Optional[Mission]:
+        for table, key in zip(self.__tables, keys):
+            for candidate in table.get(key, ()):
+                other = self.__fingerprints[candidate]
+                distance = numpy.abs(other.values - fingerprint.values)
+                if numpy.all(distance <= 1.0):
+                    return self.__missions[candidate]
+        return None
+
+    def find(self, mission: Mission) -> Optional[Mission]:
+        """
+        Returns a previously indexed mission that is a near duplicate of a
+        given mission, or None if there is no such mission.
+        """
+        fingerprint = self.__fingerprinter.fingerprint(mission)
+        with self.__lock:
+            return self.__find(fingerprint, self.__keys(fingerprint))
+
+    def add(self, mission: Mission) -> bool:
+        """
+        Adds a given mission to the index, unless it is a near duplicate of
+        a previously indexed mission. Returns True if the mission was added.
+        """
+        fingerprint = self.__fingerprinter.fingerprint(mission)
+        with self.__lock:
+            keys = self.__keys(fingerprint)
+            if self.__find(fingerprint, keys) is not None:
+                return False
+            index = len(self.__missions)
+            self.__missions.append(mission)
+            self.__fingerprints.append(fingerprint)
+            for table, key in zip(self.__tables, keys):
+                table.setdefault(key, []).append(index)
+            return True
+
+    def filter(self, missions: Iterable[Mission]) -> Iterator[Mission]:
+        """
+        Lazily filters near duplicates from a stream of missions (e.g., the
+        source of a MissionRunnerPool), including near duplicates of missions
+        that appear earlier in the stream.
+        """
+        for mission in missions:
+            if self.add(mission):
+                yield mission
+
+
+def deduplicate(missions: Iterable[Mission],
+                system: Type[System],
+                scale: float = 1.0
+                ) -> List[Mission]:
+    """
+    Returns the missions within a given collection that are not near
+    duplicates of an earlier mission in that collection.
+    """
+    index = NearDuplicateIndex(MissionFingerprinter(system, scale=scale))
+    return list(index.filter(missions))
@@ -1,26 +1,50 @@
+import hashlib
 import random
 import threading
 import timeit
 from bugzoo.client import Client as BugZooClient
+import numpy
 
 import logging
-from typing import Dict, Callable, List, Type, Optional
+from typing import Dict, Callable, List, Type, Optional, Sequence, Tuple
 
 from ..runner import MissionRunnerPool
 from ..system import System
 from ..mission import Mission, MissionSuite, MissionOutcome
-from ..command import Command
+from ..command import Command, CommandBatch
+from ..localization import Spectrum
 from .resources import ResourceUsage, ResourceLimits
 from .report import MissionGeneratorReport
+from .journal import CampaignJournal, CampaignState
+from .reduction import Branch, reduce_suite, spec_path
 
 logger = logging.getLogger(__name__)  # type: logging.Logger
 logger.setLevel(logging.DEBUG)
 
 
+def derive_seed(seed: int, index: int) -> int:
+    """
+    Derives the seed for the index-th stream of random numbers from a given
+    campaign seed. Derived seeds are stable across processes and platforms.
+    """
+    h = hashlib.sha256('{}:{}'.format(seed, index).encode('utf-8'))
+    return int.from_bytes(h.digest()[:8], 'big')
+
+
 class MissionGeneratorStream(object):
-    def __init__(self, generator):
+    def __init__(self,
+                 generator,
+                 pending: Optional[Sequence[Mission]] = None
+                 ) -> None:
+        """
+        Parameters:
+            generator: the generator from which missions should be fetched.
+            pending: a sequence of previously generated missions that should
+                be returned before any new missions are generated.
+        """
         self.__lock = threading.Lock()
         self.__generator = generator
+        self.__pending = list(pending) if pending else []
 
     def __iter__(self):
         """
@@ -35,6 +59,8 @@ class MissionGeneratorStream(object):
         """
         g = self.__generator
         with self.__lock:
+            if self.__pending:
+                return self.__pending.pop(0)
             g.tick()
             if g.exhausted():
                 raise StopIteration
@@ -43,10 +69,15 @@ class MissionGeneratorStream(object):
             g.resource_usage.num_missions += 1
             mission_num = g.resource_usage.num_missions
             logger.debug('Generated mission: %d', mission_num)
+            g.journal_mission(mission_num - 1, mission)
             return mission
 
 
 class MissionGenerator(object):
+    # the number of commands of each type that are sampled at once by
+    # draw_command
+    command_batch_size = 256
+
     def __init__(self,
                  system: Type[System],
                  threads: int = 1,
@@ -110,6 +141,14 @@ class MissionGenerator(object):
     def coverage(self):
         return self.__coverage
 
+    @property
+    def spectrum(self) -> Spectrum:
+        """
+        The coverage spectrum of the missions that have been executed during
+        the current generation trial.
+        """
+        return self.__spectrum
+
     @property
     def threads(self):
         """
@@ -135,6 +174,60 @@ class MissionGenerator(object):
             return self.__command_generators[name]
         return None
 
+    def numpy_rng(self) -> numpy.random.Generator:
+        """
+        Returns a new NumPy random generator that is seeded from the RNG of
+        this generator, for use with Command.generate_batch.
+        """
+        return numpy.random.default_rng(self.__rng.getrandbits(64))
+
+    def generate_commands(self,
+                          command_classes: Sequence[Type[Command]]
+                          ) -> List[Command]:
+        """
+        Generates a command of each of a given sequence of types. All commands
+        of the same type are sampled as a single batch, using a NumPy
+        generator that is seeded from the RNG of this generator, so the
+        result depends on nothing but the state of that RNG. Types with a
+        custom command generator are generated individually.
+        """
+        counts = {}  # type: Dict[Type[Command], int]
+        for command_class in command_classes:
+            if self.command_generator(command_class) is None:
+                counts[command_class] = counts.get(command_class, 0) + 1
+        rng = self.numpy_rng() if counts else None
+        batches = {cls: iter(cls.generate_batch(size, rng))
+                   for (cls, size) in counts.items()}
+        commands = []  # type: List[Command]
+        for command_class in command_classes:
+            if command_class in batches:
+                commands.append(next(batches[command_class]))
+            else:
+                generator = self.command_generator(command_class)
+                commands.append(generator(self.__rng))
+        return commands
+
+    def draw_command(self, command_class: Type[Command]) -> Command:
+        """
+        Returns the next command from a pool of pre-sampled commands of a
+        given type. When the pool is empty, a batch of `command_batch_size`
+        commands is sampled (see Command.generate_batch) using a NumPy
+        generator that is seeded from the RNG of this generator. Commands
+        are only constructed when they are drawn. Types with a custom command
+        generator are generated individually.
+        """
+        generator = self.command_generator(command_class)
+        if generator is not None:
+            return generator(self.__rng)
+        with self.__pool_lock:
+            batch, index = self.__pools.get(command_class, (None, 0))
+            if batch is None or index == len(batch):
+                batch = command_class.generate_batch(self.command_batch_size,
+                                                     self.numpy_rng())
+                index = 0
+            self.__pools[command_class] = (batch, index + 1)
+            return batch[index]
+
     def exhausted(self):
         """
         Checks whether the resources available to this generator have been
@@ -158,14 +251,14 @@ class MissionGenerator(object):
         outcome = self.__outcomes[mission]
         return outcome.end_state
 
-    def executed_path(self, m):
+    def executed_path(self, m: Mission) -> Tuple[Branch, ...]:
         """
-        Returns the path that was taken when a given mission was executed.
+        Returns the sequence of specification branches that were taken when
+        a given mission was executed.
         """
         if m.is_empty():
-            return BranchPath([])
-        outcome = self.__outcomes[m]
-        return outcome.executed_path
+            return ()
+        return spec_path(m, self.__outcomes[m])
 
     def tick(self):
         """
@@ -188,19 +281,43 @@ class MissionGenerator(object):
         logger.ingo("\t[DONE]")
         return outcome
 
+    def journal_mission(self, index: int, mission: Mission) -> None:
+        """
+        Records that a given mission was generated as the index-th mission
+        of the current trial, immediately after its generation, so that its
+        outcome can later be written to the journal (if any).
+        """
+        with self.__journal_lock:
+            self.__indices.setdefault(mission, []).append(index)
+        if self.__journal:
+            self.__journal.record_mission(index,
+                                          mission,
+                                          self.__rng,
+                                          self.__resource_usage.running_time)
+
     def record_outcome(self, mission, outcome, coverage=None):
         """
         Records the outcome of a given mission. The mission is logged to the
         history, and its outcome is stored in the outcome dictionary. If the
         mission failed, the mission is also added to the set of failed
-        missions.
+        missions. If the trial is journaled, the outcome is written to the
+        journal before it is recorded.
         """
+        with self.__journal_lock:
+            indices = self.__indices.get(mission)
+            index = indices.pop(0) if indices else None
+        if self.__journal and index is not None:
+            self.__journal.record_outcome(index, outcome)
+        self.__record(mission, outcome, coverage)
+
+    def __record(self, mission, outcome, coverage=None):
         self.__history.append(mission)
         self.__outcomes[mission] = outcome
         if coverage:
             self.__coverage[mission] = coverage
+            self.__spectrum.record(coverage, outcome.passed)
 
-        if outcome.failed:
+        if not outcome.passed:
             self.__failures.add(mission)
 
     def generate(self,
@@ -230,13 +347,33 @@ class MissionGenerator(object):
                          resource_limits: ResourceLimits,
                          bz: BugZooClient,
                          snapshot: str,
-                         with_coverage: bool = False
+                         with_coverage: bool = False,
+                         journal: Optional[CampaignJournal] = None
                          ) -> MissionGeneratorReport:
+        """
+        Generates and executes missions until the given resource limits are
+        reached. If a journal is provided, the trial is recorded to that
+        journal as it progresses; if the journal already describes an
+        interrupted trial, that trial is resumed instead: its completed
+        outcomes are reused, its unfinished missions are executed, and
+        generation continues from the point at which it stopped.
+        """
         self.__runner_pool = None
 
         try:
             self.prepare(seed, resource_limits)
-            stream = MissionGeneratorStream(self)
+            self.__resource_usage = ResourceUsage()
+            self.__start_time = timeit.default_timer()
+            pending = []  # type: List[Mission]
+            if journal:
+                state = journal.read()
+                if state is None:
+                    journal.start(seed, resource_limits)
+                else:
+                    pending = self.__resume(state)
+                self.__journal = journal
+
+            stream = MissionGeneratorStream(self, pending)
             self.__runner_pool = MissionRunnerPool(bz,
                                                    snapshot,
                                                    self.system,
@@ -244,8 +381,6 @@ class MissionGenerator(object):
                                                    stream,
                                                    self.record_outcome,
                                                    with_coverage)
-            self.__resource_usage = ResourceUsage()
-            self.__start_time = timeit.default_timer()
             self.tick()
             self.__runner_pool.run()
 
@@ -268,12 +403,75 @@ class MissionGenerator(object):
             if self.__runner_pool:
                 self.__runner_pool.shutdown()
                 self.__runner_pool = None
-
-    def reduce(self):
-        """
-        """
-        # TODO remove all failures from the history list
-        return MissionSuite(self.__history)
+            if journal:
+                journal.close()
+            self.__journal = None
+
+    def __resume(self, state: CampaignState) -> List[Mission]:
+        """
+        Restores the progress of an interrupted trial from its journal, and
+        returns the missions that were generated but not completed. The
+        recovered outcomes are passed to restore, allowing generators that
+        maintain additional state (e.g., a search frontier) to rebuild it.
+        """
+        if state.seed != self.__seed:
+            msg = "journal was recorded with seed {} but trial uses seed {}"
+            raise ValueError(msg.format(state.seed, self.__seed))
+
+        completed = []  # type: List[Tuple[Mission, MissionOutcome]]
+        pending = []  # type: List[Mission]
+        for index, mission in enumerate(state.missions):
+            if index in state.outcomes:
+                completed.append((mission, state.outcomes[index]))
+            else:
+                self.__indices.setdefault(mission, []).append(index)
+                pending.append(mission)
+        self.restore(completed, pending)
+        if state.rng_state is not None:
+            self.__rng.setstate(state.rng_state)
+
+        self.__resource_usage.num_missions = len(state.missions)
+        self.__resource_usage.running_time = state.running_time
+        self.__start_time -= state.running_time
+        logger.info("resuming trial: %d missions completed, %d pending",
+                    len(state.outcomes), len(pending))
+        return pending
+
+    def restore(self,
+                completed: Sequence[Tuple[Mission, MissionOutcome]],
+                pending: Sequence[Mission]
+                ) -> None:
+        """
+        Called when an interrupted trial is resumed from its journal, before
+        any new missions are generated.
+
+        Parameters:
+            completed: the missions that were completed before the trial
+                was interrupted, in the order that they were generated,
+                together with their outcomes.
+            pending: the missions that were generated but not completed.
+                These missions are executed again before any new missions
+                are generated.
+        """
+        for mission, outcome in completed:
+            self.record_outcome(mission, outcome)
+
+    def reduce(self) -> MissionSuite:
+        """
+        Produces a minimal suite of passing missions that covers the same
+        source lines and specification branches as all of the passing
+        missions in the history, containing at most `num_missions_selected`
+        missions (if that limit is set). See houston.generator.reduction.
+        """
+        passing = [m for m in self.__history if m not in self.__failures]
+        limit = self.__resource_limits.num_missions_selected
+        selected = reduce_suite(passing,
+                                self.__outcomes,
+                                self.__coverage,
+                                max_size=limit)
+        logger.info("reduced suite from %d to %d missions",
+                    len(self.__history), len(selected))
+        return MissionSuite(selected)
 
     def prepare(self, seed, resource_limits):
         """
@@ -281,11 +479,18 @@ class MissionGenerator(object):
         new generation trial.
         """
         self.__resource_limits = resource_limits
+        self.__seed = seed
+        self.__journal = None  # type: Optional[CampaignJournal]
+        self.__journal_lock = threading.Lock()
+        self.__indices = {}  # type: Dict[Mission, List[int]]
         self.__history = []
         self.__outcomes = {}
         self.__failures = set()
         self.__coverage = {}
+        self.__spectrum = Spectrum()
         self.__rng = random.Random(seed)
+        self.__pool_lock = threading.Lock()
+        self.__pools = {}  # type: Dict[Type[Command], Tuple[CommandBatch, int]]  # noqa: pycodestyle
 
     def generate_mission(self):
         """
@@ -294,28 +499,23 @@ class MissionGenerator(object):
         """
         raise NotImplementedError
 
-    # FIXME what does this do? what does fault localization have to do with
-    # test generation in general? feels like this is in the wrong place.
-    def report_fault_localization(self):
-        from bugzoo.core.coverage import TestSuiteCoverage
-        from bugzoo.core.spectra import Spectra
-        from bugzoo.localization import Localization
-        from bugzoo.localization.suspiciousness import tarantula
-
-        # FIXME why the need to build indirectly?
-        test_suite_coverage_dict = {}
-        counter = 0
-        for m in self.coverage:
-            test = {
-                'test': 't{}'.format(counter),
-                'outcome': self.outcome(m).to_test_outcome_json(0),
-                'coverage': self.coverage[m].to_dict()
-            }
-            test_suite_coverage_dict['t{}'.format(counter)] = test
-            counter += 1
-        # FIXME why not build it directly?
-        coverage = TestSuiteCoverage.from_dict(test_suite_coverage_dict)
-        spectra = Spectra.from_coverage(coverage)
-        loc = Localization.from_spectra(spectra, tarantula)
-
-        return loc
+    def generate_mission_at(self, seed: int, index: int) -> Mission:
+        """
+        Generates the index-th mission for a given seed, using an RNG that is
+        derived from that seed and index alone. The result does not depend
+        on any missions that were generated before it, allowing missions to
+        be generated in any order, or in parallel. Only suitable for
+        generators whose missions depend on nothing but their RNG (e.g.,
+        RandomMissionGenerator).
+        """
+        self.__rng = random.Random(derive_seed(seed, index))
+        return self.generate_mission()
+
+    def report_fault_localization(self) -> Spectrum:
+        """
+        Returns the coverage spectrum for all missions that were executed with
+        coverage collection enabled. The spectrum is updated incrementally as
+        outcomes are recorded, and can be used to compute the suspiciousness
+        of every covered line (e.g., via Tarantula, Ochiai or DStar).
+        """
+        return self.__spectrum
@@ -0,0 +1,163 @@
+"""
+Provides an append-only journal for mission generation campaigns. The journal
+records the seed and resource limits of the campaign, each mission as it is
+generated (together with the state of the generator's RNG immediately after
+that mission was generated), and each outcome as it is reported. Should the
+campaign be interrupted, it can be resumed from the journal: completed
+outcomes are reused, missions that were generated but not completed are run
+again, and generation continues from the recorded RNG state.
+"""
+__all__ = ['CampaignJournal', 'CampaignState']
+
+from typing import Any, Dict, List, Optional, Tuple, Type
+import json
+import logging
+import os
+import random
+import threading
+
+import attr
+
+from ..mission import Mission, MissionOutcome
+from ..system import System
+from .resources import ResourceLimits
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+RNGState = Tuple[Any, ...]
+
+
+def _rng_state_to_json(state: RNGState) -> List[Any]:
+    version, internal, gauss_next = state
+    return [version, list(internal), gauss_next]
+
+
+def _rng_state_from_json(jsn: List[Any]) -> RNGState:
+    version, internal, gauss_next = jsn
+    return (version, tuple(internal), gauss_next)
+
+
+@attr.s(frozen=True)
+class CampaignState(object):
+    """
+    Describes the progress of a campaign, as recovered from its journal.
+
+    Attributes:
+        seed: the seed that was used by the campaign.
+        missions: the missions that were generated, in order.
+        outcomes: the outcomes of the completed missions, indexed by the
+            position of the mission in the list of generated missions.
+        rng_state: the state of the RNG after the last mission was
+            generated, or None if no missions were generated.
+        running_time: the generation time that had elapsed when the last
+            mission was generated.
+    """
+    seed = attr.ib(type=int)
+    missions = attr.ib(type=Tuple[Mission, ...], converter=tuple)
+    outcomes = attr.ib(type=Dict[int, MissionOutcome])
+    rng_state = attr.ib(type=Optional[RNGState])
+    running_time = attr.ib(type=float)
+
+    @property
+    def pending(self) -> List[int]:
+        """
+        The indices of the missions that were generated but not completed.
+        """
+        return [i for i in range(len(self.missions))
+                if i not in self.outcomes]
+
+
+class CampaignJournal(object):
+    """
+    An append-only journal for a single campaign, stored as a file of JSON
+    lines. Entries are flushed and synced to disk as they are written, and a
+    partially written final entry (e.g., due to a crash) is ignored when the
+    journal is read. Safe to write from multiple threads.
+    """
+    def __init__(self, filename: str, system: Type[System]) -> None:
+        self.__filename = filename
+        self.__system = system
+        self.__lock = threading.Lock()
+        self.__file = None  # type: Optional[Any]
+
+    @property
+    def filename(self) -> str:
+        return self.__filename
+
+    def exists(self) -> bool:
+        return os.path.exists(self.__filename)
+
+    def read(self) -> Optional[CampaignState]:
+        """
+        Recovers the state of the campaign from this journal, or returns None
+        if the journal is empty or does not exist.
+        """
+        if not self.exists():
+            return None
+
+        seed = None  # type: Optional[int]
+        missions = []  # type: List[Mission]
+        outcomes = {}  # type: Dict[int, MissionOutcome]
+        rng_state = None  # type: Optional[RNGState]
+        running_time = 0.0
+        with open(self.__filename, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning("ignoring incomplete journal entry")
+                    break
+                kind = entry['kind']
+                if kind == 'start':
+                    seed = entry['seed']
+                elif kind == 'mission':
+                    assert entry['index'] == len(missions)
+                    missions.append(Mission.from_dict(entry['mission']))
+                    rng_state = _rng_state_from_json(entry['rng'])
+                    running_time = entry['running_time']
+                elif kind == 'outcome':
+                    outcome = MissionOutcome.from_dict(entry['outcome'],
+                                                       self.__system)
+                    outcomes[entry['index']] = outcome
+
+        if seed is None:
+            return None
+        return CampaignState(seed, missions, outcomes, rng_state, running_time)
+
+    def __append(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry) + '\n'
+        with self.__lock:
+            if self.__file is None:
+                self.__file = open(self.__filename, 'a')
+            self.__file.write(line)
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+
+    def start(self, seed: int, limits: ResourceLimits) -> None:
+        self.__append({'kind': 'start',
+                       'seed': seed,
+                       'limits': limits.to_json()})
+
+    def record_mission(self,
+                       index: int,
+                       mission: Mission,
+                       rng: random.Random,
+                       running_time: float
+                       ) -> None:
+        self.__append({'kind': 'mission',
+                       'index': index,
+                       'mission': mission.to_dict(),
+                       'rng': _rng_state_to_json(rng.getstate()),
+                       'running_time': running_time})
+
+    def record_outcome(self, index: int, outcome: MissionOutcome) -> None:
+        self.__append({'kind': 'outcome',
+                       'index': index,
+                       'outcome': outcome.to_dict()})
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__file:
+                self.__file.close()
+                self.__file = None
@@ -43,12 +43,7 @@ class RandomMissionGenerator(MissionGenerator):
         return self.__env
 
     def generate_command(self, command_class: Type[Command]) -> Command:
-        generator = self.command_generator(command_class)
-        if generator is None:
-            return command_class.generate(self.rng)
-        # g = generator.generate_action_without_state
-        # return g(self.system, self.__env, self.rng)
-        return g(self.rng)
+        return self.generate_commands([command_class])[0]
 
     def generate_mission(self):
         command_classes = list(self.system.commands.values())
@@ -59,15 +54,18 @@ class RandomMissionGenerator(MissionGenerator):
                 break
         if not takeoff:
             raise Exception("No TAKEOFF command found")
-        commands = [self.generate_command(takeoff)]
+        # the type of each command depends only on the type of the command
+        # before it, so the types are chosen first, allowing the parameters
+        # of all commands of each type to be sampled as a single batch
+        classes = [takeoff]
         cmds_len = self.rng.randint(1, self.max_num_commands)
         for i in range(1, cmds_len):
-            next_allowed = commands[i - 1].__class__.get_next_allowed(self.system)  # noqa: pycodestyle
+            next_allowed = classes[i - 1].get_next_allowed(self.system)
             if next_allowed:
-                command_class = self.rng.choice(next_allowed)
-                commands.append(self.generate_command(command_class))
+                classes.append(self.rng.choice(next_allowed))
             else:
                 break
+        commands = self.generate_commands(classes)
         return Mission(self.__configuration,
                        self.__env,
                        self.__initial_state,
@@ -0,0 +1,129 @@
+"""
+Provides coverage-based minimisation of mission suites. The requirements of a
+suite are the source lines covered by its missions, together with the
+specification branches (i.e., the pairs of command and specification) that
+were exercised by those missions. A small subset of the suite that satisfies
+the same requirements is selected using the greedy set cover heuristic,
+which repeatedly selects the mission that satisfies the greatest number of
+unsatisfied requirements. Requirements are stored as a (missions x
+requirements) packed bit matrix, allowing the gain of every mission to be
+computed at once.
+"""
+__all__ = ['spec_path', 'spec_branches', 'reduce_suite']
+
+from typing import Dict, List, Mapping, Optional, Sequence, Set, Tuple
+import logging
+
+import numpy as np
+from bugzoo.core.fileline import FileLineSet
+
+from ..command import cached_resolution
+from ..coverage import CoverageBitset, CoverageMatrix, LineIndex, popcount
+from ..mission import Mission, MissionOutcome
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+# identifies a specification of a given command
+Branch = Tuple[str, str]
+
+
+def spec_path(mission: Mission, outcome: MissionOutcome) -> Tuple[Branch, ...]:
+    """
+    Returns the sequence of specification branches that were taken by the
+    commands that were executed during a given mission, in the form of
+    (command UID, specification name) pairs.
+    """
+    path = []  # type: List[Branch]
+    with cached_resolution():
+        for cmd_outcome in outcome.outcomes:
+            command = cmd_outcome.command
+            spec = command.resolve(cmd_outcome.start_state,
+                                   mission.environment,
+                                   mission.configuration)
+            path.append((command.uid, spec.name))
+    return tuple(path)
+
+
+def spec_branches(mission: Mission, outcome: MissionOutcome) -> Set[Branch]:
+    """
+    Returns the set of specification branches that were exercised by the
+    commands that were executed during a given mission.
+    """
+    return set(spec_path(mission, outcome))
+
+
+def _requirements(missions: Sequence[Mission],
+                  outcomes: Mapping[Mission, MissionOutcome],
+                  coverage: Mapping[Mission, FileLineSet]
+                  ) -> np.ndarray:
+    """
+    Returns the requirements satisfied by each of a sequence of missions as a
+    (missions x bytes) packed bit matrix.
+    """
+    lines = CoverageMatrix(LineIndex())
+    for mission in missions:
+        covered = coverage.get(mission, ())
+        lines.append(CoverageBitset.from_file_lines(lines.index, covered))
+
+    branch_to_id = {}  # type: Dict[Branch, int]
+    branch_ids = []  # type: List[List[int]]
+    for mission in missions:
+        ids = [branch_to_id.setdefault(b, len(branch_to_id))
+               for b in spec_branches(mission, outcomes[mission])]
+        branch_ids.append(ids)
+    branches = np.zeros((len(missions), len(branch_to_id)), dtype=np.uint8)
+    for row, ids in enumerate(branch_ids):
+        branches[row, ids] = 1
+
+    logger.debug("minimising suite of %d missions over %d lines and %d spec "
+                 "branches", len(missions), len(lines.index),
+                 len(branch_to_id))
+    return np.hstack([lines.packed(), np.packbits(branches, axis=1)])
+
+
+def reduce_suite(missions: Sequence[Mission],
+                 outcomes: Mapping[Mission, MissionOutcome],
+                 coverage: Mapping[Mission, FileLineSet],
+                 max_size: Optional[int] = None
+                 ) -> List[Mission]:
+    """
+    Selects a small subset of a given sequence of passing missions that
+    covers the same source lines and specification branches. Ties are broken
+    in favour of the earliest mission.
+
+    Parameters:
+        missions: the missions from which the subset should be selected.
+        outcomes: the outcome of each mission.
+        coverage: the lines covered by each mission. Missions without
+            coverage are judged on their specification branches alone.
+        max_size: an optional upper bound on the size of the subset. If the
+            bound is reached, the missions that contribute the most
+            requirements are kept.
+
+    Returns:
+        the selected missions, in order of selection.
+    """
+    assert max_size is None or max_size >= 0
+    # remove duplicates whilst preserving order
+    unique = []  # type: List[Mission]
+    seen = set()  # type: Set[Mission]
+    for mission in missions:
+        if mission not in seen:
+            seen.add(mission)
+            unique.append(mission)
+    missions = unique
+    if not missions:
+        return []
+
+    requirements = _requirements(missions, outcomes, coverage)
+    uncovered = np.bitwise_or.reduce(requirements, axis=0)
+    selected = []  # type: List[Mission]
+    while max_size is None or len(selected) < max_size:
+        gains = popcount(requirements & uncovered)
+        best = int(np.argmax(gains))
+        if gains[best] == 0:
+            break
+        selected.append(missions[best])
+        uncovered &= ~requirements[best]
+    return selected
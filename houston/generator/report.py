@@ -14,19 +14,19 @@ class MissionGeneratorReport(object):
         assert isinstance(jsn, dict)
 
         jsn = jsn['report']
-        history = [Mission.from_json(h['mission']) for h in jsn['history']]
+        system = System.get_by_name(jsn['settings']['system'])
+        history = [Mission.from_dict(h['mission']) for h in jsn['history']]
 
         outcomes = {}
         for h in jsn['history']:
-            mission = Mission.from_json(h['mission'])
-            outcome = MissionOutcome.from_json(h['outcome'])
+            mission = Mission.from_dict(h['mission'])
+            outcome = MissionOutcome.from_dict(h['outcome'], system)
             outcomes[mission] = outcome
 
-        failed = [Mission.from_json(f['mission']) for f in jsn['failed']]
+        failed = [Mission.from_dict(f['mission']) for f in jsn['failed']]
         # TODO read coverage
-        suite = MissionSuite.from_json(jsn['suite'])
+        suite = MissionSuite.from_dict(jsn['suite'])
 
-        system = System.from_json(jsn['settings']['system'])
         resource_usage = ResourceUsage.from_json(jsn['resources']['used'])
         resource_limits = ResourceLimits.from_json(jsn['resources']['limits'])
 
@@ -36,6 +36,7 @@ class MissionGeneratorReport(object):
                                       failed,
                                       resource_usage,
                                       resource_limits,
+                                      {},
                                       suite)
 
     def __init__(self,
@@ -86,20 +87,20 @@ class MissionGeneratorReport(object):
     def to_json(self):
         history = []
         for m in self.__history:
-            jsn = {'mission': m.to_json(),
-                   'outcome': self.outcomes(m).to_json()}
+            jsn = {'mission': m.to_dict(),
+                   'outcome': self.outcome(m).to_dict()}
             history.append(jsn)
 
         failed = []
         for m in self.__failed:
-            jsn = {'mission': m.to_json(),
-                   'outcome': self.outcomes(m).to_json()}
+            jsn = {'mission': m.to_dict(),
+                   'outcome': self.outcome(m).to_dict()}
             failed.append(jsn)
 
         # TODO not a good way to report coverage
         coverage = []
         for (m, cov) in self.__coverage.items():
-            jsn = {'mission': m.to_json(),
+            jsn = {'mission': m.to_dict(),
                    'coverage': cov.to_dict()}
             coverage.append(jsn)
 
@@ -107,9 +108,9 @@ class MissionGeneratorReport(object):
             'history': history,
             'failed': failed,
             'coverage': coverage,
-            'suite': self.suite.to_json(),
+            'suite': self.suite.to_dict(),
             'settings': {
-                'system': self.system.to_json()
+                'system': self.system.name
             },
             'resources': {
                 'used': self.resource_usage.to_json(),
@@ -0,0 +1,144 @@
+"""
+Provides sharded generation of large mission pools. The missions in a pool
+are divided into fixed-size shards, each of which is generated independently
+(possibly by a separate process) and streamed to its own JSONL file. Since
+each mission is generated from an RNG that is derived from the seed of the
+pool and the index of the mission (see MissionGenerator.generate_mission_at),
+the resulting pool is identical regardless of the number of workers.
+
+The seed, shard size and number of missions of a pool are recorded in a
+manifest within its directory. Complete shards are only reused if the
+manifest matches the parameters of the pool that is being generated.
+"""
+__all__ = ['generate_sharded', 'generate_shard', 'read_shards',
+           'shard_filename', 'manifest_filename']
+
+from typing import Any, Dict, Iterator, List
+import concurrent.futures
+import glob
+import json
+import logging
+import os
+
+from ..mission import Mission
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+
+def shard_filename(directory: str, shard: int) -> str:
+    return os.path.join(directory, 'missions-{:05d}.jsonl'.format(shard))
+
+
+def manifest_filename(directory: str) -> str:
+    return os.path.join(directory, 'manifest.json')
+
+
+def _write_manifest(directory: str, manifest: Dict[str, Any]) -> None:
+    """
+    Records the parameters of the pool within a given directory, or checks
+    that they match those of an existing pool within that directory.
+
+    Raises:
+        ValueError: if the directory contains shards for a pool with
+            different parameters, or shards without a manifest.
+    """
+    fn = manifest_filename(directory)
+    if os.path.exists(fn):
+        with open(fn, 'r') as f:
+            existing = json.load(f)
+        if existing != manifest:
+            msg = "directory contains shards for a different pool: {} ({})"
+            raise ValueError(msg.format(directory, existing))
+        return
+
+    pattern = os.path.join(glob.escape(directory), 'missions-*.jsonl')
+    if glob.glob(pattern):
+        msg = "directory contains shards without a manifest: {}"
+        raise ValueError(msg.format(directory))
+    fn_temp = '{}.tmp'.format(fn)
+    with open(fn_temp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(fn_temp, fn)
+
+
+def generate_shard(generator: 'MissionGenerator',
+                   seed: int,
+                   shard: int,
+                   shard_size: int,
+                   num_missions: int,
+                   directory: str
+                   ) -> str:
+    """
+    Generates the missions that belong to a given shard, writes them to the
+    file for that shard, and returns the name of that file. Shards are
+    written to a temporary file and atomically moved into place, so the
+    presence of a shard file indicates that the shard is complete; shards
+    that are already complete are not generated again. The parameters of
+    the pool are not checked against its manifest (see generate_sharded).
+    """
+    fn = shard_filename(directory, shard)
+    if os.path.exists(fn):
+        logger.debug("skipping complete shard: %s", fn)
+        return fn
+
+    start = shard * shard_size
+    stop = min(start + shard_size, num_missions)
+    fn_temp = '{}.tmp'.format(fn)
+    with open(fn_temp, 'w') as f:
+        for index in range(start, stop):
+            mission = generator.generate_mission_at(seed, index)
+            f.write(json.dumps(mission.to_dict()))
+            f.write('\n')
+    os.replace(fn_temp, fn)
+    logger.debug("generated shard %d (missions %d to %d)",
+                 shard, start, stop - 1)
+    return fn
+
+
+def generate_sharded(generator: 'MissionGenerator',
+                     seed: int,
+                     num_missions: int,
+                     directory: str,
+                     shard_size: int = 10000,
+                     workers: int = 1
+                     ) -> List[str]:
+    """
+    Generates a pool of missions, divided into shards of a given size, using
+    a given number of worker processes, and returns the names of the shard
+    files, in order. The generator must be picklable if more than one worker
+    is used.
+
+    Raises:
+        ValueError: if the directory already contains shards for a pool
+            with a different seed, shard size or number of missions.
+    """
+    assert num_missions >= 0
+    assert shard_size > 0
+    assert workers > 0
+    os.makedirs(directory, exist_ok=True)
+    _write_manifest(directory, {'seed': seed,
+                                'shard_size': shard_size,
+                                'num_missions': num_missions})
+    num_shards = (num_missions + shard_size - 1) // shard_size
+    args = [(generator, seed, shard, shard_size, num_missions, directory)
+            for shard in range(num_shards)]
+
+    if workers == 1:
+        return [generate_shard(*a) for a in args]
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(generate_shard, *a) for a in args]
+        return [future.result() for future in futures]
+
+
+def read_shards(directory: str) -> Iterator[Mission]:
+    """
+    Lazily reads the missions within the (complete) shards of a given
+    directory, in order.
+    """
+    pattern = os.path.join(glob.escape(directory), 'missions-*.jsonl')
+    for fn in sorted(glob.glob(pattern)):
+        with open(fn, 'r') as f:
+            for line in f:
+                yield Mission.from_dict(json.loads(line))
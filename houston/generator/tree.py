@@ -1,35 +1,139 @@
-import time
+"""
+Provides a generator that explores the tree of specification branches that
+are reachable by the system under test. Each mission that passes is expanded
+into a set of child missions, each of which extends it with a single command;
+the intended path of a child is the path executed by its parent, followed by
+the specification branch that its new command is expected to take. Children
+are kept in a priority queue (the frontier), which favours branches that have
+been scheduled least often, followed by shorter missions. When a mission
+fails, the path that it executed is pruned from the search, together with
+every path that extends it.
+
+Missions are fetched from the generator by the workers of a MissionRunnerPool.
+If the frontier is empty whilst missions are still running, workers wait
+until an outcome is reported (and the frontier is expanded), rather than
+polling.
+"""
+__all__ = ['PathTrie', 'TreeBasedMissionGenerator']
+
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+import heapq
+import logging
 import threading
 
 from .base import MissionGenerator
-from ..mission import Mission, MissionOutcome
-from ..command import CommandOutcome, Command
-from ..util import printflush
+from .reduction import Branch
+from ..command import Command
+from ..configuration import Configuration
+from ..environment import Environment
+from ..mission import Mission
+from ..state import State
+from ..system import System
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+Path = Tuple[Branch, ...]
+
+
+def _child_key(mission: Mission) -> Tuple[Tuple[Command, ...], str]:
+    """
+    Identifies a child mission by its parent's commands and the type of its
+    last command. Each expansion of a mission generates at most one child
+    with a given key.
+    """
+    return (mission.commands[:-1], mission.commands[-1].uid)
+
+
+class PathTrie(object):
+    """
+    Records the branch paths that have been pruned from a search. Pruning a
+    path, and checking whether a path (or any of its prefixes) has been
+    pruned, both take time proportional to the length of the path. Only the
+    paths that lead to pruned nodes are stored, and pruned nodes (which are
+    represented by None) discard their children.
+    """
+    def __init__(self) -> None:
+        self.__root = {}  # type: Optional[Dict[Branch, Any]]
+
+    def prune(self, path: Path) -> None:
+        """
+        Prunes a given path, and all paths that extend it.
+        """
+        if not path:
+            self.__root = None
+            return
+        node = self.__root
+        for branch in path[:-1]:
+            if node is None:
+                return
+            node = node.setdefault(branch, {})
+        if node is not None:
+            node[path[-1]] = None
+
+    def is_pruned(self, path: Path) -> bool:
+        """
+        Determines whether a given path, or any of its prefixes, has been
+        pruned.
+        """
+        node = self.__root
+        for branch in path:
+            if node is None:
+                return True
+            if branch not in node:
+                return False
+            node = node[branch]
+        return node is None
 
 
 class TreeBasedMissionGenerator(MissionGenerator):
     def __init__(self,
-                 system,
-                 initial_state,
-                 env,
-                 threads=1,
-                 action_generators=None,
-                 max_num_actions=10):
-        super().__init__(system, threads, action_generators, max_num_actions)
-        self.__seed_mission = Mission(env, initial_state, [])
-        self.__queue_lock = threading.Lock()
+                 system: Type[System],
+                 initial_state: State,
+                 env: Environment,
+                 config: Configuration,
+                 threads: int = 1,
+                 command_generators: Optional[Dict[str, Callable]] = None,
+                 max_num_commands: int = 10
+                 ) -> None:
+        super().__init__(system, threads, command_generators, max_num_commands)
+        self.__seed_mission = Mission(config, env, initial_state, [], system)
+        self.__lock = threading.Condition()
 
     @property
-    def seed_mission(self):
+    def seed_mission(self) -> Mission:
         """
         The mission that is used as a seed when generating new missions.
         """
         return self.__seed_mission
 
-    def record_outcome(self, mission, outcome):
+    @property
+    def frontier_size(self) -> int:
+        """
+        The number of missions that are waiting to be executed, including any
+        that have been pruned but not yet discarded.
+        """
+        return len(self.__frontier)
+
+    def prepare(self, seed, resource_limits):
+        super().prepare(seed, resource_limits)
+        with self.__lock:
+            # entries are (times branch scheduled, size, sequence, mission,
+            # intended path); the sequence number breaks ties, ensuring that
+            # missions are never compared
+            self.__frontier = []  # type: List[Tuple[int, int, int, Mission, Path]]  # noqa: pycodestyle
+            self.__sequence = 0
+            self.__scheduled = {}  # type: Dict[Branch, int]
+            self.__pruned = PathTrie()
+            # the number of copies of each mission that are currently running
+            self.__running = {}  # type: Dict[Mission, int]
+            self.__num_running = 0
+            self.expand(self.seed_mission, ())
+
+    def record_outcome(self, mission, outcome, coverage=None):
         """
         Once the outcome of a mission has been determined, this function is
-        reponsible for guiding the generation of new missions based on the
+        responsible for guiding the generation of new missions based on the
         outcome of that mission.
 
         If the mission failed, it indicates that either:
@@ -38,53 +142,102 @@ class TreeBasedMissionGenerator(MissionGenerator):
             (b) there is non-determinism in the outcome of missions, or
             (c) the system is poorly specified.
 
+        In any case, the path that was executed by the mission is pruned.
         If the mission was successful, a new mission is generated for each
-        (reachable) child node in the behaviour graph.
+        command that may follow its last command.
         """
-        super(TreeBasedMissionGenerator, self).record_outcome(mission, outcome)
-
-        self.__queue_lock.acquire()
-        try:
-            intended_path = self.__intended_paths[mission]
-            del self.__intended_paths[mission]
+        super().record_outcome(mission, outcome, coverage)
+        executed = self.executed_path(mission)
+        with self.__lock:
+            # outcomes that are recovered from a journal (see restore) belong
+            # to missions that are not running, and are used for expansion
+            # and pruning only
+            copies = self.__running.get(mission, 0)
+            if copies > 0:
+                if copies == 1:
+                    del self.__running[mission]
+                else:
+                    self.__running[mission] = copies - 1
+                self.__num_running -= 1
             if outcome.passed:
-                self.expand(mission)
+                self.expand(mission, executed)
             else:
-                # TODO: should we prune both?
-                # self.prune(intended_path)
-                executed_path = self.executed_path(mission)
-                self.prune(executed_path)
-        finally:
-            self.__num_running -= 1
-            self.__queue_lock.release()
+                logger.debug("pruning path: %s", executed)
+                self.__pruned.prune(executed)
+            self.__lock.notify_all()
 
-    def prune(self, path: 'BranchPath') -> None:
+    def restore(self, completed, pending):
         """
-        Removes a given branch path from the search space, preventing further
-        exploration along that path.
+        Rebuilds the frontier and pruned paths of an interrupted search from
+        its journal. Failed paths are pruned again, and passing missions are
+        expanded again (with freshly generated parameters), but children
+        that were already generated (i.e., that share the parent and last
+        command type of a journaled mission) are removed from the frontier.
+        Pending missions are treated as running.
         """
-        printflush("Adding path to tabu list: {}".format(path))  # FIXME
+        generated = set(_child_key(m) for (m, _) in completed)
+        generated.update(_child_key(m) for m in pending)
+        with self.__lock:
+            for mission in pending:
+                self.__running[mission] = self.__running.get(mission, 0) + 1
+                self.__num_running += 1
+            super().restore(completed, pending)
+            self.__frontier = [entry for entry in self.__frontier
+                               if _child_key(entry[3]) not in generated]
+            heapq.heapify(self.__frontier)
 
-        def fltr(m: Mission) -> bool:
-            return not self.__intended_paths[m].startswith(path)
+    def next_commands(self, mission: Mission) -> List[Type[Command]]:
+        """
+        Returns the types of command that may be appended to a given mission.
+        """
+        if mission.is_empty():
+            return [c for c in self.system.commands.values()
+                    if "MAV_CMD_NAV_TAKEOFF" in c.uid]
+        return mission.commands[-1].__class__.get_next_allowed(self.system)
 
-        self.__queue = set(filter(keep, self.__queue))
+    def generate_command(self, command_class: Type[Command]) -> Command:
+        return self.draw_command(command_class)
 
-    def prepare(self, seed, resource_limits):
-        super().prepare(seed, resource_limits)
+    def expand(self, mission: Mission, path: Path) -> None:
+        """
+        Adds a child of a given passing mission, which executed a given path,
+        to the frontier for each command that may follow its last command.
+        Must be called with the lock held.
+        """
+        if mission.size >= self.max_num_commands:
+            return
+        if self.__pruned.is_pruned(path):
+            return
 
-        self.__intended_paths = {}
-        self.__queue = set()
-        self.__num_running = 0
-        self.expand(self.seed_mission)
+        state = self.end_state(mission)
+        for command_class in self.next_commands(mission):
+            command = self.generate_command(command_class)
+            spec = command.resolve(state,
+                                   mission.environment,
+                                   mission.configuration)
+            branch = (command.uid, spec.name)
+            child_path = path + (branch,)
+            if self.__pruned.is_pruned(child_path):
+                continue
+            scheduled = self.__scheduled.get(branch, 0)
+            self.__scheduled[branch] = scheduled + 1
+            child = mission.extended(command)
+            entry = (scheduled, child.size, self.__sequence, child, child_path)
+            self.__sequence += 1
+            heapq.heappush(self.__frontier, entry)
 
-    def cleanup(self):
-        self.__queue = set()
-        self.__num_running = 0
+    def __discard_pruned(self) -> None:
+        """
+        Removes pruned missions from the head of the frontier. Must be called
+        with the lock held.
+        """
+        frontier = self.__frontier
+        while frontier and self.__pruned.is_pruned(frontier[0][4]):
+            heapq.heappop(frontier)
 
-    def reduce(self):
-        # toposort and retain leaves
-        return super(TreeBasedMissionGenerator, self).reduce()
+    def __search_exhausted(self) -> bool:
+        self.__discard_pruned()
+        return not self.__frontier and self.__num_running == 0
 
     def exhausted(self):
         """
@@ -92,59 +245,38 @@ class TreeBasedMissionGenerator(MissionGenerator):
         there are no jobs running and no jobs queued (implying that the search
         space has been exhausted).
         """
-        if super(TreeBasedMissionGenerator, self).exhausted():
+        if super().exhausted():
             return True
-        return self.__queue == set() and self.__num_running == 0
+        with self.__lock:
+            return self.__search_exhausted()
+
+    def __time_remaining(self) -> Optional[float]:
+        limit = self.resource_limits.running_time
+        if limit is None:
+            return None
+        return max(0.0, limit - self.resource_usage.running_time)
 
     def generate_mission(self):
-        while not self.exhausted():
-            self.__queue_lock.acquire()
-            try:
-                if self.__queue != set():
-                    mission = self.rng.sample(self.__queue, 1)[0]
-                    self.__queue.remove(mission)
+        with self.__lock:
+            while True:
+                self.__discard_pruned()
+                if self.__frontier:
+                    entry = heapq.heappop(self.__frontier)
+                    mission = entry[3]
+                    self.__running[mission] = \
+                        self.__running.get(mission, 0) + 1
                     self.__num_running += 1
                     return mission
-            finally:
-                self.__queue_lock.release()
+                if self.__search_exhausted():
+                    break
 
-            # wait before checking the queue again
-            time.sleep(0.05)
-            self.tick()
+                # wait for a running mission to report its outcome, or for
+                # the time limit to be reached
+                self.tick()
+                self.__lock.wait(self.__time_remaining())
+                self.tick()
+                if super().exhausted():
+                    break
 
         # if the search has been exhausted, stop generating more missions
         raise StopIteration
-
-    def expand(self, mission):
-        """
-        Called after a mission has finished executing
-        """
-        state = self.end_state(mission)
-        env = mission.environment
-        path = self.executed_path(mission)
-
-        # if we've hit the action limit, don't expand
-        has_max_actions = self.max_num_actions is not None
-        if has_max_actions and self.max_num_actions == mission.size:
-            return
-
-        # otherwise, explore each branch
-        branches = self.system.branches
-        branches = [b for b in branches
-                    if b.is_satisfiable(self.system, state, env)]
-        for b in branches:
-            p = path.extended(b)
-            a = self.generate_action(b, env, state)
-            m = mission.extended(a)
-            self.__queue.add(m)
-            self.__intended_paths[m] = p
-
-    def generate_action(self, branch, env, state):
-        """
-        TODO: add branch-specific action generators
-        """
-        generator = self.action_generator(branch.schema)
-        if generator is not None:
-            g = generator.generate_action_with_state
-            return g(self.system, state, env, self.rng)
-        return branch.generate(self.system, state, env, self.rng)
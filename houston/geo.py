@@ -0,0 +1,50 @@
+"""
+Provides vectorised geodesic computations over NumPy arrays of coordinates,
+for use when large numbers of locations must be computed at once (e.g., when
+generating batches of waypoints).
+"""
+__all__ = ['destinations']
+
+from typing import Tuple, Union
+
+import numpy
+
+# the mean radius of the Earth, in metres (as used by geopy's great_circle)
+EARTH_RADIUS = 6371009.0
+
+ArrayLike = Union[float, numpy.ndarray]
+
+
+def destinations(latitude: ArrayLike,
+                 longitude: ArrayLike,
+                 distance: ArrayLike,
+                 heading: ArrayLike
+                 ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Computes the locations that are reached by travelling a given distance
+    (in metres) along a given initial heading (in degrees) from a given
+    location, over a spherical Earth. All arguments are broadcast against
+    each other.
+
+    Returns:
+        a tuple of arrays, containing the latitude and longitude (in degrees)
+        of each destination.
+    """
+    lat = numpy.radians(latitude)
+    lon = numpy.radians(longitude)
+    bearing = numpy.radians(heading)
+    delta = numpy.asarray(distance) / EARTH_RADIUS
+
+    sin_lat = numpy.sin(lat)
+    cos_lat = numpy.cos(lat)
+    sin_delta = numpy.sin(delta)
+    cos_delta = numpy.cos(delta)
+
+    sin_lat_dest = \
+        sin_lat * cos_delta + cos_lat * sin_delta * numpy.cos(bearing)
+    lat_dest = numpy.arcsin(numpy.clip(sin_lat_dest, -1.0, 1.0))
+    lon_dest = lon + numpy.arctan2(numpy.sin(bearing) * sin_delta * cos_lat,
+                                   cos_delta - sin_lat * sin_lat_dest)
+    # normalise longitudes to [-180, 180)
+    lon_dest = (lon_dest + 3 * numpy.pi) % (2 * numpy.pi) - numpy.pi
+    return numpy.degrees(lat_dest), numpy.degrees(lon_dest)
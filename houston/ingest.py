@@ -0,0 +1,213 @@
+"""
+Decouples the receipt of messages from their (potentially expensive)
+analysis.
+
+Messages are pushed into a bounded buffer by the thread that receives them,
+and are consumed by a separate worker thread. Bursts of messages of the same
+type are coalesced, so that only the latest message of that type is
+processed, and if the buffer is full, the oldest pending message is dropped.
+The receiving thread therefore never waits for analysis to complete.
+"""
+__all__ = ['MessageBuffer', 'IngestionStats', 'Ingestor']
+
+from typing import Any, Callable, Generic, Optional, Tuple, TypeVar
+from collections import OrderedDict
+from timeit import default_timer as timer
+import itertools
+import threading
+import logging
+
+import attr
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+T = TypeVar('T')
+
+
+@attr.s(frozen=True)
+class IngestionStats(object):
+    """
+    Describes the messages that have passed through an ingestion stage.
+
+    Attributes:
+        received: the number of messages that were pushed into the buffer.
+        processed: the number of messages that were processed.
+        coalesced: the number of messages that were replaced by a later
+            message of the same type before they were processed.
+        dropped: the number of messages that were discarded because the
+            buffer was full.
+        backlog: the number of messages waiting to be processed.
+        lag: the time (in seconds) that the most recently processed message
+            spent waiting in the buffer.
+        max_lag: the longest time (in seconds) that any message spent
+            waiting in the buffer.
+    """
+    received = attr.ib(type=int)
+    processed = attr.ib(type=int)
+    coalesced = attr.ib(type=int)
+    dropped = attr.ib(type=int)
+    backlog = attr.ib(type=int)
+    lag = attr.ib(type=float)
+    max_lag = attr.ib(type=float)
+
+
+class MessageBuffer(Generic[T]):
+    """
+    A bounded, thread-safe buffer of pending messages. Messages that share
+    a coalescing key are merged: a newly pushed message replaces the pending
+    message with the same key, and retains its position in the buffer.
+    Messages without a key are never coalesced.
+    """
+    def __init__(self, capacity: int = 256) -> None:
+        assert capacity > 0
+        self.__capacity = capacity
+        self.__condition = threading.Condition()
+        self.__pending = OrderedDict()  # type: OrderedDict
+        self.__unique = itertools.count()
+        self.__closed = False
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        with self.__condition:
+            return len(self.__pending)
+
+    @property
+    def capacity(self) -> int:
+        return self.__capacity
+
+    def push(self, message: T, key: Optional[Any] = None) -> None:
+        """
+        Adds a message to the buffer. Never blocks.
+        """
+        with self.__condition:
+            self.received += 1
+            if key is None:
+                key = (None, next(self.__unique))
+            if key in self.__pending:
+                _, time_pushed = self.__pending[key]
+                self.__pending[key] = (message, time_pushed)
+                self.coalesced += 1
+            else:
+                if len(self.__pending) >= self.__capacity:
+                    self.__pending.popitem(last=False)
+                    self.dropped += 1
+                self.__pending[key] = (message, timer())
+            self.__condition.notify()
+
+    def pop(self, timeout: Optional[float] = None
+            ) -> Optional[Tuple[T, float]]:
+        """
+        Removes the oldest pending message from the buffer, and returns it
+        along with the time that it was first pushed. Blocks until a message
+        is available, the timeout expires, or the buffer is closed, in which
+        case None is returned.
+        """
+        with self.__condition:
+            while not self.__pending:
+                if self.__closed:
+                    return None
+                if not self.__condition.wait(timeout):
+                    return None
+            _, (message, time_pushed) = self.__pending.popitem(last=False)
+            return message, time_pushed
+
+    def close(self) -> None:
+        """
+        Closes the buffer, waking any threads that are waiting for messages.
+        Messages that are still pending may continue to be popped.
+        """
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+
+
+class Ingestor(Generic[T]):
+    """
+    Processes messages on a dedicated worker thread, using a bounded
+    buffer to decouple the worker from the thread that receives messages.
+    """
+    def __init__(self,
+                 process: Callable[[T], None],
+                 key: Optional[Callable[[T], Any]] = None,
+                 capacity: int = 256
+                 ) -> None:
+        """
+        Parameters:
+            process: the function used to process each message.
+            key: an optional function that returns the coalescing key for
+                each message (e.g., its type). If omitted, messages are not
+                coalesced.
+            capacity: the maximum number of pending messages.
+        """
+        self.__process = process
+        self.__key = key
+        self.__buffer = MessageBuffer(capacity)  # type: MessageBuffer[T]
+        self.__idle = threading.Condition()
+        self.__processed = 0
+        self.__lag = 0.0
+        self.__max_lag = 0.0
+        self.__thread = threading.Thread(target=self.__work)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def push(self, message: T) -> None:
+        """
+        Schedules a message for processing. Safe to call from any thread;
+        never blocks on the processing of other messages.
+        """
+        key = self.__key(message) if self.__key else None
+        self.__buffer.push(message, key)
+
+    def __work(self) -> None:
+        while True:
+            item = self.__buffer.pop()
+            if item is None:
+                return
+            message, time_pushed = item
+            lag = timer() - time_pushed
+            self.__lag = lag
+            self.__max_lag = max(self.__max_lag, lag)
+            try:
+                self.__process(message)
+            except Exception:
+                logger.exception("failed to process message: %s", message)
+            with self.__idle:
+                self.__processed += 1
+                self.__idle.notify_all()
+
+    def __is_idle(self) -> bool:
+        # every received message has been processed, coalesced or dropped
+        buff = self.__buffer
+        done = self.__processed + buff.coalesced + buff.dropped
+        return done >= buff.received
+
+    def wait_until_idle(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until all pending messages have been processed. Returns
+        False if the timeout expired before that happened.
+        """
+        with self.__idle:
+            return self.__idle.wait_for(self.__is_idle, timeout)
+
+    def stats(self) -> IngestionStats:
+        """
+        Returns a summary of the messages that have been ingested.
+        """
+        buff = self.__buffer
+        return IngestionStats(received=buff.received,
+                              processed=self.__processed,
+                              coalesced=buff.coalesced,
+                              dropped=buff.dropped,
+                              backlog=len(buff),
+                              lag=self.__lag,
+                              max_lag=self.__max_lag)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Processes any pending messages and stops the worker thread.
+        """
+        self.__buffer.close()
+        self.__thread.join(timeout)
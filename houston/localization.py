@@ -0,0 +1,220 @@
+__all__ = ['Spectrum', 'Formula', 'FORMULAE', 'tarantula', 'ochiai',
+           'dstar']
+
+from typing import Dict, List, Tuple, Callable, Optional, Union
+import threading
+import logging
+
+import numpy as np
+from bugzoo.core.fileline import FileLine, FileLineSet
+
+from .coverage import LineIndex, CoverageBitset, CoverageMatrix
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+# the number of rows that are unpacked at once when building a spectrum
+_BLOCK_SIZE = 1024
+
+# computes the suspiciousness of every line from the number of passing and
+# failing executions that cover that line (ep, ef), and the total number of
+# passing and failing executions (p, f).
+Formula = Callable[[np.ndarray, np.ndarray, int, int], np.ndarray]
+
+
+def tarantula(ep: np.ndarray, ef: np.ndarray, p: int, f: int) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rf = ef / f if f else np.zeros(ef.shape)
+        rp = ep / p if p else np.zeros(ep.shape)
+        scores = rf / (rf + rp)
+    return np.nan_to_num(scores)
+
+
+def ochiai(ep: np.ndarray, ef: np.ndarray, p: int, f: int) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = ef / np.sqrt(f * (ef + ep))
+    return np.nan_to_num(scores)
+
+
+def dstar(ep: np.ndarray,
+          ef: np.ndarray,
+          p: int,
+          f: int,
+          star: int = 2
+          ) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = np.power(ef, star) / (ep + (f - ef))
+    scores[np.isnan(scores)] = 0.0
+    return scores
+
+
+FORMULAE = {
+    'tarantula': tarantula,
+    'ochiai': ochiai,
+    'dstar': dstar
+}  # type: Dict[str, Formula]
+
+
+class Spectrum(object):
+    """
+    Maintains pass/fail hit counts for every line in a shared index. The
+    spectrum may be built from a coverage matrix in a single pass, or updated
+    incrementally (and safely from multiple threads) as outcomes are reported
+    by a mission runner.
+    """
+    @staticmethod
+    def from_matrix(matrix: CoverageMatrix,
+                    passed: np.ndarray
+                    ) -> 'Spectrum':
+        """
+        Computes a spectrum from a (missions x lines) coverage matrix and a
+        boolean array describing whether each mission passed.
+        """
+        passed = np.asarray(passed, dtype=np.bool_)
+        assert passed.shape == (len(matrix),)
+        size = len(matrix.index)
+        packed = matrix.packed()
+        ep = np.zeros(size, dtype=np.int64)
+        ef = np.zeros(size, dtype=np.int64)
+
+        # unpack the matrix in blocks of rows to bound memory usage
+        for start in range(0, packed.shape[0], _BLOCK_SIZE):
+            stop = start + _BLOCK_SIZE
+            bits = np.unpackbits(packed[start:stop], axis=1)[:, :size]
+            block_passed = passed[start:stop]
+            ep += bits[block_passed].sum(axis=0, dtype=np.int64)
+            ef += bits[~block_passed].sum(axis=0, dtype=np.int64)
+
+        spectrum = Spectrum(matrix.index)
+        spectrum.__ep = ep
+        spectrum.__ef = ef
+        spectrum.__num_passed = int(passed.sum())
+        spectrum.__num_failed = int((~passed).sum())
+        return spectrum
+
+    @staticmethod
+    def from_coverage(coverage: Dict[object, FileLineSet],
+                      passed: Dict[object, bool],
+                      index: Optional[LineIndex] = None
+                      ) -> 'Spectrum':
+        """
+        Computes a spectrum from the coverage and outcomes of a collection of
+        executions (e.g., missions), indexed by some common key.
+        """
+        if index is None:
+            index = LineIndex()
+        keys = list(coverage.keys())
+        bitsets = [CoverageBitset.from_file_lines(index, coverage[k])
+                   for k in keys]
+        matrix = CoverageMatrix.from_bitsets(index, bitsets)
+        outcomes = np.array([passed[k] for k in keys], dtype=np.bool_)
+        return Spectrum.from_matrix(matrix, outcomes)
+
+    def __init__(self, index: Optional[LineIndex] = None) -> None:
+        self.__lock = threading.Lock()
+        self.__index = index if index is not None else LineIndex()
+        self.__ep = np.zeros(0, dtype=np.int64)
+        self.__ef = np.zeros(0, dtype=np.int64)
+        self.__num_passed = 0
+        self.__num_failed = 0
+
+    @property
+    def index(self) -> LineIndex:
+        return self.__index
+
+    @property
+    def num_passed(self) -> int:
+        return self.__num_passed
+
+    @property
+    def num_failed(self) -> int:
+        return self.__num_failed
+
+    def counts(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the number of passing and failing executions that cover each
+        line in the index, as a pair of arrays, (ep, ef).
+        """
+        ep, ef, _, _ = self.__snapshot()
+        return ep, ef
+
+    def __snapshot(self) -> Tuple[np.ndarray, np.ndarray, int, int]:
+        with self.__lock:
+            size = len(self.__index)
+            ep = np.zeros(size, dtype=np.int64)
+            ef = np.zeros(size, dtype=np.int64)
+            ep[:self.__ep.shape[0]] = self.__ep
+            ef[:self.__ef.shape[0]] = self.__ef
+            return ep, ef, self.__num_passed, self.__num_failed
+
+    def record(self,
+               coverage: Union[FileLineSet, CoverageBitset],
+               passed: bool
+               ) -> None:
+        """
+        Incrementally adds the coverage and outcome of a single execution to
+        this spectrum.
+        """
+        if not isinstance(coverage, CoverageBitset):
+            coverage = CoverageBitset.from_file_lines(self.__index, coverage)
+        assert coverage.index is self.__index
+        with self.__lock:
+            size = len(self.__index)
+            hits = np.unpackbits(coverage.padded(size))[:size]
+            counts = self.__ep if passed else self.__ef
+            if counts.shape[0] < size:
+                counts = np.concatenate(
+                    [counts, np.zeros(size - counts.shape[0], np.int64)])
+            counts += hits
+            if passed:
+                self.__ep = counts
+                self.__num_passed += 1
+            else:
+                self.__ef = counts
+                self.__num_failed += 1
+
+    def scores(self, formula: Formula = tarantula) -> np.ndarray:
+        """
+        Returns the suspiciousness of every line in the index according to a
+        given formula.
+        """
+        ep, ef, p, f = self.__snapshot()
+        return formula(ep, ef, p, f)
+
+    def localize(self,
+                 formulae: Optional[Dict[str, Formula]] = None
+                 ) -> Dict[str, np.ndarray]:
+        """
+        Computes the suspiciousness of every line according to each of a
+        given set of formulae (by default, Tarantula, Ochiai and DStar),
+        sharing a single snapshot of the hit counts.
+        """
+        if formulae is None:
+            formulae = FORMULAE
+        ep, ef, p, f = self.__snapshot()
+        return {name: formula(ep, ef, p, f)
+                for (name, formula) in formulae.items()}
+
+    def suspiciousness(self,
+                       formula: Formula = tarantula
+                       ) -> Dict[FileLine, float]:
+        """
+        Returns a mapping from each covered line to its suspiciousness.
+        """
+        scores = self.scores(formula)
+        return {self.__index.line(i): float(scores[i])
+                for i in range(scores.shape[0])}
+
+    def most_suspicious(self,
+                        formula: Formula = tarantula,
+                        limit: Optional[int] = None
+                        ) -> List[Tuple[FileLine, float]]:
+        """
+        Returns a list of lines, ordered from most to least suspicious.
+        Ties are broken by the order in which lines entered the index.
+        """
+        scores = self.scores(formula)
+        order = np.argsort(-scores, kind='stable')
+        if limit is not None:
+            order = order[:limit]
+        return [(self.__index.line(int(i)), float(scores[i])) for i in order]
@@ -0,0 +1,330 @@
+"""
+Provides live metrics for long-running campaigns (e.g., ground-truth builds)
+in the Prometheus text exposition format, together with an optional HTTP
+endpoint, built on Flask, from which those metrics may be scraped.
+
+Sandboxes report to the metrics (if any) that have been set using
+set_metrics, allowing active sandboxes, SITL restarts, phase latencies and
+message rates to be tracked without changes to the code that runs them.
+"""
+__all__ = ['Counter', 'Gauge', 'Histogram', 'MetricsRegistry',
+           'CampaignMetrics', 'serve_metrics',
+           'set_metrics', 'get_metrics']
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, \
+    Sequence, Tuple
+from timeit import default_timer as timer
+import bisect
+import logging
+import threading
+
+from .timing import Span, Timeline
+from .util import AppServer
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# the default upper bounds (in seconds) for the buckets of phase latencies
+PHASE_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+                 600.0)
+
+# the metrics (if any) to which sandboxes should report
+_METRICS = None  # type: Optional[CampaignMetrics]
+
+
+def set_metrics(metrics: 'Optional[CampaignMetrics]') -> None:
+    """
+    Sets the metrics to which sandboxes should report.
+    """
+    global _METRICS
+    _METRICS = metrics
+
+
+def get_metrics() -> 'Optional[CampaignMetrics]':
+    return _METRICS
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for (k, v) in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = ['{}="{}"'.format(k, v.replace('\\', '\\\\')
+                                    .replace('"', '\\"')
+                                    .replace('\n', '\\n'))
+               for (k, v) in labels]
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return 'NaN'
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class _Metric(object):
+    kind = 'untyped'
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = ['# HELP {} {}'.format(self.name, self.description),
+                 '# TYPE {} {}'.format(self.name, self.kind)]
+        for (name, labels, value) in self.samples():
+            lines.append('{}{} {}'.format(name,
+                                          _format_labels(labels),
+                                          _format_value(value)))
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """
+    A monotonically increasing count, optionally partitioned by labels.
+    """
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str) -> None:
+        super().__init__(name, description)
+        self.__values = {}  # type: Dict[Labels, float]
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        assert amount >= 0
+        key = _labels(labels)
+        with self._lock:
+            self.__values[key] = self.__values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self.__values.get(_labels(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        with self._lock:
+            return [(self.name, k, v) for (k, v) in self.__values.items()]
+
+
+class Gauge(_Metric):
+    """
+    A value that may go up and down. The value of the gauge may either be set
+    directly, or computed by a function when the gauge is read. Functions
+    return a mapping from label dictionaries (given as sorted tuples of
+    key-value pairs) to values, or a single value for unlabelled gauges.
+    """
+    kind = 'gauge'
+
+    def __init__(self,
+                 name: str,
+                 description: str,
+                 function: Optional[Callable[[], Any]] = None
+                 ) -> None:
+        super().__init__(name, description)
+        self.__values = {}  # type: Dict[Labels, float]
+        self.__function = function
+
+    def set_function(self, function: Optional[Callable[[], Any]]) -> None:
+        self.__function = function
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self.__values[_labels(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self.__values[key] = self.__values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: Any) -> float:
+        for (_, k, v) in self.samples():
+            if k == _labels(labels):
+                return v
+        return 0.0
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        function = self.__function
+        if function is None:
+            with self._lock:
+                return [(self.name, k, v) for (k, v) in self.__values.items()]
+        values = function()
+        if not isinstance(values, dict):
+            return [(self.name, (), float(values))]
+        return [(self.name, k, float(v)) for (k, v) in values.items()]
+
+
+class Histogram(_Metric):
+    """
+    Counts observations within a set of cumulative buckets, optionally
+    partitioned by labels.
+    """
+    kind = 'histogram'
+
+    def __init__(self,
+                 name: str,
+                 description: str,
+                 buckets: Sequence[float] = PHASE_BUCKETS
+                 ) -> None:
+        super().__init__(name, description)
+        self.__bounds = tuple(sorted(buckets)) + (float('inf'),)
+        # for each set of labels: bucket counts, sum, and count
+        self.__values = {}  # type: Dict[Labels, Tuple[List[int], float, int]]
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        index = bisect.bisect_left(self.__bounds, value)
+        with self._lock:
+            counts, total, n = \
+                self.__values.get(key, ([0] * len(self.__bounds), 0.0, 0))
+            counts[index] += 1
+            self.__values[key] = (counts, total + value, n + 1)
+
+    def count(self, **labels: Any) -> int:
+        with self._lock:
+            entry = self.__values.get(_labels(labels))
+        return entry[2] if entry else 0
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        samples = []  # type: List[Tuple[str, Labels, float]]
+        with self._lock:
+            values = [(k, list(c), t, n)
+                      for (k, (c, t, n)) in self.__values.items()]
+        for (labels, counts, total, n) in values:
+            cumulative = 0
+            for bound, count in zip(self.__bounds, counts):
+                cumulative += count
+                le = labels + (('le', _format_value(bound)),)
+                samples.append((self.name + '_bucket', le, cumulative))
+            samples.append((self.name + '_sum', labels, total))
+            samples.append((self.name + '_count', labels, n))
+        return samples
+
+
+class MetricsRegistry(object):
+    """
+    A collection of metrics that can be rendered in the Prometheus text
+    exposition format.
+    """
+    def __init__(self) -> None:
+        self.__metrics = []  # type: List[_Metric]
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.__metrics.append(metric)
+        return metric
+
+    def __iter__(self) -> Iterator[_Metric]:
+        yield from self.__metrics
+
+    def render(self) -> str:
+        return '\n'.join(m.render() for m in self.__metrics) + '\n'
+
+
+class CampaignMetrics(MetricsRegistry):
+    """
+    The metrics that are reported by a campaign of missions.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.__lock = threading.Lock()
+        # active sandboxes, indexed by ID, along with the number of messages
+        # received and the time at which they were last read
+        self.__sandboxes = {}  # type: Dict[str, Tuple[Any, int, float]]
+
+        register = self.register
+        self.missions_started = register(Counter(
+            'houston_missions_started_total',
+            'Number of missions that have been started.'))
+        self.missions_completed = register(Counter(
+            'houston_missions_completed_total',
+            'Number of missions that have run to completion.'))
+        self.missions_failed = register(Counter(
+            'houston_missions_failed_total',
+            'Number of completed missions that did not pass.'))
+        self.missions_crashed = register(Counter(
+            'houston_missions_crashed_total',
+            'Number of missions that were ended by an error.'))
+        self.queue_depth = register(Gauge(
+            'houston_queue_depth',
+            'Number of missions waiting to be run.'))
+        self.active_sandboxes = register(Gauge(
+            'houston_active_sandboxes',
+            'Number of sandboxes that are currently running.',
+            lambda: len(self.__sandboxes)))
+        self.phase_duration = register(Histogram(
+            'houston_phase_duration_seconds',
+            'Time taken by each phase of a mission.'))
+        self.sitl_restarts = register(Counter(
+            'houston_sitl_restarts_total',
+            'Number of sandboxes that lost (or failed to establish) their connection to the SITL.'))  # noqa: pycodestyle
+        self.message_rate = register(Gauge(
+            'houston_messages_per_second',
+            'Rate at which each sandbox has received MAVLink messages since the last scrape.',  # noqa: pycodestyle
+            self.__message_rates))
+
+    def watch_timeline(self, timeline: Timeline) -> None:
+        """
+        Records the duration of each span that is added to a given timeline.
+        """
+        timeline.add_listener(self.observe_span)
+
+    def observe_span(self, span: Span) -> None:
+        self.phase_duration.observe(span.duration, phase=span.name)
+
+    def add_sandbox(self, sandbox_id: str, sandbox: Any) -> None:
+        with self.__lock:
+            self.__sandboxes[sandbox_id] = (sandbox, 0, timer())
+
+    def remove_sandbox(self, sandbox_id: str) -> None:
+        with self.__lock:
+            self.__sandboxes.pop(sandbox_id, None)
+
+    def __message_rates(self) -> Dict[Labels, float]:
+        rates = {}  # type: Dict[Labels, float]
+        now = timer()
+        with self.__lock:
+            for sandbox_id, entry in list(self.__sandboxes.items()):
+                sandbox, received_before, time_before = entry
+                stats = getattr(sandbox, 'ingestion_stats', None)
+                if stats is None:
+                    continue
+                received = stats.received
+                duration = now - time_before
+                if duration > 0:
+                    rate = (received - received_before) / duration
+                    rates[_labels({'sandbox': sandbox_id})] = rate
+                self.__sandboxes[sandbox_id] = (sandbox, received, now)
+        return rates
+
+
+def serve_metrics(registry: MetricsRegistry,
+                  host: str = '0.0.0.0',
+                  port: int = 9100
+                  ) -> AppServer:
+    """
+    Starts serving a given registry over HTTP, at /metrics, on a background
+    thread, and returns the server.
+    """
+    import flask
+
+    app = flask.Flask(__name__)
+
+    @app.route('/metrics')
+    def metrics():
+        return flask.Response(registry.render(),
+                              mimetype='text/plain; version=0.0.4')
+
+    server = AppServer(app, host, port)
+    server.start()
+    logger.info("serving metrics on port %d", server.port)
+    return server
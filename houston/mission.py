@@ -3,6 +3,8 @@ __all__ = ['Mission', 'MissionOutcome', 'CrashedMissionOutcome',
 
 from typing import Dict, Any, List, Iterator, Tuple,\
     Type, Union, Optional
+import hashlib
+import json
 
 import attr
 
@@ -14,6 +16,7 @@ from .command import Command, CommandOutcome
 from .state import State
 from .environment import Environment
 from .system import System
+from .timing import Span
 
 
 @attr.s(frozen=True)
@@ -62,7 +65,19 @@ class Mission(object):
         end.
         """
         cmds = self.commands + (cmd,)
-        return Mission(self.environment, self.initial_state, cmds, self.system)
+        return Mission(self.configuration,
+                       self.environment,
+                       self.initial_state,
+                       cmds,
+                       self.system)
+
+    def digest(self) -> str:
+        """
+        Returns a stable SHA-256 digest of the contents of this mission,
+        suitable for use as a persistent identifier across processes.
+        """
+        jsn = json.dumps(self.to_dict(), sort_keys=True)
+        return hashlib.sha256(jsn.encode('utf-8')).hexdigest()
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -85,7 +100,8 @@ class Mission(object):
                                               self.environment,
                                               self.configuration) as sandbox:
             outcome = sandbox.run(self.commands)
-            return outcome
+        # includes the time taken to tear down the sandbox
+        return attr.evolve(outcome, timings=sandbox.timeline.spans)
 
 
 @attr.s(frozen=True)
@@ -97,18 +113,26 @@ class MissionOutcome(object):
     passed = attr.ib(type=bool)
     outcomes = attr.ib(type=Tuple[CommandOutcome], converter=tuple)
     time_total = attr.ib(type=float)
+    # the time taken by each phase of the mission
+    timings = attr.ib(type=Tuple[Span, ...], default=(), converter=tuple)
 
     @staticmethod
-    def from_dict(dkt: Dict[str, Any]) -> 'CommandOutcome':
-        cmds = tuple(CommandOutcome.from_json(a) for a in jsn['commands'])
+    def from_dict(dkt: Dict[str, Any],
+                  system: Type[System]
+                  ) -> 'MissionOutcome':
+        cmds = tuple(CommandOutcome.from_dict(a, system)
+                     for a in dkt['commands'])
+        timings = [Span.from_dict(s) for s in dkt.get('timings', [])]
         return MissionOutcome(dkt['passed'],
                               cmds,
-                              dkt['time_total'])
+                              dkt['time_total'],
+                              timings)
 
     def to_dict(self) -> Dict[str, Any]:
         return {'passed': self.passed,
-                'commands': [o.to_json() for o in self.outcomes],
-                'time_total': self.time_total}
+                'commands': [o.to_dict() for o in self.outcomes],
+                'time_total': self.time_total,
+                'timings': [s.to_dict() for s in self.timings]}
 
     # FIXME what is this for?
     def to_test_outcome_json(self, code: int) -> Dict[str, Any]:
@@ -119,7 +143,7 @@ class MissionOutcome(object):
         response = {
             'code': code,
             'duration': self.time_total,
-            'output': json.dump([o.to_json() for o in self.outcomes])}
+            'output': json.dumps([o.to_dict() for o in self.outcomes])}
         return {'passed': self.passed,
                 'response': response}
 
@@ -8,6 +8,8 @@ from bugzoo.client import Client as BugZooClient
 
 from .util import TimeoutError, printflush
 from .mission import Mission
+from .timing import TimingStats
+from .metrics import CampaignMetrics, set_metrics
 
 logger = logging.getLogger(__name__)   # type: logging.Logger
 logger.setLevel(logging.DEBUG)
@@ -54,9 +56,10 @@ class MissionRunner(threading.Thread):
                     recorder_filename = None
                 logger.info("Running mission #%d", index)
                 start_time = time.time()
-                outcome = mission.run(self.__bz,
-                                      self.__snapshot_name,
-                                      recorder_filename)
+                outcome = self.__pool.execute(mission,
+                                              self.__bz,
+                                              self.__snapshot_name,
+                                              recorder_filename)
                 logger.info("Finished running mission %d in %f seconds."
                             " Passed: %s",
                             index,
@@ -83,12 +86,15 @@ class MissionRunnerPool(object):
                  source,  # FIXME
                  callback,  # FIXMe
                  with_coverage=False,
-                 record=False):
+                 record=False,
+                 metrics: Optional[CampaignMetrics] = None):
         assert callable(callback)
         assert size > 0
 
         # if a list is provided, use an iterator for that list
+        self.__num_missions = None  # type: Optional[int]
         if isinstance(source, list):
+            self.__num_missions = len(source)
             source = iter(source)
 
         self.__system = system
@@ -96,6 +102,11 @@ class MissionRunnerPool(object):
         self.__callback = callback
         self.__index = -1
         self._lock = threading.Lock()
+        self.__timing = TimingStats()
+        self.__metrics = metrics
+        if metrics:
+            metrics.queue_depth.set_function(self.__queue_depth)
+            set_metrics(metrics)
 
         # provision desired number of runners
         self.__runners = \
@@ -140,6 +151,25 @@ class MissionRunnerPool(object):
         """
         return self.__system
 
+    @property
+    def timing(self) -> TimingStats:
+        """
+        The time spent in each phase of the missions run by this pool.
+        """
+        return self.__timing
+
+    @property
+    def metrics(self) -> Optional[CampaignMetrics]:
+        """
+        The live metrics (if any) that are reported by this pool.
+        """
+        return self.__metrics
+
+    def __queue_depth(self) -> float:
+        if self.__num_missions is None:
+            return float('nan')
+        return max(0, self.__num_missions - (self.__index + 1))
+
     @property
     def size(self) -> int:
         """
@@ -155,8 +185,40 @@ class MissionRunnerPool(object):
         WARNING: It is the responsibility of the callback to guarantee
             thread safety (if necessary).
         """
+        if outcome is not None:
+            self.__timing.add(outcome.timings)
         self.__callback(mission, outcome, coverage)
 
+    def execute(self,
+                mission: Mission,
+                bz: BugZooClient,
+                snapshot_name: str,
+                recorder_filename: Optional[str] = None
+                ) -> 'MissionOutcome':
+        """
+        Executes a given mission on behalf of one of the runners, and
+        updates the metrics (if any) for this pool.
+        """
+        # FIXME Mission.run does not (yet) support recording
+        if recorder_filename:
+            logger.warning("ignoring recorder file for mission: %s",
+                           recorder_filename)
+
+        metrics = self.__metrics
+        if not metrics:
+            return mission.run(bz, snapshot_name)
+
+        metrics.missions_started.inc()
+        try:
+            outcome = mission.run(bz, snapshot_name)
+        except Exception:
+            metrics.missions_crashed.inc()
+            raise
+        metrics.missions_completed.inc()
+        if not outcome.passed:
+            metrics.missions_failed.inc()
+        return outcome
+
     def fetch(self) -> Tuple[int, Optional[Mission]]:
         """
         Returns the next mission from the (lazily-generated) queue, or None if
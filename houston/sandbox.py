@@ -18,7 +18,10 @@ from .connection import Message
 from .environment import Environment
 from .configuration import Configuration
 from .state import State
-from .command import Command, CommandOutcome
+from .command import Command, CommandOutcome, cached_resolution
+from .timing import Timeline
+from .metrics import get_metrics
+from .exceptions import NoConnectionError, ConnectionLostError
 from .trace import MissionTrace, CommandTrace, TraceRecorder
 
 logger = logging.getLogger(__name__)  # type: logging.Logger
@@ -50,14 +53,20 @@ class Sandbox(object):
         else:
             snapshot = snapshot_or_name
 
+        timeline = Timeline()
+        metrics = get_metrics()
+        if metrics:
+            metrics.watch_timeline(timeline)
         container = None  # type: Optional[Container]
         try:
-            container = client_bugzoo.containers.provision(snapshot)
-            with cls.for_container(client_bugzoo, container, state_initial, environment, configuration) as sandbox:  # noqa: pycodestyle
+            with timeline.span('provision'):
+                container = client_bugzoo.containers.provision(snapshot)
+            with cls.for_container(client_bugzoo, container, state_initial, environment, configuration, timeline=timeline) as sandbox:  # noqa: pycodestyle
                 yield sandbox
         finally:
             if container:
-                del client_bugzoo.containers[container.uid]
+                with timeline.span('teardown', 'container'):
+                    del client_bugzoo.containers[container.uid]
 
     @classmethod
     @contextmanager
@@ -66,35 +75,57 @@ class Sandbox(object):
                       container: Container,
                       state_initial: State,
                       environment: Environment,
-                      configuration: Configuration
+                      configuration: Configuration,
+                      timeline: Optional[Timeline] = None
                       ) -> Iterator['Sandbox']:
         """
         Launches an interactive sandbox instance within a given Docker
         container. The sandbox instance within the container is automatically
         started and stopped upon entering and leaving its context.
+
+        If campaign metrics have been set (see houston.metrics.set_metrics),
+        the sandbox reports its activity to those metrics.
         """
+        metrics = get_metrics()
+        if metrics and timeline is None:
+            timeline = Timeline()
+            metrics.watch_timeline(timeline)
         sandbox = cls(client_bugzoo,
                       container,
                       state_initial,
                       environment,
-                      configuration)
+                      configuration,
+                      timeline=timeline)
+        if metrics:
+            metrics.add_sandbox(container.uid, sandbox)
         try:
             sandbox.start()
             yield sandbox
+        except (NoConnectionError, ConnectionLostError):
+            if metrics:
+                metrics.sitl_restarts.inc()
+            logger.exception("lost connection to sandbox:\n%s",
+                             sandbox.read_logs())
+            raise
         except Exception:
             # FIXME
             logger.exception("failed to launch sandbox:\n%s",
                              sandbox.read_logs())
             raise
         finally:
-            sandbox.stop()
+            if metrics:
+                metrics.remove_sandbox(container.uid)
+            with sandbox.timeline.span('teardown', 'sandbox'):
+                sandbox.stop()
 
     def __init__(self,
                  client_bugzoo: BugZooClient,
                  container: Container,
                  state_initial: State,
                  environment: Environment,
-                 configuration: Configuration
+                 configuration: Configuration,
+                 *,
+                 timeline: Optional[Timeline] = None
                  ) -> None:
         self.__lock = threading.Lock()
         self.__state_lock = threading.Lock()
@@ -107,6 +138,7 @@ class Sandbox(object):
         self.__time_start = timer()
         self.__recorder = None
         self.__lock_recorder = threading.Lock()
+        self.__timeline = timeline if timeline else Timeline()
 
     def read_logs(self) -> str:
         raise NotImplementedError
@@ -154,6 +186,13 @@ class Sandbox(object):
         """
         return self.__container
 
+    @property
+    def timeline(self) -> Timeline:
+        """
+        Records the time taken by each phase of this sandbox session.
+        """
+        return self.__timeline
+
     @property
     def recorder(self) -> TraceRecorder:
         """
@@ -188,6 +227,15 @@ class Sandbox(object):
                     *,
                     timeout: Optional[float] = None
                     ) -> CommandOutcome:
+        # the specification for the command is resolved once, and shared by
+        # the postcondition check and the timeout calculation
+        with cached_resolution(), self.__timeline.span('command', command.uid):
+            return self.__run_command(command, timeout)
+
+    def __run_command(self,
+                      command: Command,
+                      timeout: Optional[float]
+                      ) -> CommandOutcome:
         logger.debug('running command: %s', command)
 
         env = self.environment
@@ -279,7 +327,10 @@ class Sandbox(object):
                     passed = False
                     break
             time_elapsed = timer() - time_start
-            return MissionOutcome(passed, outcomes, time_elapsed)
+            return MissionOutcome(passed,
+                                  outcomes,
+                                  time_elapsed,
+                                  self.__timeline.spans)
 
     def observe(self) -> None:
         """
@@ -0,0 +1,486 @@
+"""
+Provides a long-lived Houston service that owns a pool of workers (and warm
+containers) for a given snapshot, and accepts missions over HTTP. Since the
+service is persistent, the cost of importing Houston, connecting to BugZoo,
+and building its caches (e.g., compiled specifications and learned timeouts)
+is paid once, rather than once per script invocation.
+
+The HTTP API, built on Flask, is as follows:
+
+    POST   /jobs               submits a job: {"missions": [...],
+                               "trace": false}
+    GET    /jobs/<id>          describes the progress of a job.
+    GET    /jobs/<id>/results  streams the results of a job, as JSON lines,
+                               as soon as they become available.
+    DELETE /jobs/<id>          cancels any missions that have not started.
+    GET    /metrics            live metrics (see houston.metrics), if any.
+"""
+__all__ = ['Job', 'HoustonService', 'HoustonClient', 'create_app', 'serve']
+
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, \
+    Tuple
+import collections
+import json
+import logging
+import queue
+import threading
+import urllib.request
+import uuid
+
+from bugzoo.client import Client as BugZooClient
+from bugzoo.core.container import Container
+
+from .mission import Mission
+from .metrics import CampaignMetrics, set_metrics
+from .util import AppServer
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+COMPLETED = 'completed'
+CRASHED = 'crashed'
+CANCELLED = 'cancelled'
+
+
+class Job(object):
+    """
+    Describes a collection of missions that were submitted to the service,
+    together with the results of those missions that have finished thus far.
+    Results are dictionaries that contain the index of the mission within the
+    job, its status, and either its outcome, its trace, or an error message.
+    """
+    def __init__(self,
+                 uid: str,
+                 missions: Sequence[Mission],
+                 trace: bool = False
+                 ) -> None:
+        self.__uid = uid
+        self.__missions = tuple(missions)
+        self.__trace = trace
+        self.__cancelled = False
+        self.__results = []  # type: List[Dict[str, Any]]
+        self.__changed = threading.Condition()
+
+    @property
+    def uid(self) -> str:
+        return self.__uid
+
+    @property
+    def missions(self) -> Tuple[Mission, ...]:
+        return self.__missions
+
+    @property
+    def trace(self) -> bool:
+        """
+        Indicates whether traces, rather than outcomes, should be reported.
+        """
+        return self.__trace
+
+    @property
+    def size(self) -> int:
+        return len(self.__missions)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.__cancelled
+
+    @property
+    def done(self) -> bool:
+        with self.__changed:
+            return len(self.__results) == self.size
+
+    def cancel(self) -> None:
+        self.__cancelled = True
+
+    def add(self, result: Dict[str, Any]) -> None:
+        with self.__changed:
+            self.__results.append(result)
+            self.__changed.notify_all()
+
+    def results(self) -> List[Dict[str, Any]]:
+        """
+        Returns the results that are available, in the order that they
+        finished.
+        """
+        with self.__changed:
+            return list(self.__results)
+
+    def stream(self, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:  # noqa: pycodestyle
+        """
+        Yields the results of this job as they become available, until all
+        missions have finished. If a timeout is given, the stream ends early
+        if no results are produced within that number of seconds.
+        """
+        num_yielded = 0
+        while num_yielded < self.size:
+            with self.__changed:
+                available = \
+                    self.__changed.wait_for(
+                        lambda: len(self.__results) > num_yielded, timeout)
+                if not available:
+                    return
+                results = self.__results[num_yielded:]
+            yield from results
+            num_yielded += len(results)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.__changed:
+            num_finished = len(self.__results)
+        return {'id': self.uid,
+                'size': self.size,
+                'finished': num_finished,
+                'cancelled': self.cancelled,
+                'done': num_finished == self.size}
+
+
+class _ContainerPool(object):
+    """
+    Keeps a number of containers for a given snapshot provisioned ahead of
+    time, so that missions need not wait for a container to be provisioned.
+    Each container is used by a single mission and destroyed afterwards.
+    """
+    def __init__(self,
+                 client_bugzoo: BugZooClient,
+                 snapshot_name: str,
+                 size: int
+                 ) -> None:
+        self.__bz = client_bugzoo
+        self.__snapshot = client_bugzoo.bugs[snapshot_name]
+        self.__ready = queue.Queue(size)  # type: queue.Queue
+        self.__stopped = threading.Event()
+        self.__provisioner = threading.Thread(target=self.__provision)
+        self.__provisioner.daemon = True
+
+    def start(self) -> None:
+        self.__provisioner.start()
+
+    def __provision(self) -> None:
+        while not self.__stopped.is_set():
+            try:
+                container = self.__bz.containers.provision(self.__snapshot)
+            except Exception:
+                logger.exception("failed to provision container")
+                self.__stopped.wait(5.0)
+                continue
+            # wait until the pool has room for the container
+            while not self.__stopped.is_set():
+                try:
+                    self.__ready.put(container, timeout=1.0)
+                    break
+                except queue.Full:
+                    continue
+            else:
+                self.release(container)
+        self.__drain()
+
+    def take(self) -> Container:
+        return self.__ready.get()
+
+    def release(self, container: Container) -> None:
+        del self.__bz.containers[container.uid]
+
+    def __drain(self) -> None:
+        while True:
+            try:
+                self.release(self.__ready.get_nowait())
+            except queue.Empty:
+                return
+
+    def stop(self) -> None:
+        self.__stopped.set()
+        if self.__provisioner.is_alive():
+            self.__provisioner.join()
+        self.__drain()
+
+
+class HoustonService(object):
+    """
+    Runs the missions that are submitted to it, across a given number of
+    workers, on a given snapshot. Only the most recently finished jobs are
+    kept; older finished jobs (and their results) are forgotten, so that
+    the memory used by the service does not grow without bound.
+    """
+    def __init__(self,
+                 client_bugzoo: BugZooClient,
+                 snapshot_name: str,
+                 num_workers: int = 1,
+                 metrics: Optional[CampaignMetrics] = None,
+                 max_finished_jobs: int = 100
+                 ) -> None:
+        """
+        Parameters:
+            client_bugzoo: the BugZoo client used to provision containers.
+            snapshot_name: the name of the snapshot for the system under
+                test.
+            num_workers: the number of missions that may run at once.
+            metrics: the metrics, if any, that should be updated.
+            max_finished_jobs: the maximum number of finished jobs that are
+                kept before the oldest is forgotten.
+        """
+        assert num_workers > 0
+        assert max_finished_jobs >= 0
+        self.__bz = client_bugzoo
+        self.__snapshot_name = snapshot_name
+        self.__num_workers = num_workers
+        self.__metrics = metrics
+        self.__lock = threading.Lock()
+        self.__jobs = {}  # type: Dict[str, Job]
+        self.__max_finished_jobs = max_finished_jobs
+        # the IDs of the finished jobs that are kept, from oldest to newest
+        self.__finished = collections.deque()  # type: Deque[str]
+        self.__pending = queue.Queue()  # type: queue.Queue
+        self.__workers = []  # type: List[threading.Thread]
+        self.__containers = None  # type: Optional[_ContainerPool]
+        if metrics:
+            metrics.queue_depth.set_function(self.__pending.qsize)
+            set_metrics(metrics)
+
+    @property
+    def metrics(self) -> Optional[CampaignMetrics]:
+        return self.__metrics
+
+    def start(self) -> None:
+        """
+        Launches the workers for this service.
+        """
+        if self.__bz is not None:
+            self.__containers = _ContainerPool(self.__bz,
+                                               self.__snapshot_name,
+                                               self.__num_workers)
+            self.__containers.start()
+        for _ in range(self.__num_workers):
+            worker = threading.Thread(target=self.__work)
+            worker.daemon = True
+            worker.start()
+            self.__workers.append(worker)
+        logger.info("started service with %d workers", self.__num_workers)
+
+    def stop(self) -> None:
+        """
+        Cancels all jobs and waits for the workers to finish their current
+        missions.
+        """
+        with self.__lock:
+            for job in self.__jobs.values():
+                job.cancel()
+        for _ in self.__workers:
+            self.__pending.put(None)
+        for worker in self.__workers:
+            worker.join()
+        self.__workers = []
+        if self.__containers:
+            self.__containers.stop()
+            self.__containers = None
+
+    def submit(self, missions: Sequence[Mission], trace: bool = False) -> Job:
+        """
+        Submits a collection of missions to the service, and returns a
+        description of the resulting job.
+        """
+        job = Job(uuid.uuid4().hex, missions, trace)
+        with self.__lock:
+            self.__jobs[job.uid] = job
+        for index, mission in enumerate(job.missions):
+            self.__pending.put((job, index, mission))
+        if job.done:
+            self.__finish(job)
+        logger.info("submitted job %s (%d missions)", job.uid, job.size)
+        return job
+
+    def job(self, uid: str) -> Job:
+        """
+        Raises:
+            KeyError: if there is no job with the given ID.
+        """
+        with self.__lock:
+            return self.__jobs[uid]
+
+    def jobs(self) -> List[Job]:
+        with self.__lock:
+            return list(self.__jobs.values())
+
+    def __work(self) -> None:
+        while True:
+            task = self.__pending.get()
+            if task is None:
+                return
+            job, index, mission = task
+            if job.cancelled:
+                job.add({'index': index, 'status': CANCELLED})
+            else:
+                job.add(self.__run(job, index, mission))
+            if job.done:
+                self.__finish(job)
+
+    def __finish(self, job: Job) -> None:
+        """
+        Records that a given job has finished, and forgets the oldest
+        finished jobs if there are too many.
+        """
+        with self.__lock:
+            if job.uid not in self.__jobs or job.uid in self.__finished:
+                return
+            self.__finished.append(job.uid)
+            while len(self.__finished) > self.__max_finished_jobs:
+                uid = self.__finished.popleft()
+                logger.debug("forgetting finished job: %s", uid)
+                del self.__jobs[uid]
+
+    def __run(self, job: Job, index: int, mission: Mission) -> Dict[str, Any]:
+        metrics = self.__metrics
+        if metrics:
+            metrics.missions_started.inc()
+        try:
+            result = self.execute(mission, job.trace)
+        except Exception as err:
+            logger.exception("mission %d of job %s crashed", index, job.uid)
+            if metrics:
+                metrics.missions_crashed.inc()
+            return {'index': index, 'status': CRASHED, 'error': str(err)}
+        if metrics:
+            metrics.missions_completed.inc()
+            outcome = result.get('outcome')
+            if outcome and not outcome['passed']:
+                metrics.missions_failed.inc()
+        result['index'] = index
+        result['status'] = COMPLETED
+        return result
+
+    def execute(self, mission: Mission, trace: bool = False) -> Dict[str, Any]:  # noqa: pycodestyle
+        """
+        Runs a given mission inside a fresh sandbox, and returns either its
+        trace or its outcome, in the form of a JSON-ready dictionary.
+        """
+        assert self.__containers
+        container = self.__containers.take()
+        try:
+            sandbox_cls = mission.system.sandbox
+            with sandbox_cls.for_container(self.__bz,
+                                           container,
+                                           mission.initial_state,
+                                           mission.environment,
+                                           mission.configuration) as sandbox:
+                if trace:
+                    return {'trace': sandbox.run_and_trace(mission.commands).to_dict()}  # noqa: pycodestyle
+                return {'outcome': sandbox.run(mission.commands).to_dict()}
+        finally:
+            self.__containers.release(container)
+
+
+def create_app(service: HoustonService) -> 'flask.Flask':
+    """
+    Creates a Flask application that exposes a given service over HTTP.
+    """
+    import flask
+
+    app = flask.Flask(__name__)
+
+    def find_job(uid: str) -> Job:
+        try:
+            return service.job(uid)
+        except KeyError:
+            flask.abort(404)
+
+    @app.route('/jobs', methods=['GET'])
+    def list_jobs():
+        return flask.jsonify([job.to_dict() for job in service.jobs()])
+
+    @app.route('/jobs', methods=['POST'])
+    def submit_job():
+        jsn = flask.request.get_json(force=True)
+        try:
+            missions = [Mission.from_dict(m) for m in jsn['missions']]
+        except Exception as err:
+            msg = "failed to read missions: {}".format(err)
+            return flask.jsonify({'error': msg}), 400
+        job = service.submit(missions, trace=bool(jsn.get('trace', False)))
+        return flask.jsonify(job.to_dict()), 202
+
+    @app.route('/jobs/<uid>', methods=['GET'])
+    def describe_job(uid: str):
+        return flask.jsonify(find_job(uid).to_dict())
+
+    @app.route('/jobs/<uid>', methods=['DELETE'])
+    def cancel_job(uid: str):
+        job = find_job(uid)
+        job.cancel()
+        return flask.jsonify(job.to_dict())
+
+    @app.route('/jobs/<uid>/results', methods=['GET'])
+    def stream_results(uid: str):
+        job = find_job(uid)
+        lines = (json.dumps(r) + '\n' for r in job.stream())
+        return flask.Response(lines, mimetype='application/x-ndjson')
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        if not service.metrics:
+            flask.abort(404)
+        return flask.Response(service.metrics.render(),
+                              mimetype='text/plain; version=0.0.4')
+
+    return app
+
+
+class HoustonClient(object):
+    """
+    Provides access to a remote Houston service.
+    """
+    def __init__(self, url: str) -> None:
+        self.__url = url.rstrip('/')
+
+    def __request(self,
+                  path: str,
+                  method: str = 'GET',
+                  payload: Optional[Any] = None
+                  ):
+        data = None
+        headers = {}
+        if payload is not None:
+            data = json.dumps(payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(self.__url + path,
+                                         data=data,
+                                         headers=headers,
+                                         method=method)
+        return urllib.request.urlopen(request)
+
+    def submit(self, missions: Sequence[Mission], trace: bool = False) -> str:
+        """
+        Submits a collection of missions and returns the ID of the job.
+        """
+        payload = {'missions': [m.to_dict() for m in missions],
+                   'trace': trace}
+        with self.__request('/jobs', 'POST', payload) as response:
+            return json.loads(response.read().decode('utf-8'))['id']
+
+    def status(self, uid: str) -> Dict[str, Any]:
+        with self.__request('/jobs/{}'.format(uid)) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def cancel(self, uid: str) -> None:
+        self.__request('/jobs/{}'.format(uid), 'DELETE').close()
+
+    def results(self, uid: str) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the results of a given job as they become available.
+        """
+        with self.__request('/jobs/{}/results'.format(uid)) as response:
+            for line in response:
+                line = line.strip()
+                if line:
+                    yield json.loads(line.decode('utf-8'))
+
+
+def serve(service: HoustonService,
+          host: str = '0.0.0.0',
+          port: int = 8000
+          ) -> AppServer:
+    """
+    Starts serving a given service over HTTP on a background thread, and
+    returns the server.
+    """
+    server = AppServer(create_app(service), host, port)
+    server.start()
+    logger.info("serving Houston on port %d", server.port)
+    return server
@@ -0,0 +1,244 @@
+"""
+Provides a sink that streams the outcomes of missions to disk, as JSON lines,
+as soon as they are reported, together with a reader that lazily iterates
+over those outcomes. Outcomes are serialised and written by a dedicated
+writer thread, fed by a bounded queue, so that the memory used by a
+campaign remains flat regardless of its length, and the outcomes of a
+campaign that crashes are preserved up to the point of the crash.
+"""
+__all__ = ['OutcomeRecord', 'OutcomeSink', 'read_outcomes']
+
+from typing import Any, Dict, Iterator, List, Optional
+import glob
+import json
+import logging
+import os
+import queue
+import re
+import threading
+
+import attr
+from bugzoo.core.fileline import FileLineSet
+
+from . import exceptions
+from .mission import Mission, MissionOutcome
+from .trace import MissionTrace
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+_FILENAME_PATTERN = re.compile(r'^(?P<prefix>.+)-(?P<index>\d+)\.jsonl$')
+
+
+@attr.s(frozen=True)
+class OutcomeRecord(object):
+    """
+    Describes the result of a single mission, as stored by a sink.
+    """
+    mission = attr.ib(type=Mission)
+    outcome = attr.ib(type=Optional[MissionOutcome])
+    trace = attr.ib(type=Optional[MissionTrace], default=None)
+    coverage = attr.ib(type=Optional[FileLineSet], default=None)
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> 'OutcomeRecord':
+        mission = Mission.from_dict(d['mission'])
+        system = mission.system
+        outcome = None  # type: Optional[MissionOutcome]
+        trace = None  # type: Optional[MissionTrace]
+        coverage = None  # type: Optional[FileLineSet]
+        if d.get('outcome') is not None:
+            outcome = MissionOutcome.from_dict(d['outcome'], system)
+        if 'trace' in d:
+            trace = MissionTrace.from_dict(d['trace'], system)
+        if 'coverage' in d:
+            coverage = FileLineSet.from_dict(d['coverage'])
+        return OutcomeRecord(mission, outcome, trace, coverage)
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {'mission': self.mission.to_dict(),
+             'outcome': self.outcome.to_dict() if self.outcome else None
+             }  # type: Dict[str, Any]
+        if self.trace is not None:
+            d['trace'] = self.trace.to_dict(compact=True)
+        if self.coverage is not None:
+            d['coverage'] = self.coverage.to_dict()
+        return d
+
+
+def _filenames(directory: str, prefix: str) -> List[str]:
+    """
+    Returns the files that belong to a sink within a given directory, in the
+    order that they were written.
+    """
+    indexed = []
+    pattern = os.path.join(glob.escape(directory), prefix + '-*.jsonl')
+    for fn in glob.glob(pattern):
+        match = _FILENAME_PATTERN.match(os.path.basename(fn))
+        if match and match.group('prefix') == prefix:
+            indexed.append((int(match.group('index')), fn))
+    return [fn for (_, fn) in sorted(indexed)]
+
+
+class OutcomeSink(object):
+    """
+    Writes outcomes to a sequence of rotating JSONL files within a given
+    directory (e.g., outcomes-00000.jsonl, outcomes-00001.jsonl), moving to
+    a new file after a fixed number of records. If the directory already
+    contains files for the sink, new files are appended after them.
+
+    The sink may be used directly as the callback of a MissionRunnerPool.
+    Writes block (rather than consume unbounded memory) if the writer thread
+    falls more than a given number of records behind. If the writer thread
+    fails to write to disk (e.g., because the disk is full), it discards all
+    subsequent records, and the next call to write or close raises an
+    OutcomeSinkError.
+    """
+    def __init__(self,
+                 directory: str,
+                 prefix: str = 'outcomes',
+                 records_per_file: int = 10000,
+                 max_pending: int = 1000
+                 ) -> None:
+        assert records_per_file > 0
+        assert max_pending > 0
+        os.makedirs(directory, exist_ok=True)
+        self.__directory = directory
+        self.__prefix = prefix
+        self.__records_per_file = records_per_file
+        self.__queue = queue.Queue(max_pending)  # type: queue.Queue
+        self.__num_written = 0
+        self.__closed = False
+        self.__error = None  # type: Optional[OSError]
+
+        existing = _filenames(directory, prefix)
+        if existing:
+            last = os.path.basename(existing[-1])
+            self.__file_index = \
+                int(_FILENAME_PATTERN.match(last).group('index')) + 1
+        else:
+            self.__file_index = 0
+
+        self.__writer = threading.Thread(target=self.__write_all)
+        self.__writer.daemon = True
+        self.__writer.start()
+
+    @property
+    def directory(self) -> str:
+        return self.__directory
+
+    @property
+    def num_written(self) -> int:
+        """
+        The number of records that have been written to disk.
+        """
+        return self.__num_written
+
+    def __enter__(self) -> 'OutcomeSink':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __call__(self,
+                 mission: Mission,
+                 outcome: Optional[MissionOutcome],
+                 coverage: Optional[FileLineSet] = None
+                 ) -> None:
+        self.write(mission, outcome, coverage=coverage)
+
+    def write(self,
+              mission: Mission,
+              outcome: Optional[MissionOutcome],
+              trace: Optional[MissionTrace] = None,
+              coverage: Optional[FileLineSet] = None
+              ) -> None:
+        """
+        Schedules the result of a given mission to be written to disk.
+        """
+        if self.__closed:
+            raise ValueError("cannot write to a closed sink")
+        self.__check_error()
+        record = OutcomeRecord(mission, outcome, trace, coverage)
+        self.__queue.put(record)
+
+    def close(self) -> None:
+        """
+        Waits for all pending records to be written, and closes the sink.
+        """
+        if self.__closed:
+            return
+        self.__closed = True
+        self.__queue.put(None)
+        self.__writer.join()
+        self.__check_error()
+
+    def __check_error(self) -> None:
+        error = self.__error
+        if error is not None:
+            raise exceptions.OutcomeSinkError(str(error)) from error
+
+    def __open_next(self):
+        fn = '{}-{:05d}.jsonl'.format(self.__prefix, self.__file_index)
+        self.__file_index += 1
+        return open(os.path.join(self.__directory, fn), 'w')
+
+    def __write_all(self) -> None:
+        # after a write error, records continue to be taken from the queue
+        # (and discarded) so that write and close never block
+        f = None
+        num_in_file = 0
+        try:
+            while True:
+                record = self.__queue.get()
+                if record is None:
+                    return
+                if self.__error is not None:
+                    continue
+                try:
+                    line = json.dumps(record.to_dict())
+                except Exception:
+                    logger.exception("failed to serialise outcome")
+                    continue
+                try:
+                    if f is None or num_in_file == self.__records_per_file:
+                        if f:
+                            f.close()
+                        f = None
+                        f = self.__open_next()
+                        num_in_file = 0
+                    f.write(line)
+                    f.write('\n')
+                    f.flush()
+                except OSError as error:
+                    logger.exception("failed to write outcome")
+                    self.__error = error
+                    continue
+                num_in_file += 1
+                self.__num_written += 1
+        finally:
+            if f:
+                try:
+                    f.close()
+                except OSError:
+                    logger.exception("failed to close outcome file")
+
+
+def read_outcomes(directory: str,
+                  prefix: str = 'outcomes'
+                  ) -> Iterator[OutcomeRecord]:
+    """
+    Lazily reads the records that were written by a sink to a given
+    directory, in the order that they were written. Any incomplete record at
+    the end of a file (e.g., due to a crash) is skipped.
+    """
+    for fn in _filenames(directory, prefix):
+        with open(fn, 'r') as f:
+            for line in f:
+                try:
+                    d = json.loads(line)
+                except ValueError:
+                    logger.warning("skipping incomplete record in file: %s",
+                                   fn)
+                    continue
+                yield OutcomeRecord.from_dict(d)
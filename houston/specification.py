@@ -7,6 +7,7 @@ import random
 import math
 
 import attr
+import numpy as np
 import sexpdata
 import z3
 
@@ -14,6 +15,7 @@ from . import exceptions
 from .configuration import Configuration
 from .state import State
 from .environment import Environment
+from .vectorized import CompiledExpression, StateTable
 
 logger = logging.getLogger(__name__)  # type: logging.Logger
 logger.setLevel(logging.DEBUG)
@@ -21,6 +23,28 @@ logger.setLevel(logging.DEBUG)
 Timeout = \
     Callable[['Command', State, Environment, Configuration], float]
 
+# the learned timeout model (if any) that is used by Specification.timeout;
+# see houston.timeouts
+_TIMEOUT_MODEL = None  # type: Optional[TimeoutModel]
+
+# the smallest fraction of the hand-written timeout that may be used in
+# place of a learned timeout
+MIN_LEARNED_TIMEOUT_FRACTION = 0.25
+
+
+def set_timeout_model(model: 'Optional[TimeoutModel]') -> None:
+    """
+    Sets the model that should be used to compute the timeouts for
+    specifications. If None is given, the hand-written timeout functions for
+    each specification are used.
+    """
+    global _TIMEOUT_MODEL
+    _TIMEOUT_MODEL = model
+
+
+def get_timeout_model() -> 'Optional[TimeoutModel]':
+    return _TIMEOUT_MODEL
+
 
 class Expression(object):
     def __init__(self, s_expression: str) -> None:
@@ -28,11 +52,44 @@ class Expression(object):
             raise exceptions.InvalidExpression
 
         self.__expression = s_expression
+        # compiled forms of this expression, indexed by state and command class
+        self.__compiled = {}  # type: Dict[Tuple[type, type], Any]
 
     @property
     def expression(self) -> str:
         return self.__expression
 
+    def compile(self,
+                state_cls: Type[State],
+                command_cls: Type['Command']
+                ) -> CompiledExpression:
+        """
+        Returns a vectorized form of this expression for a given State and
+        Command class. Compiled expressions are cached.
+
+        Raises:
+            UnsupportedExpression: the expression uses a feature that is not
+                supported by the vectorized evaluator.
+        """
+        key = (state_cls, command_cls)
+        if key not in self.__compiled:
+            self.__compiled[key] = \
+                CompiledExpression(self.__expression, state_cls, command_cls)
+        return self.__compiled[key]
+
+    def satisfied_mask(self,
+                       command: 'Command',
+                       state_before: State,
+                       states_after: StateTable
+                       ) -> np.ndarray:
+        """
+        Determines which of a table of after states satisfy this
+        specification for a given command and before state, using a single
+        vectorized evaluation. Agrees with is_satisfied for each state.
+        """
+        compiled = self.compile(states_after.state_cls, command.__class__)
+        return compiled.evaluate(command, state_before, states_after)
+
     @staticmethod
     def is_valid(string: str) -> bool:
         """
@@ -340,9 +397,19 @@ class Specification(object):
                 ) -> float:
         """
         Returns an upper bound on the length of time that it should take for
-        a given command to satisfy this specification.
+        a given command to satisfy this specification. If a learned timeout
+        model has been set (see houston.timeouts), and that model covers
+        this specification, its prediction is used instead of the
+        hand-written timeout function, but is never less than
+        MIN_LEARNED_TIMEOUT_FRACTION of the hand-written timeout.
         """
-        return self.__timeout(command, state, environment, config)
+        timeout = self.__timeout(command, state, environment, config)
+        model = _TIMEOUT_MODEL
+        if model is not None:
+            learned = model.predict(command, self, state, config)
+            if learned is not None:
+                return max(learned, MIN_LEARNED_TIMEOUT_FRACTION * timeout)
+        return timeout
 
     def get_constraint(self,
                        ctx: z3.Context,
@@ -0,0 +1,281 @@
+"""
+Provides a model of the time that each command should take to satisfy each
+of its specifications, learned from recorded traces, which may be used in
+place of the hand-written timeout functions of those specifications.
+
+For each pair of command type and specification, the model fits a linear
+function of a small set of features (e.g., the distance to the target of
+the command) to the observed times to satisfaction. The intercept of that
+function is shifted to a given quantile of its residuals, and the result is
+multiplied by a safety margin. When a model is used by Specification.timeout,
+its predictions are never less than MIN_LEARNED_TIMEOUT_FRACTION of the
+hand-written timeout.
+"""
+__all__ = ['TimeoutSample', 'TimeoutModel', 'extract_features',
+           'samples_from_trace', 'set_timeout_model', 'get_timeout_model',
+           'MIN_LEARNED_TIMEOUT_FRACTION']
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import logging
+
+import attr
+import geopy.distance
+import numpy as np
+
+from . import exceptions
+from .configuration import Configuration
+from .specification import MIN_LEARNED_TIMEOUT_FRACTION, \
+    get_timeout_model, set_timeout_model
+from .fingerprint import PARAMETER_ALIASES
+from .mission import Mission
+from .state import State
+from .trace import MissionTrace
+from .vectorized import StateTable, first_satisfied
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+FEATURES = ('constant', 'distance', 'climb', 'altitude', 'home_distance')
+
+
+def extract_features(command: 'Command',
+                     state: State,
+                     config: Configuration
+                     ) -> Tuple[float, ...]:
+    """
+    Computes the features that are used to predict the time taken by a
+    given command when executed in a given state. Features that do not apply
+    to the command or state (e.g., the distance travelled by a command without
+    a target location) are zero. All features are divided by the speedup
+    of the configuration, if it has one. Parameters are matched to state
+    variables by name, or by their alias in PARAMETER_ALIASES (e.g., the
+    `lat` parameter of a factory command measures `latitude`).
+    """
+    params = {PARAMETER_ALIASES.get(p.name, p.name): p.name for p in command}
+    variables = state.__class__.variables
+    distance = climb = altitude = home_distance = 0.0
+
+    if 'latitude' in variables and 'longitude' in variables:
+        loc = (state['latitude'], state['longitude'])
+        if 'latitude' in params and 'longitude' in params:
+            to_loc = (command[params['latitude']],
+                      command[params['longitude']])
+            distance = geopy.distance.great_circle(loc, to_loc).meters
+        if 'home_latitude' in variables and 'home_longitude' in variables:
+            home = (state['home_latitude'], state['home_longitude'])
+            home_distance = geopy.distance.great_circle(loc, home).meters
+    if 'altitude' in variables:
+        altitude = abs(state['altitude'])
+        if 'altitude' in params:
+            climb = abs(command[params['altitude']] - state['altitude'])
+
+    speedup = float(getattr(config, 'speedup', 1) or 1)
+    features = (1.0, distance, climb, altitude, home_distance)
+    return tuple(f / speedup for f in features)
+
+
+@attr.s(frozen=True)
+class TimeoutSample(object):
+    """
+    Records the time that a command took to satisfy a given specification.
+
+    Attributes:
+        command: the UID of the command.
+        spec: the name of the specification.
+        features: the features of the command and its start state.
+        duration: the number of seconds between the start of the command and
+            the first state that satisfied the postcondition.
+    """
+    command = attr.ib(type=str)
+    spec = attr.ib(type=str)
+    features = attr.ib(type=Tuple[float, ...], converter=tuple)
+    duration = attr.ib(type=float)
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> 'TimeoutSample':
+        return TimeoutSample(d['command'], d['spec'], d['features'],
+                             d['duration'])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return attr.asdict(self)
+
+
+def samples_from_trace(mission: Mission,
+                       trace: MissionTrace
+                       ) -> List[TimeoutSample]:
+    """
+    Measures the time to satisfaction of each command within a recorded
+    trace. Commands that never satisfied their postcondition, or whose
+    specification could not be resolved, are omitted, as are commands whose
+    postcondition was already satisfied by the state in which they started
+    (e.g., those with the trivial Idle specification), since their time to
+    satisfaction says nothing about how long the command takes. States and
+    timings are determined in the same way as houston.verify.check_trace.
+    """
+    env = mission.environment
+    config = mission.configuration
+    samples = []  # type: List[TimeoutSample]
+    state_before = mission.initial_state  # type: State
+    time_before = None  # type: Optional[float]
+
+    for command_trace in trace:
+        command = command_trace.command
+        states = command_trace.states
+        if not states:
+            continue
+        if time_before is None:
+            time_before = states[0].time_offset
+        try:
+            spec = command.resolve(state_before, env, config)
+            table = StateTable.from_states(states)
+            start = StateTable.from_states([state_before])
+            trivial = spec.postcondition.satisfied_mask(command,
+                                                        state_before,
+                                                        start)[0]
+            mask = None if trivial else \
+                spec.postcondition.satisfied_mask(command, state_before,
+                                                  table)
+        except exceptions.UnsupportedExpression:
+            logger.debug("unable to measure command: %s", command)
+            mask = None
+        except Exception:
+            logger.debug("failed to resolve specification: %s", command)
+            mask = None
+
+        index = first_satisfied(mask) if mask is not None else None
+        if index is not None:
+            duration = float(table.time_offsets[index]) - time_before
+            features = extract_features(command, state_before, config)
+            samples.append(TimeoutSample(command.uid, spec.name, features,
+                                         duration))
+
+        state_before = states[-1]
+        time_before = state_before.time_offset
+
+    return samples
+
+
+@attr.s(frozen=True)
+class _Fit(object):
+    coefficients = attr.ib(type=Tuple[float, ...], converter=tuple)
+    offset = attr.ib(type=float)
+    num_samples = attr.ib(type=int)
+
+
+class TimeoutModel(object):
+    """
+    Predicts the timeout for a given command and specification from its
+    features, using a separate linear model for each pair of command type
+    and specification.
+    """
+    @staticmethod
+    def fit(samples: Iterable[TimeoutSample],
+            quantile: float = 0.99,
+            margin: float = 1.2,
+            min_samples: int = 10
+            ) -> 'TimeoutModel':
+        """
+        Fits a model to a given set of samples.
+
+        Parameters:
+            samples: the samples used to fit the model.
+            quantile: the quantile of observed durations that timeouts
+                should cover, before the margin is applied.
+            margin: the factor by which predictions are multiplied.
+            min_samples: the minimum number of samples that are required to
+                fit a model for a given command type and specification.
+                Predictions are not made for pairs with fewer samples.
+        """
+        assert 0.0 < quantile <= 1.0
+        assert margin >= 1.0
+        grouped = {}  # type: Dict[Tuple[str, str], List[TimeoutSample]]
+        for sample in samples:
+            key = (sample.command, sample.spec)
+            grouped.setdefault(key, []).append(sample)
+
+        fits = {}  # type: Dict[Tuple[str, str], _Fit]
+        for key, group in grouped.items():
+            if len(group) < min_samples:
+                logger.debug("too few samples to fit model for %s: %d",
+                             key, len(group))
+                continue
+            x = np.array([s.features for s in group], dtype=np.float64)
+            y = np.array([s.duration for s in group], dtype=np.float64)
+            coefficients = np.linalg.lstsq(x, y, rcond=None)[0]
+            residuals = y - x.dot(coefficients)
+            offset = float(np.quantile(residuals, quantile))
+            fits[key] = _Fit(coefficients.tolist(), offset, len(group))
+        return TimeoutModel(fits, quantile, margin)
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> 'TimeoutModel':
+        fits = {(f['command'], f['spec']): _Fit(f['coefficients'],
+                                                f['offset'],
+                                                f['num_samples'])
+                for f in d['fits']}
+        return TimeoutModel(fits, d['quantile'], d['margin'])
+
+    @staticmethod
+    def from_file(filename: str) -> 'TimeoutModel':
+        with open(filename, 'r') as f:
+            return TimeoutModel.from_dict(json.load(f))
+
+    def __init__(self,
+                 fits: Dict[Tuple[str, str], _Fit],
+                 quantile: float,
+                 margin: float
+                 ) -> None:
+        self.__fits = fits
+        self.__quantile = quantile
+        self.__margin = margin
+
+    @property
+    def quantile(self) -> float:
+        return self.__quantile
+
+    @property
+    def margin(self) -> float:
+        return self.__margin
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        """
+        Determines whether this model has a fit for a given pair of command
+        UID and specification name.
+        """
+        return key in self.__fits
+
+    def predict(self,
+                command: 'Command',
+                spec: 'Specification',
+                state: State,
+                config: Configuration
+                ) -> Optional[float]:
+        """
+        Returns the timeout for a given command and specification when the
+        command is executed in a given state, or None if the model has no
+        fit for that command type and specification.
+        """
+        try:
+            fit = self.__fits[(command.uid, spec.name)]
+        except KeyError:
+            return None
+        features = extract_features(command, state, config)
+        duration = float(np.dot(fit.coefficients, features)) + fit.offset
+        return max(duration, 0.0) * self.__margin
+
+    def to_dict(self) -> Dict[str, Any]:
+        fits = [{'command': command,
+                 'spec': spec,
+                 'coefficients': list(f.coefficients),
+                 'offset': f.offset,
+                 'num_samples': f.num_samples}
+                for ((command, spec), f) in self.__fits.items()]
+        return {'features': list(FEATURES),
+                'quantile': self.__quantile,
+                'margin': self.__margin,
+                'fits': fits}
+
+    def to_file(self, filename: str) -> None:
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
@@ -0,0 +1,141 @@
+"""
+Provides structured timing information for the phases of a mission (e.g.,
+container provisioning, connecting to the vehicle, and executing each
+command), allowing the wall-clock time of a mission to be broken down.
+"""
+__all__ = ['Span', 'Timeline', 'TimingStats']
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, \
+    Optional, Tuple
+from contextlib import contextmanager
+from timeit import default_timer as timer
+import threading
+
+import attr
+
+
+@attr.s(frozen=True)
+class Span(object):
+    """
+    Describes the time taken by a single phase of a mission.
+
+    Attributes:
+        name: the name of the phase (e.g., 'provision').
+        start: the number of seconds between the start of the timeline and
+            the start of the phase.
+        duration: the number of seconds taken by the phase.
+        label: an optional description of the subject of the phase (e.g.,
+            the command that was executed).
+    """
+    name = attr.ib(type=str)
+    start = attr.ib(type=float)
+    duration = attr.ib(type=float)
+    label = attr.ib(type=Optional[str], default=None)
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> 'Span':
+        return Span(d['name'], d['start'], d['duration'], d.get('label'))
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {'name': self.name,
+             'start': self.start,
+             'duration': self.duration}  # type: Dict[str, Any]
+        if self.label is not None:
+            d['label'] = self.label
+        return d
+
+
+class Timeline(object):
+    """
+    Records the spans of time taken by each phase of a mission. Spans may be
+    recorded from any thread.
+    """
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__time_start = timer()
+        self.__spans = []  # type: List[Span]
+        self.__listeners = []  # type: List[Callable[[Span], None]]
+
+    def add_listener(self, listener: Callable[[Span], None]) -> None:
+        """
+        Adds a function that is called with each span that is recorded from
+        this point onwards.
+        """
+        with self.__lock:
+            self.__listeners.append(listener)
+
+    @property
+    def spans(self) -> Tuple[Span, ...]:
+        """
+        The spans that have been recorded, in the order that they finished.
+        """
+        with self.__lock:
+            return tuple(self.__spans)
+
+    @contextmanager
+    def span(self, name: str, label: Optional[str] = None) -> Iterator[None]:
+        """
+        Records the time spent inside this context as a span with a given
+        name. The span is recorded even if an exception is raised.
+        """
+        time_start = timer()
+        try:
+            yield
+        finally:
+            self.record(name, time_start, timer() - time_start, label)
+
+    def record(self,
+               name: str,
+               time_start: float,
+               duration: float,
+               label: Optional[str] = None
+               ) -> None:
+        """
+        Records a span that started at a given (absolute) time.
+        """
+        span = Span(name, time_start - self.__time_start, duration, label)
+        with self.__lock:
+            self.__spans.append(span)
+            listeners = list(self.__listeners)
+        for listener in listeners:
+            listener(span)
+
+    def totals(self) -> Dict[str, float]:
+        """
+        Computes the total time spent in each phase.
+        """
+        totals = {}  # type: Dict[str, float]
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration
+        return totals
+
+
+class TimingStats(object):
+    """
+    Aggregates the spans for a number of missions, and reports the number
+    of occurrences of each phase along with the total and maximum time
+    spent in it. Safe to update from multiple threads.
+    """
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__count = {}  # type: Dict[str, int]
+        self.__total = {}  # type: Dict[str, float]
+        self.__max = {}  # type: Dict[str, float]
+
+    def add(self, spans: Iterable[Span]) -> None:
+        with self.__lock:
+            for span in spans:
+                name = span.name
+                self.__count[name] = self.__count.get(name, 0) + 1
+                self.__total[name] = \
+                    self.__total.get(name, 0.0) + span.duration
+                self.__max[name] = max(self.__max.get(name, 0.0),
+                                       span.duration)
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        with self.__lock:
+            return {name: {'count': n,
+                           'total': self.__total[name],
+                           'mean': self.__total[name] / n,
+                           'max': self.__max[name]}
+                    for (name, n) in self.__count.items()}
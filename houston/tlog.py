@@ -0,0 +1,105 @@
+"""
+Provides support for capturing raw MAVLink messages to telemetry logs
+(tlogs), using the standard layout read by pymavlink, MAVProxy and Mission
+Planner: each message is preceded by a big-endian, 64-bit timestamp,
+measured in microseconds since the UNIX epoch.
+"""
+__all__ = ['TlogWriter', 'read_tlog']
+
+from typing import Any, Iterator, Optional, Tuple
+import queue
+import struct
+import threading
+import time
+import logging
+
+from pymavlink import mavutil
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+_TIMESTAMP = struct.Struct('>Q')
+
+
+class TlogWriter(object):
+    """
+    Writes raw MAVLink messages to a tlog file on a background thread, so
+    that capture does not slow down the thread that receives messages.
+    """
+    def __init__(self, filename: str) -> None:
+        self.__filename = filename
+        self.__file = open(filename, 'wb')
+        self.__queue = queue.Queue()  # type: queue.Queue
+        self.__num_messages = 0
+        self.__thread = threading.Thread(target=self.__write_all)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __enter__(self) -> 'TlogWriter':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def filename(self) -> str:
+        return self.__filename
+
+    @property
+    def num_messages(self) -> int:
+        """
+        The number of messages that have been written to disk.
+        """
+        return self.__num_messages
+
+    def write(self, message: Any, timestamp: Optional[float] = None) -> None:
+        """
+        Schedules a pymavlink message to be written to the log. If no
+        timestamp (in seconds since the epoch) is given, the current time
+        is used.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        buff = message.get_msgbuf()
+        if buff:
+            self.__queue.put((timestamp, bytes(buff)))
+
+    def __write_all(self) -> None:
+        f = self.__file
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                break
+            timestamp, buff = item
+            f.write(_TIMESTAMP.pack(int(timestamp * 1.0e6)))
+            f.write(buff)
+            self.__num_messages += 1
+        f.close()
+
+    def close(self) -> None:
+        """
+        Writes any pending messages to disk and closes the log.
+        """
+        if self.__thread.is_alive():
+            self.__queue.put(None)
+            self.__thread.join()
+        logger.debug("wrote %d messages to tlog: %s",
+                     self.__num_messages, self.__filename)
+
+
+def read_tlog(filename: str) -> Iterator[Tuple[float, Any]]:
+    """
+    Returns an iterator over the timestamp (in seconds since the epoch) and
+    decoded pymavlink message for each message in a given tlog.
+    """
+    mlog = mavutil.mavlink_connection(filename, notimestamps=False)
+    try:
+        while True:
+            message = mlog.recv_msg()
+            if message is None:
+                return
+            if message.get_type() == 'BAD_DATA':
+                continue
+            yield message._timestamp, message
+    finally:
+        mlog.close()
@@ -8,7 +8,9 @@ import threading
 from bugzoo.core.fileline import FileLineSet
 
 from .command import Command
+from .coverage import LineIndex, CoverageBitset
 from .state import State
+from .timing import Span
 from .connection import Message
 
 
@@ -47,30 +49,61 @@ class CommandTrace(object):
 
     @staticmethod
     def from_dict(d: Dict[str, Any],
-                  system: 'Type[System]'
+                  system: 'Type[System]',
+                  index: Optional[LineIndex] = None
                   ) -> 'CommandTrace':
+        """
+        Reads a command trace from a dictionary. If the coverage for the
+        trace is stored as a compact bitset, the index that was used to
+        produce that bitset must be provided.
+        """
         command = Command.from_dict(d['command'])
         states = tuple(system.state.from_dict(s) for s in d['states'])
-        if 'coverage' in d:
+        if 'coverage' in d and index is not None:
+            bitset = CoverageBitset.from_dict(index, d['coverage'])
+            coverage = bitset.to_file_lines()
+        elif 'coverage' in d:
             coverage = FileLineSet.from_dict(d['coverage'])
         else:
             coverage = None
         return CommandTrace(command, states, coverage)
 
-    def to_dict(self) -> Dict[str, Any]:
+    def to_dict(self, index: Optional[LineIndex] = None) -> Dict[str, Any]:
+        """
+        Returns a JSON-ready description of this trace. If an index is
+        provided, coverage is written as a compact bitset over that index.
+        """
         cmd = {'command': self.command.to_dict(),
                'states': [s.to_dict() for s in self.states]}
-        if self.coverage:
+        if self.coverage and index is not None:
+            cmd['coverage'] = self.coverage_bitset(index).to_dict()
+        elif self.coverage:
             cmd['coverage'] = self.coverage.to_dict()
         return cmd
 
     def add_coverage(self, coverage: FileLineSet) -> None:
         self.coverage = coverage
 
+    def coverage_bitset(self, index: LineIndex) -> Optional[CoverageBitset]:
+        """
+        Returns the coverage for this trace as a bitset over a given index,
+        or None if no coverage was collected.
+        """
+        if self.coverage is None:
+            return None
+        return CoverageBitset.from_file_lines(index, self.coverage)
+
 
 @attr.s  # (frozen=True)
 class MissionTrace(object):
     commands = attr.ib(type=Tuple[CommandTrace, ...])
+    # the name of the tlog file (if any) containing the raw MAVLink
+    # messages that were received during the mission
+    tlog = attr.ib(type=Optional[str], default=None)
+    # the reason (if any) that the mission was aborted before it completed
+    abort = attr.ib(type=Optional[str], default=None)
+    # the time taken by each phase of the mission
+    timings = attr.ib(type=Tuple[Span, ...], default=(), converter=tuple)
 
     @staticmethod
     def from_file(filename: str,
@@ -80,20 +113,52 @@ class MissionTrace(object):
             jsn = json.load(f)
         return MissionTrace.from_dict(jsn, system)
 
-    def to_file(self, filename: str) -> None:
+    def to_file(self, filename: str, compact: bool = False) -> None:
         with open(filename, 'w') as f:
-            json.dump(self.to_dict(), f)
+            json.dump(self.to_dict(compact), f)
 
     @staticmethod
     def from_dict(d: Dict[str, Any],
                   system: 'Type[System]'
                   ) -> 'MissionTrace':
-        commands = tuple(CommandTrace.from_dict(c, system)
+        index = None  # type: Optional[LineIndex]
+        if 'lines' in d:
+            index = LineIndex.from_dict(d['lines'])
+        commands = tuple(CommandTrace.from_dict(c, system, index)
                          for c in d['commands'])
-        return MissionTrace(commands)
+        timings = [Span.from_dict(s) for s in d.get('timings', [])]
+        return MissionTrace(commands, d.get('tlog'), d.get('abort'), timings)
 
-    def to_dict(self) -> Dict[str, Any]:
-        return {'commands': [c.to_dict() for c in self]}
+    def to_dict(self, compact: bool = False) -> Dict[str, Any]:
+        """
+        Returns a JSON-ready description of this trace. If compact is True,
+        the coverage for each command is written as a bitset over a single
+        line index that is stored alongside the trace.
+        """
+        if not compact or not any(c.coverage for c in self):
+            d = {'commands': [c.to_dict() for c in self]}
+        else:
+            index = LineIndex()
+            commands = [c.to_dict(index) for c in self]
+            d = {'lines': index.to_dict(), 'commands': commands}
+        if self.tlog:
+            d['tlog'] = self.tlog
+        if self.abort:
+            d['abort'] = self.abort
+        if self.timings:
+            d['timings'] = [s.to_dict() for s in self.timings]
+        return d
+
+    def coverage_bitset(self, index: LineIndex) -> Optional[CoverageBitset]:
+        """
+        Returns the union of the coverage for each command in this trace as a
+        bitset over a given index, or None if no coverage was collected.
+        """
+        bitsets = [c.coverage_bitset(index) for c in self]
+        bitsets = [b for b in bitsets if b is not None]
+        if not bitsets:
+            return None
+        return bitsets[0].union(*bitsets[1:])
 
     def __iter__(self) -> Iterator[CommandTrace]:
         """
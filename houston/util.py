@@ -63,3 +63,27 @@ class Stopwatch(object):
 def printflush(s):
     print(s)
     sys.stdout.flush()
+
+
+class AppServer(object):
+    """
+    Serves a given WSGI application (e.g., a Flask app) on a background
+    thread until it is stopped.
+    """
+    def __init__(self, app, host: str, port: int) -> None:
+        import threading
+        from werkzeug.serving import make_server
+        self.__server = make_server(host, port, app, threaded=True)
+        self.__thread = threading.Thread(target=self.__server.serve_forever)
+        self.__thread.daemon = True
+
+    @property
+    def port(self) -> int:
+        return self.__server.server_port
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__server.shutdown()
+        self.__thread.join()
@@ -1,5 +1,7 @@
 import random
 
+import numpy
+
 
 class ValueRange(object):
     """
@@ -12,6 +14,13 @@ class ValueRange(object):
         """
         raise NotImplementedError
 
+    def sample_batch(self, size, rng):
+        """
+        Uses uniform selection to sample an array of values from this range,
+        using a NumPy random generator.
+        """
+        raise NotImplementedError
+
     @property
     def type(self):
         """
@@ -54,6 +63,10 @@ class DiscreteValueRange(ValueRange):
         assert (isinstance(rng, random.Random) and rng is not None)
         return rng.choice(self.__values)
 
+    def sample_batch(self, size, rng):
+        values = numpy.array(list(self.__values))
+        return values[rng.choice(len(values), size)]
+
     @property
     def type(self):
         return self.__typ
@@ -77,10 +90,21 @@ class ContinuousValueRange(ValueRange):
         self.__max_value = max_value
         self.__inclusive = inclusive
 
+    @property
+    def min_value(self):
+        return self.__min_value
+
+    @property
+    def max_value(self):
+        return self.__max_value
+
     def sample(self, rng):
         assert isinstance(rng, random.Random)
         return rng.uniform(self.__min_value, self.__max_value)
 
+    def sample_batch(self, size, rng):
+        return rng.uniform(self.__min_value, self.__max_value, size)
+
     @property
     def type(self):
         return float
@@ -0,0 +1,306 @@
+"""
+Provides a vectorized evaluator for the specification language, which
+compiles s-expressions to NumPy operations over a columnar table of states.
+This allows a postcondition to be checked against every state in a command
+trace with a single call, rather than solving one Z3 query per state.
+
+Equalities between arithmetic terms are relaxed using the same noise rules
+as Expression.recreate_with_noise and Expression.get_noise, so the mask
+returned for each state agrees with Expression.is_satisfied (up to
+floating-point rounding).
+"""
+__all__ = ['StateTable', 'CompiledExpression', 'first_satisfied']
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, \
+    Type
+from functools import reduce
+import logging
+import math
+import operator
+
+import attr
+import numpy as np
+import sexpdata
+
+from . import exceptions
+from .state import State
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+_DTYPES = {float: np.float64,
+           int: np.int64,
+           bool: np.bool_,
+           str: np.object_}
+
+
+class StateTable(object):
+    """
+    Stores a sequence of states as a set of columns, indexed by the name of
+    each state variable.
+    """
+    @staticmethod
+    def from_states(states: Sequence[State],
+                    state_cls: Optional[Type[State]] = None
+                    ) -> 'StateTable':
+        """
+        Builds a table from a sequence of states. If the sequence is empty,
+        the class of its states must be given.
+        """
+        if state_cls is None:
+            state_cls = states[0].__class__
+        columns = {}  # type: Dict[str, np.ndarray]
+        for name, v in state_cls.variables.items():
+            dtype = _DTYPES.get(v.typ, np.object_)
+            columns[name] = np.array([s[name] for s in states], dtype=dtype)
+        time_offsets = np.array([s.time_offset for s in states],
+                                dtype=np.float64)
+        return StateTable(state_cls, columns, time_offsets)
+
+    def __init__(self,
+                 state_cls: Type[State],
+                 columns: Dict[str, np.ndarray],
+                 time_offsets: np.ndarray
+                 ) -> None:
+        self.__state_cls = state_cls
+        self.__columns = columns
+        self.__time_offsets = time_offsets
+
+    @property
+    def state_cls(self) -> Type[State]:
+        return self.__state_cls
+
+    @property
+    def time_offsets(self) -> np.ndarray:
+        """
+        The time offset of each state in the table.
+        """
+        return self.__time_offsets
+
+    def __len__(self) -> int:
+        return len(self.__time_offsets)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """
+        Returns the column for a given state variable.
+        """
+        return self.__columns[name]
+
+
+@attr.s(frozen=True)
+class _Frame(object):
+    command = attr.ib(type='Command')
+    state_before = attr.ib(type=State)
+    table = attr.ib(type=StateTable)
+
+
+@attr.s(frozen=True)
+class _Node(object):
+    """
+    A compiled term, described by its sort (i.e., 'arith', 'bool' or 'str'),
+    its noise, as computed by Expression.get_noise, and a function that
+    computes its value (either a scalar or a column) for a given frame.
+    """
+    sort = attr.ib(type=str)
+    noise = attr.ib(type=float)
+    evaluate = attr.ib(type=Callable[[_Frame], Any])
+
+
+def _sort(typ: Type) -> str:
+    if typ in (int, float):
+        return 'arith'
+    if typ == bool:
+        return 'bool'
+    if typ == str:
+        return 'str'
+    raise exceptions.UnsupportedVariableType(typ)
+
+
+def _fold(op: Callable[[Any, Any], Any]) -> Callable[..., Any]:
+    return lambda *args: reduce(op, args)
+
+
+def _chain(op: Callable[[Any, Any], Any]) -> Callable[..., Any]:
+    def apply(*args):
+        pairs = [op(x, y) for (x, y) in zip(args, args[1:])]
+        return reduce(np.logical_and, pairs)
+    return apply
+
+
+def _minus(*args):
+    if len(args) == 1:
+        return np.negative(args[0])
+    return reduce(operator.sub, args)
+
+
+# operators that do not require special treatment, given as a mapping from
+# their name to their result sort and an implementation over arrays.
+_OPERATORS = {
+    'and': ('bool', _fold(np.logical_and)),
+    'or': ('bool', _fold(np.logical_or)),
+    'xor': ('bool', _fold(np.logical_xor)),
+    'not': ('bool', np.logical_not),
+    '=>': ('bool', lambda x, y: np.logical_or(np.logical_not(x), y)),
+    'distinct': ('bool', _chain(operator.ne)),
+    '<': ('bool', _chain(operator.lt)),
+    '<=': ('bool', _chain(operator.le)),
+    '>': ('bool', _chain(operator.gt)),
+    '>=': ('bool', _chain(operator.ge)),
+    '+': ('arith', _fold(operator.add)),
+    '-': ('arith', _minus),
+    '*': ('arith', _fold(operator.mul)),
+    '/': ('arith', _fold(np.true_divide)),
+    'div': ('arith', _fold(np.floor_divide)),
+    'mod': ('arith', _fold(np.mod)),
+    'abs': ('arith', np.abs),
+    '^': ('arith', np.power)
+}  # type: Dict[str, Tuple[str, Callable[..., Any]]]
+
+
+class CompiledExpression(object):
+    """
+    An s-expression that has been compiled to a set of NumPy operations for
+    a particular State and Command class.
+    """
+    def __init__(self,
+                 expression: str,
+                 state_cls: Type[State],
+                 command_cls: Type['Command']
+                 ) -> None:
+        self.__expression = expression
+        self.__state_cls = state_cls
+        self.__command_cls = command_cls
+        self.__uses_state_after = False
+        self.__root = self.__compile(sexpdata.loads(expression))
+        if self.__root.sort != 'bool':
+            m = "expression is not a predicate: {}".format(expression)
+            raise exceptions.UnsupportedExpression(m)
+
+    @property
+    def expression(self) -> str:
+        return self.__expression
+
+    @property
+    def uses_state_after(self) -> bool:
+        """
+        Indicates whether this expression refers to the state after the
+        command (i.e., to any variables prefixed by '__').
+        """
+        return self.__uses_state_after
+
+    def evaluate(self,
+                 command: 'Command',
+                 state_before: State,
+                 table: StateTable
+                 ) -> np.ndarray:
+        """
+        Returns a boolean mask that indicates whether each state in a given
+        table satisfies this expression, when used as the state after a given
+        command was executed from a particular state.
+        """
+        frame = _Frame(command, state_before, table)
+        values = self.__root.evaluate(frame)
+        return np.broadcast_to(np.asarray(values, dtype=np.bool_),
+                               (len(table),))
+
+    def __compile(self, sexp: Any) -> _Node:
+        if isinstance(sexp, sexpdata.Symbol):
+            return self.__compile_symbol(sexp.value())
+        if isinstance(sexp, bool):
+            return _Node('bool', 0.0, lambda f: sexp)
+        if isinstance(sexp, (int, float)):
+            return _Node('arith', 0.0, lambda f: sexp)
+        if isinstance(sexp, str):
+            return _Node('str', 0.0, lambda f: sexp)
+        if isinstance(sexp, list) and sexp and \
+                isinstance(sexp[0], sexpdata.Symbol):
+            name = sexp[0].value()
+            args = [self.__compile(x) for x in sexp[1:]]
+            return self.__compile_application(name, sexp[1:], args)
+        m = "unable to compile term: {}".format(sexpdata.dumps(sexp))
+        raise exceptions.UnsupportedExpression(m)
+
+    def __compile_symbol(self, name: str) -> _Node:
+        if name in ('true', 'false'):
+            value = name == 'true'
+            return _Node('bool', 0.0, lambda f: value)
+
+        if name.startswith('$'):
+            param = name[1:]
+            try:
+                p = next(p for p in self.__command_cls.parameters
+                         if p.name == param)
+            except StopIteration:
+                m = "no parameter [{}] in command [{}]"
+                m = m.format(param, self.__command_cls.uid)
+                raise exceptions.UnsupportedExpression(m)
+            return _Node(_sort(p.type), 0.0, lambda f: f.command[param])
+
+        after = name.startswith('__')
+        var_name = name[2:] if after else name[1:]
+        variables = self.__state_cls.variables
+        if not name.startswith('_') or var_name not in variables:
+            m = "unknown variable: {}".format(name)
+            raise exceptions.UnsupportedExpression(m)
+        v = variables[var_name]
+        noise = float(v.noise) if v.is_noisy else 0.0
+        if after:
+            self.__uses_state_after = True
+            return _Node(_sort(v.typ), noise, lambda f: f.table[var_name])
+        return _Node(_sort(v.typ), noise,
+                     lambda f: f.state_before[var_name])
+
+    def __compile_application(self,
+                              name: str,
+                              sexp_args: List[Any],
+                              args: List[_Node]
+                              ) -> _Node:
+        noises = [a.noise for a in args]
+        # see Expression.get_noise
+        if name == '*':
+            noise = reduce(operator.mul, noises, 1.0)
+        elif name == '^' and isinstance(sexp_args[1], int):
+            noise = math.pow(noises[0], sexp_args[1])
+        elif name == '^':
+            noise = noises[0]
+        else:
+            noise = math.fsum(noises)
+
+        fns = [a.evaluate for a in args]
+        if name == 'ite':
+            return _Node(args[1].sort, noise,
+                         lambda f: np.where(fns[0](f), fns[1](f), fns[2](f)))
+        if name == '=':
+            return _Node('bool', noise, self.__compile_equality(args))
+
+        try:
+            sort, op = _OPERATORS[name]
+        except KeyError:
+            m = "unsupported operator: {}".format(name)
+            raise exceptions.UnsupportedExpression(m)
+        return _Node(sort, noise, lambda f: op(*[fn(f) for fn in fns]))
+
+    def __compile_equality(self,
+                           args: List[_Node]
+                           ) -> Callable[[_Frame], Any]:
+        # see Expression.recreate_with_noise
+        if any(a.sort != 'arith' for a in args):
+            return lambda f: _chain(operator.eq)(*[a.evaluate(f)
+                                                   for a in args])
+
+        def eq(x: _Node, y: _Node) -> Callable[[_Frame], Any]:
+            noise = x.noise + y.noise
+            return lambda f: np.abs(x.evaluate(f) - y.evaluate(f)) <= noise
+
+        pairs = [eq(x, y) for (x, y) in zip(args, args[1:])]
+        return lambda f: reduce(np.logical_and, [p(f) for p in pairs])
+
+
+def first_satisfied(mask: np.ndarray) -> Optional[int]:
+    """
+    Returns the index of the first True entry in a given mask, or None if
+    there is no such entry.
+    """
+    if not mask.any():
+        return None
+    return int(np.argmax(mask))
@@ -0,0 +1,152 @@
+"""
+Provides offline checking of recorded mission traces against the
+specifications of their commands, allowing specifications to be revised and
+re-checked without re-executing any missions.
+"""
+__all__ = ['CommandCheck', 'SpecReport', 'check_trace', 'summarise']
+
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+import attr
+
+from . import exceptions
+from .mission import Mission
+from .state import State
+from .trace import MissionTrace
+from .vectorized import StateTable
+
+logger = logging.getLogger(__name__)  # type: logging.Logger
+logger.setLevel(logging.DEBUG)
+
+# the name used to report commands for which no specification was found
+UNRESOLVED = '<unresolved>'
+
+
+@attr.s(frozen=True)
+class CommandCheck(object):
+    """
+    Describes the outcome of checking a single command within a trace
+    against its specification.
+
+    Attributes:
+        index: the position of the command within the trace.
+        command: the UID of the command.
+        spec: the name of the specification that the command was expected
+            to satisfy, or UNRESOLVED if no specification could be found.
+        passed: whether the recorded states satisfy the specification.
+        duration: the number of seconds between the start and end state.
+    """
+    index = attr.ib(type=int)
+    command = attr.ib(type=str)
+    spec = attr.ib(type=str)
+    passed = attr.ib(type=bool)
+    duration = attr.ib(type=float)
+
+    def to_dict(self):
+        return attr.asdict(self)
+
+
+@attr.s(frozen=True)
+class SpecReport(object):
+    """
+    Summarises the outcomes of a number of checks for a single
+    specification of a given command.
+    """
+    command = attr.ib(type=str)
+    spec = attr.ib(type=str)
+    num_checked = attr.ib(type=int)
+    num_violations = attr.ib(type=int)
+
+    def to_dict(self):
+        return attr.asdict(self)
+
+
+def check_trace(mission: Mission,
+                trace: MissionTrace,
+                intermediate: bool = False
+                ) -> List[CommandCheck]:
+    """
+    Checks each of the commands within a recorded trace against the
+    specification that it was expected to satisfy.
+
+    The specification for each command is resolved using the state at the
+    start of that command: the last state of the preceding command, or, for
+    the first command, the initial state of the mission. Since the initial
+    state is not timestamped, the first command is timed from its first
+    recorded state. By default, the postcondition is checked against the
+    last recorded state of the command.
+    If intermediate is True, the command instead passes if any of its
+    recorded states satisfies the postcondition within the timeout of the
+    specification, mirroring the behaviour of Sandbox.run_command.
+    Postconditions are evaluated over all candidate states at once (see
+    houston.vectorized), falling back to Z3 for unsupported expressions.
+    """
+    env = mission.environment
+    config = mission.configuration
+    checks = []  # type: List[CommandCheck]
+    state_before = mission.initial_state  # type: State
+    time_before = None  # type: Optional[float]
+
+    for index, command_trace in enumerate(trace):
+        command = command_trace.command
+        states = command_trace.states
+        if not states:
+            logger.warning("no states recorded for command %d: %s",
+                           index, command)
+            continue
+        state_after = states[-1]
+        if time_before is None:
+            time_before = states[0].time_offset
+        duration = state_after.time_offset - time_before
+
+        try:
+            spec = command.resolve(state_before, env, config)
+        except Exception:
+            checks.append(CommandCheck(index, command.uid, UNRESOLVED,
+                                       False, duration))
+            state_before = state_after
+            time_before = state_after.time_offset
+            continue
+
+        postcondition = spec.postcondition
+        if intermediate:
+            timeout = spec.timeout(command, state_before, env, config)
+            time_limit = time_before + timeout
+            candidates = [s for s in states if s.time_offset <= time_limit]
+        else:
+            candidates = [state_after]
+        try:
+            table = StateTable.from_states(candidates, state_after.__class__)
+            mask = postcondition.satisfied_mask(command, state_before, table)
+            passed = bool(mask.any())
+        except exceptions.UnsupportedExpression:
+            passed = any(postcondition.is_satisfied(command,
+                                                    state_before,
+                                                    s,
+                                                    env,
+                                                    config)
+                         for s in candidates)
+        checks.append(CommandCheck(index, command.uid, spec.name,
+                                   passed, duration))
+        state_before = state_after
+        time_before = state_after.time_offset
+
+    return checks
+
+
+def summarise(checks: Iterable[CommandCheck]
+              ) -> Dict[Tuple[str, str], SpecReport]:
+    """
+    Computes the number of checks and violations for each specification,
+    indexed by the UID of its command and its name.
+    """
+    checked = {}  # type: Dict[Tuple[str, str], int]
+    violations = {}  # type: Dict[Tuple[str, str], int]
+    for check in checks:
+        key = (check.command, check.spec)
+        checked[key] = checked.get(key, 0) + 1
+        if not check.passed:
+            violations[key] = violations.get(key, 0) + 1
+    return {key: SpecReport(key[0], key[1], n, violations.get(key, 0))
+            for (key, n) in checked.items()}
@@ -0,0 +1,75 @@
+"""
+Provides builders for the states, missions, generators and outcomes that are
+shared by the tests.
+"""
+from houston.ardu.configuration import Configuration as ArduConfig
+from houston.ardu.copter.state import State as CopterState
+from houston.ardu.copter.copter import ArduCopter
+from houston.ardu.copter.takeoff import Takeoff
+from houston.command import CommandOutcome
+from houston.environment import Environment
+from houston.generator.rand import RandomMissionGenerator
+from houston.mission import Mission, MissionOutcome
+
+
+def build_state(**kwargs):
+    values = {'home_latitude': -35.3632607,
+              'home_longitude': 149.1652351,
+              'latitude': -35.3632607,
+              'longitude': 149.1652351,
+              'altitude': 0.0,
+              'armed': True,
+              'armable': True,
+              'mode': "GUIDED",
+              'ekf_ok': True,
+              'yaw': 0.0,
+              'roll': 0.0,
+              'pitch': 0.0,
+              'roll_channel': 0.0,
+              'throttle_channel': 0.0,
+              'heading': 0.0,
+              'groundspeed': 0.0,
+              'airspeed': 0.0,
+              'vx': 0.0,
+              'vy': 0.0,
+              'vz': 0.0,
+              'time_offset': 0.0}
+    values.update(kwargs)
+    return CopterState(**values)
+
+
+def build_config(**kwargs):
+    values = {'speedup': 1,
+              'time_per_metre_travelled': 1.0,
+              'constant_timeout_offset': 1.0,
+              'min_parachute_alt': 10.0}
+    values.update(kwargs)
+    return ArduConfig(**values)
+
+
+def build_mission(commands=None, initial_state=None, config=None):
+    if commands is None:
+        commands = [Takeoff(altitude=10.0)]
+    if initial_state is None:
+        initial_state = build_state()
+    if config is None:
+        config = build_config()
+    return Mission(config, Environment({}), initial_state, commands,
+                   ArduCopter)
+
+
+def build_generator(max_num_commands=3):
+    mission = build_mission()
+    return RandomMissionGenerator(ArduCopter,
+                                  mission.initial_state,
+                                  mission.environment,
+                                  mission.configuration,
+                                  max_num_commands=max_num_commands)
+
+
+def build_outcome(mission, state=None):
+    if state is None:
+        state = build_state()
+    outcomes = [CommandOutcome(cmd, True, state, state, 1.0)
+                for cmd in mission.commands]
+    return MissionOutcome(True, outcomes, 1.0)
@@ -84,3 +84,67 @@ def test_to_and_from_dict():
 
     y = Command.from_dict(d_actual)
     assert y.to_dict() == d_actual
+
+
+def test_resolve():
+    from houston.ardu.copter.setmode import SetMode
+    from houston.command import cached_resolution
+    from .helpers import build_state
+
+    state_ground = build_state(altitude=0.0)
+    state_air = build_state(altitude=10.0)
+    expected = {('GUIDED', 0.0): 'guided',
+                ('LOITER', 0.0): 'loiter',
+                ('RTL', 0.0): 'rtl',
+                ('LAND', 0.0): 'idle',
+                ('LAND', 10.0): 'land'}
+    for (mode, alt), name in expected.items():
+        cmd = SetMode(mode=mode)
+        state = state_air if alt > 0 else state_ground
+        assert cmd.resolve(state, None, None).name == name
+
+        # agrees with Z3
+        spec = next(s for s in SetMode.specifications
+                    if s.precondition.is_satisfied(cmd, state, None,
+                                                   None, None))
+        assert spec.name == name
+
+    # resolution is cached for each command and state within a context
+    cmd = SetMode(mode='LAND')
+    with cached_resolution():
+        spec = cmd.resolve(state_air, None, None)
+        assert SetMode(mode='LAND').resolve(state_air, None, None) is spec
+        assert cmd.resolve(state_ground, None, None).name == 'idle'
+
+
+def test_generate_batch():
+    import geopy.distance
+    import numpy
+    from houston.ardu.copter import ArduCopter, GoTo
+    from houston.geo import destinations
+
+    rng = numpy.random.default_rng(0)
+    batch = GoTo.generate_batch(50, rng)
+    assert len(batch) == 50
+    assert isinstance(batch[3], GoTo)
+    assert isinstance(batch[3].latitude, float)
+    origin = (-35.3632607, 149.1652351)
+    for cmd in batch:
+        dist = geopy.distance.great_circle(origin,
+                                           (cmd.latitude, cmd.longitude))
+        assert dist.meters <= 2.0 + 1e-6
+
+    waypoint = ArduCopter.commands['MAV_CMD_NAV_WAYPOINT']
+    batch = waypoint.generate_batch(10, rng)
+    assert len(list(batch)) == 10
+    assert batch.parameters['lat'].shape == (10,)
+
+    # agrees with geopy over larger distances
+    lat, lon = destinations(origin[0], origin[1],
+                            numpy.array([1000.0, 50000.0]),
+                            numpy.array([45.0, 270.0]))
+    for (d, h, la, lo) in zip([1000.0, 50000.0], [45.0, 270.0], lat, lon):
+        expected = geopy.distance.great_circle(meters=d).destination(origin,
+                                                                     h)
+        assert abs(expected.latitude - la) < 1e-6
+        assert abs(expected.longitude - lo) < 1e-6
@@ -0,0 +1,47 @@
+from houston.connection import Connection
+from houston.ardu.connection import MAVLinkMessage
+
+
+class DummyConnection(Connection):
+    def message_type(self, message):
+        return message.name
+
+
+def test_dispatch_by_type():
+    received = []
+    conn = DummyConnection({'all': lambda m: received.append(('all', m.name))})
+    conn.add_hook('mission',
+                  lambda m: received.append(('mission', m.name)),
+                  ['MISSION_CURRENT', 'MISSION_ACK'])
+
+    conn.receive(MAVLinkMessage('HEARTBEAT', None))
+    conn.receive(MAVLinkMessage('MISSION_ACK', None))
+    assert received == [('all', 'HEARTBEAT'),
+                        ('all', 'MISSION_ACK'),
+                        ('mission', 'MISSION_ACK')]
+
+
+def test_remove_hook():
+    received = []
+    conn = DummyConnection({})
+    conn.add_hook('mission', received.append, ['MISSION_ACK'])
+    conn.receive(MAVLinkMessage('MISSION_ACK', None))
+    conn.remove_hook('mission')
+    conn.remove_hook('mission')
+    conn.receive(MAVLinkMessage('MISSION_ACK', None))
+    assert len(received) == 1
+
+
+def test_remove_hook_during_dispatch():
+    received = []
+    conn = DummyConnection({})
+
+    def once(m):
+        received.append(m)
+        conn.remove_hook('once')
+
+    conn.add_hook('once', once)
+    conn.add_hook('other', received.append)
+    conn.receive(MAVLinkMessage('HEARTBEAT', None))
+    conn.receive(MAVLinkMessage('HEARTBEAT', None))
+    assert len(received) == 3
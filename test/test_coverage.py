@@ -0,0 +1,144 @@
+import pytest
+import numpy as np
+
+from bugzoo.core.fileline import FileLine, FileLineSet
+
+from houston.coverage import LineIndex, CoverageBitset, CoverageMatrix, \
+    MissionCoverageIndex, lines_modified_by_diff, popcount
+
+
+def test_index():
+    index = LineIndex()
+    a = FileLine('foo.cpp', 1)
+    b = FileLine('bar.cpp', 7)
+    assert index.add(a) == 0
+    assert index.add(b) == 1
+    assert index.add(a) == 0
+    assert len(index) == 2
+    assert index.line(1) == b
+    assert LineIndex.from_dict(index.to_dict())[b] == 1
+
+
+def test_round_trip():
+    index = LineIndex()
+    lines = FileLineSet.from_dict({'foo.cpp': [1, 2, 3], 'bar.cpp': [10]})
+    bitset = CoverageBitset.from_file_lines(index, lines)
+    assert len(bitset) == 4
+    assert set(bitset.to_file_lines()) == set(lines)
+    assert FileLine('foo.cpp', 2) in bitset
+    assert FileLine('foo.cpp', 4) not in bitset
+
+    d = bitset.to_dict()
+    assert CoverageBitset.from_dict(index, d) == bitset
+
+
+def test_set_operations():
+    index = LineIndex()
+    x = CoverageBitset.from_file_lines(
+        index, FileLineSet.from_dict({'foo.cpp': [1, 2, 3]}))
+    y = CoverageBitset.from_file_lines(
+        index, FileLineSet.from_dict({'foo.cpp': [3, 4], 'bar.cpp': [1]}))
+
+    assert set(x | y) == set(FileLineSet.from_dict({'foo.cpp': [1, 2, 3, 4],
+                                                    'bar.cpp': [1]}))
+    assert set(x & y) == {FileLine('foo.cpp', 3)}
+    assert set(x - y) == {FileLine('foo.cpp', 1), FileLine('foo.cpp', 2)}
+    assert len(x | y) == 5
+
+
+def test_matrix():
+    index = LineIndex()
+    rows = [FileLineSet.from_dict({'foo.cpp': [1, 2]}),
+            FileLineSet.from_dict({'foo.cpp': [2, 3]}),
+            FileLineSet.from_dict({'foo.cpp': [3], 'bar.cpp': [9]})]
+    bitsets = [CoverageBitset.from_file_lines(index, r) for r in rows]
+    matrix = CoverageMatrix.from_bitsets(index, bitsets)
+
+    assert len(matrix) == 3
+    assert matrix.unpacked().shape == (3, 4)
+    assert matrix.hits().tolist() == [1, 2, 2, 1]
+    assert matrix.hits(np.array([True, False, True])).tolist() == [1, 1, 1, 1]
+    assert matrix.counts().tolist() == [2, 2, 2]
+    assert popcount(matrix.packed() & matrix[0].bits).tolist() == [2, 1, 0]
+    assert int(popcount(np.array([0xff, 0x81], dtype=np.uint8))) == 10
+    assert len(matrix.union()) == 4
+    assert len(matrix.intersection()) == 0
+
+
+def test_mission_index(tmpdir):
+    index = MissionCoverageIndex()
+    index.add('m0', FileLineSet.from_dict({'foo.cpp': [1, 2]}))
+    index.add('m1', FileLineSet.from_dict({'foo.cpp': [2, 3]}))
+    index.add('m2', FileLineSet.from_dict({'bar.cpp': [10]}))
+
+    assert index.missions_covering([FileLine('foo.cpp', 2)]) == {'m0', 'm1'}
+    assert index.missions_covering([FileLine('bar.cpp', 10),
+                                    FileLine('foo.cpp', 1)]) == {'m0', 'm2'}
+    assert index.missions_covering([FileLine('baz.cpp', 1)]) == set()
+
+    fn = str(tmpdir.join('index.json'))
+    index.to_file(fn)
+    loaded = MissionCoverageIndex.from_file(fn)
+    assert set(loaded) == {'m0', 'm1', 'm2'}
+    assert loaded.missions_covering([FileLine('foo.cpp', 3)]) == {'m1'}
+
+
+def test_lines_modified_by_diff():
+    diff = """--- ArduCopter/mode.cpp
++++ ArduCopter/mode.cpp
+@@ -10,3 +10,3 @@
+ int x = 0;
+-if (a < b) {
++if (a > b) {
+ return;
+"""
+    modified = lines_modified_by_diff(diff)
+    assert set(modified) == {FileLine('ArduCopter/mode.cpp', 11)}
+
+
+def test_lines_modified_by_diff_removed_comment():
+    # the removed line "-- x" is not a file header
+    diff = """--- a/Tools/script.lua
++++ b/Tools/script.lua
+@@ -4,3 +4,2 @@
+ local x = 1
+--- x
+ return x
+--- a/ArduCopter/mode.cpp
++++ b/ArduCopter/mode.cpp
+@@ -20 +20 @@
+-return false;
++return true;
+"""
+    modified = lines_modified_by_diff(diff)
+    assert set(modified) == {FileLine('Tools/script.lua', 5),
+                             FileLine('ArduCopter/mode.cpp', 20)}
+
+
+def test_lines_modified_by_diff_dev_null():
+    # created files have no original lines; deleted files lose all of them
+    diff = """--- /dev/null
++++ b/ArduCopter/new.cpp
+@@ -0,0 +1,2 @@
++int x = 0;
++int y = 0;
+--- a/ArduCopter/old.cpp
++++ /dev/null
+@@ -1,2 +0,0 @@
+-int x = 0;
+-int y = 0;
+"""
+    modified = lines_modified_by_diff(diff)
+    assert set(modified) == {FileLine('ArduCopter/old.cpp', 1),
+                             FileLine('ArduCopter/old.cpp', 2)}
+
+
+def test_lines_modified_by_diff_insertion():
+    diff = """--- ArduCopter/mode.cpp
++++ ArduCopter/mode.cpp
+@@ -10,0 +11 @@
++x += 1;
+"""
+    modified = lines_modified_by_diff(diff)
+    assert set(modified) == {FileLine('ArduCopter/mode.cpp', 10),
+                             FileLine('ArduCopter/mode.cpp', 11)}
@@ -0,0 +1,71 @@
+import attr
+
+from houston.ardu.copter import ArduCopter, GoTo, Takeoff
+from houston.fingerprint import MissionFingerprinter, NearDuplicateIndex, \
+    deduplicate
+
+from .helpers import build_mission
+
+
+def with_goto(mission, latitude, altitude=10.0):
+    commands = [Takeoff(altitude=altitude),
+                GoTo(latitude=latitude, longitude=149.16, altitude=10.0)]
+    return attr.evolve(mission, commands=commands)
+
+
+def test_quantum():
+    fingerprinter = MissionFingerprinter(ArduCopter)
+    params = {p.name: p for p in GoTo.parameters}
+    assert fingerprinter.quantum(params['latitude']) == 0.0005
+    assert fingerprinter.quantum(params['altitude']) == 0.5
+    waypoint = ArduCopter.commands['MAV_CMD_NAV_WAYPOINT']
+    quanta = {p.name: fingerprinter.quantum(p) for p in waypoint.parameters}
+    assert quanta['lat'] == 0.0005
+
+
+def test_near_duplicates():
+    mission = build_mission()
+    index = NearDuplicateIndex(MissionFingerprinter(ArduCopter))
+    assert index.add(with_goto(mission, -35.36))
+
+    # waypoints within the noise of the latitude are near duplicates, even
+    # if they fall on either side of a grid boundary
+    assert not index.add(with_goto(mission, -35.36 + 0.0001))
+    assert not index.add(with_goto(mission, -35.36 - 0.00005))
+    assert index.add(with_goto(mission, -35.36 + 0.01))
+    assert index.add(with_goto(mission, -35.36, altitude=20.0))
+    assert index.add(mission)
+    assert len(index) == 4
+    assert index.find(with_goto(mission, -35.36 + 0.00001)) is not None
+
+
+
+def test_near_duplicates_seeded():
+    # boundary straddling is handled across many offsets: with a fixed seed,
+    # the same missions are kept on every run
+    mission = build_mission()
+    missions = [with_goto(mission, -35.36 + i * 0.00011) for i in range(40)]
+    index = NearDuplicateIndex(MissionFingerprinter(ArduCopter), seed=0)
+    unique = list(index.filter(missions))
+    expected = [0, 5, 9, 14, 18, 23, 27, 32, 37]
+    assert [missions.index(m) for m in unique] == expected
+
+
+def test_noise_tolerance():
+    fingerprinter = MissionFingerprinter(ArduCopter)
+    mission = build_mission()
+    original = with_goto(mission, -35.36)
+    within = with_goto(mission, -35.36 + 0.0004)
+    outside = with_goto(mission, -35.36 + 0.0006)
+
+    # missions that differ only by their continuous parameters share a
+    # signature
+    fp_original = fingerprinter.fingerprint(original)
+    assert fingerprinter.fingerprint(within).signature == fp_original.signature
+    assert fingerprinter.fingerprint(outside).signature == fp_original.signature
+
+    # missions within the noise of the latitude collapse to one, but those
+    # outside of it do not
+    assert deduplicate([original, within], ArduCopter) == [original]
+    assert deduplicate([within, original], ArduCopter) == [within]
+    assert deduplicate([original, outside], ArduCopter) == [original, outside]
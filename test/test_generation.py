@@ -8,6 +8,8 @@ from houston.environment import Environment
 from houston.generator.rand import RandomMissionGenerator
 from houston.generator.resources import ResourceLimits
 
+from .helpers import build_generator
+
 def test_random():
     config = ArduConfig(
         speedup=1,
@@ -47,3 +49,24 @@ def test_random():
 
     assert len(missions) == number_of_missions
     assert all(len(m.commands) <= max_num_commands for m in missions)
+
+
+def test_batched_commands():
+    generator = build_generator()
+    generator.prepare(0, ResourceLimits(num_missions=1))
+    waypoint = ArduCopter.commands['MAV_CMD_NAV_WAYPOINT']
+    takeoff = ArduCopter.commands['MAV_CMD_NAV_TAKEOFF']
+
+    # commands are drawn from a pool that is refilled one batch at a time
+    generator.command_batch_size = 4
+    drawn = [generator.draw_command(waypoint) for _ in range(6)]
+    assert all(isinstance(c, waypoint) for c in drawn)
+    assert len(set(drawn)) == 6
+
+    # generated commands depend on nothing but the state of the RNG
+    state = generator.rng.getstate()
+    commands = generator.generate_commands([takeoff, waypoint, waypoint])
+    assert [c.__class__ for c in commands] == [takeoff, waypoint, waypoint]
+    generator.rng.setstate(state)
+    assert generator.generate_commands([takeoff, waypoint, waypoint]) == \
+        commands
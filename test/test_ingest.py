@@ -0,0 +1,48 @@
+import threading
+
+from houston.ingest import MessageBuffer, Ingestor
+
+
+def test_coalesce():
+    buff = MessageBuffer(capacity=4)
+    buff.push(('HEARTBEAT', 1), key='HEARTBEAT')
+    buff.push(('ATTITUDE', 1), key='ATTITUDE')
+    buff.push(('HEARTBEAT', 2), key='HEARTBEAT')
+    assert len(buff) == 2
+    assert buff.coalesced == 1
+    assert buff.pop()[0] == ('HEARTBEAT', 2)
+    assert buff.pop()[0] == ('ATTITUDE', 1)
+    assert buff.pop(timeout=0.01) is None
+
+
+def test_drop_oldest():
+    buff = MessageBuffer(capacity=2)
+    for i in range(4):
+        buff.push(i)
+    assert buff.dropped == 2
+    assert buff.pop()[0] == 2
+    assert buff.pop()[0] == 3
+    buff.close()
+    assert buff.pop() is None
+
+
+def test_ingestor():
+    gate = threading.Event()
+    processed = []
+
+    def process(message):
+        gate.wait()
+        processed.append(message)
+
+    ingestor = Ingestor(process, key=lambda m: m[0])
+    ingestor.push(('A', 0))
+    assert not ingestor.wait_until_idle(timeout=0.05)
+    for i in range(1, 5):
+        ingestor.push(('B', i))
+    gate.set()
+    assert ingestor.wait_until_idle(timeout=5)
+    stats = ingestor.stats()
+    assert stats.received == 5
+    assert stats.processed + stats.coalesced == 5
+    assert processed[-1] == ('B', 4)
+    ingestor.stop(timeout=5)
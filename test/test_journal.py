@@ -0,0 +1,70 @@
+import pytest
+
+from houston.ardu.copter import ArduCopter
+from houston.generator.journal import CampaignJournal
+from houston.generator.resources import ResourceLimits
+from houston.mission import Mission
+
+from .helpers import build_generator, build_mission, build_outcome, \
+    build_state
+
+
+def test_roundtrip(tmpdir):
+    fn = str(tmpdir.join('journal.jsonl'))
+    mission = build_mission()
+    outcome = build_outcome(mission)
+    generator = build_generator()
+    generator.prepare(0, ResourceLimits(num_missions=1))
+
+    journal = CampaignJournal(fn, ArduCopter)
+    assert journal.read() is None
+    journal.start(0, ResourceLimits(num_missions=1))
+    journal.record_mission(0, mission, generator.rng, 2.0)
+    journal.record_outcome(0, outcome)
+    journal.close()
+
+    # a partially written entry is ignored
+    with open(fn, 'a') as f:
+        f.write('{"kind": "mis')
+
+    state = journal.read()
+    assert state.seed == 0
+    assert state.missions == (mission,)
+    assert state.outcomes[0].passed
+    assert state.outcomes[0].outcomes[0].end_state == build_state()
+    assert state.rng_state == generator.rng.getstate()
+    assert state.running_time == 2.0
+    assert state.pending == []
+
+
+def test_resume(tmpdir, monkeypatch):
+    limits = ResourceLimits(num_missions=6)
+    expected = build_generator().generate(7, limits)
+    fn = str(tmpdir.join('journal.jsonl'))
+
+    # the campaign is interrupted while running its fourth mission
+    executed = []
+
+    def run(mission, bz, snapshot):
+        if len(executed) == 3:
+            raise SystemExit
+        executed.append(mission)
+        return build_outcome(mission)
+
+    monkeypatch.setattr(Mission, 'run', run)
+    report = build_generator().generate_and_run(
+        7, limits, None, 'snapshot', journal=CampaignJournal(fn, ArduCopter))
+    assert report.history == expected[:3]
+
+    # the campaign resumes from the fourth mission
+    executed.clear()
+    generator = build_generator()
+    with pytest.raises(ValueError):
+        generator.generate_and_run(
+            8, limits, None, 'snapshot',
+            journal=CampaignJournal(fn, ArduCopter))
+    report = generator.generate_and_run(
+        7, limits, None, 'snapshot', journal=CampaignJournal(fn, ArduCopter))
+    assert executed == expected[3:]
+    assert report.history == expected
+    assert generator.resource_usage.num_missions == 6
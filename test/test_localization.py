@@ -0,0 +1,59 @@
+import pytest
+import numpy as np
+
+from bugzoo.core.fileline import FileLine, FileLineSet
+
+from houston.localization import Spectrum, tarantula, ochiai, dstar
+
+
+def build_suite():
+    coverage = {
+        't0': FileLineSet.from_dict({'foo.cpp': [1, 2, 3]}),
+        't1': FileLineSet.from_dict({'foo.cpp': [1, 3]}),
+        't2': FileLineSet.from_dict({'foo.cpp': [1, 2]})
+    }
+    passed = {'t0': False, 't1': True, 't2': True}
+    return coverage, passed
+
+
+def test_counts():
+    coverage, passed = build_suite()
+    spectrum = Spectrum.from_coverage(coverage, passed)
+    ep, ef = spectrum.counts()
+    index = spectrum.index
+    assert ep[index[FileLine('foo.cpp', 1)]] == 2
+    assert ef[index[FileLine('foo.cpp', 1)]] == 1
+    assert ep[index[FileLine('foo.cpp', 2)]] == 1
+    assert spectrum.num_passed == 2
+    assert spectrum.num_failed == 1
+
+
+def test_incremental_matches_batch():
+    coverage, passed = build_suite()
+    batch = Spectrum.from_coverage(coverage, passed)
+    incremental = Spectrum()
+    for t in ['t0', 't1', 't2']:
+        incremental.record(coverage[t], passed[t])
+
+    for line, score in batch.suspiciousness(ochiai).items():
+        assert incremental.suspiciousness(ochiai)[line] == \
+            pytest.approx(score)
+
+
+def test_formulae():
+    ep = np.array([2, 1, 0])
+    ef = np.array([1, 1, 0])
+    assert tarantula(ep, ef, 2, 1).tolist() == \
+        pytest.approx([0.5, 2.0 / 3.0, 0.0])
+    assert ochiai(ep, ef, 2, 1).tolist() == \
+        pytest.approx([1 / np.sqrt(3), 1 / np.sqrt(2), 0.0])
+    assert dstar(ep, ef, 2, 1).tolist()[:2] == pytest.approx([0.5, 1.0])
+
+
+def test_most_suspicious():
+    coverage, passed = build_suite()
+    spectrum = Spectrum.from_coverage(coverage, passed)
+    scores = spectrum.localize()
+    assert set(scores) == {'tarantula', 'ochiai', 'dstar'}
+    top, _ = spectrum.most_suspicious(tarantula, limit=1)[0]
+    assert top in {FileLine('foo.cpp', 2), FileLine('foo.cpp', 3)}
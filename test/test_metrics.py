@@ -0,0 +1,67 @@
+import urllib.request
+
+import attr
+
+from houston.metrics import CampaignMetrics, Counter, Histogram, \
+    serve_metrics
+from houston.timing import Timeline
+
+
+@attr.s
+class IngestionStats(object):
+    received = attr.ib(type=int, default=0)
+
+
+@attr.s
+class FakeSandbox(object):
+    ingestion_stats = attr.ib(type=IngestionStats)
+
+
+def test_render():
+    counter = Counter('houston_things_total', 'Number of things.')
+    counter.inc()
+    counter.inc(2, kind='a"b')
+    assert counter.value() == 1.0
+    lines = counter.render().split('\n')
+    assert lines[0] == '# HELP houston_things_total Number of things.'
+    assert lines[1] == '# TYPE houston_things_total counter'
+    assert 'houston_things_total 1.0' in lines
+    assert 'houston_things_total{kind="a\\"b"} 2.0' in lines
+
+    histogram = Histogram('houston_latency_seconds', 'Latency.', (1.0, 5.0))
+    histogram.observe(0.5, phase='connect')
+    histogram.observe(3.0, phase='connect')
+    histogram.observe(10.0, phase='connect')
+    lines = histogram.render().split('\n')
+    assert 'houston_latency_seconds_bucket{phase="connect",le="1.0"} 1.0' in lines  # noqa: pycodestyle
+    assert 'houston_latency_seconds_bucket{phase="connect",le="5.0"} 2.0' in lines  # noqa: pycodestyle
+    assert 'houston_latency_seconds_bucket{phase="connect",le="+Inf"} 3.0' in lines  # noqa: pycodestyle
+    assert 'houston_latency_seconds_sum{phase="connect"} 13.5' in lines
+    assert 'houston_latency_seconds_count{phase="connect"} 3.0' in lines
+
+
+def test_campaign():
+    metrics = CampaignMetrics()
+    timeline = Timeline()
+    metrics.watch_timeline(timeline)
+    timeline.record('connect', 0.0, 2.0)
+    assert metrics.phase_duration.count(phase='connect') == 1
+
+    stats = IngestionStats()
+    metrics.add_sandbox('abc', FakeSandbox(stats))
+    assert metrics.active_sandboxes.value() == 1.0
+    stats.received = 100
+    assert metrics.message_rate.value(sandbox='abc') > 0.0
+    metrics.remove_sandbox('abc')
+    assert metrics.active_sandboxes.value() == 0.0
+
+    metrics.missions_started.inc()
+    server = serve_metrics(metrics, host='127.0.0.1', port=0)
+    try:
+        url = 'http://127.0.0.1:{}/metrics'.format(server.port)
+        with urllib.request.urlopen(url) as response:
+            text = response.read().decode('utf-8')
+    finally:
+        server.stop()
+    assert 'houston_missions_started_total 1.0' in text
+    assert 'houston_active_sandboxes 0.0' in text
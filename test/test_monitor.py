@@ -0,0 +1,87 @@
+import attr
+
+from houston.ardu.connection import MAVLinkMessage
+from houston.ardu.copter import ArduCopter
+from houston.ardu.copter.goto import GoTo
+from houston.ardu.copter.setmode import SetMode
+from houston.ardu.monitor import MissionMonitor, STALL, CRASH, \
+    PARACHUTE, UNCOMMANDED_MODE
+from houston.trace import MissionTrace
+
+from .helpers import build_state
+
+
+@attr.s(frozen=True)
+class StatusText(object):
+    text = attr.ib(type=bytes)
+
+
+def test_stall():
+    aborts = []
+    monitor = MissionMonitor(speedup=2, stall_time=20.0,
+                             on_abort=aborts.append)
+    monitor.expect(GoTo(latitude=-35.36, longitude=149.16, altitude=10.0))
+
+    # the vehicle is moving
+    for t in range(10):
+        monitor.observe_state(build_state(altitude=float(t), vz=1.0,
+                                          time_offset=float(t)))
+    assert monitor.abort is None
+
+    # the vehicle has stopped for less than 10 seconds (i.e., 20 / 2)
+    for t in range(10, 20):
+        monitor.observe_state(build_state(altitude=10.0,
+                                          time_offset=float(t)))
+    assert monitor.abort is None
+
+    monitor.observe_state(build_state(altitude=10.0, time_offset=20.0))
+    assert monitor.abort.reason == STALL
+    assert aborts == [monitor.abort]
+
+    # problems are only reported once
+    monitor.observe_state(build_state(altitude=10.0, time_offset=30.0))
+    assert len(aborts) == 1
+
+
+def test_mode_and_status():
+    monitor = MissionMonitor()
+    monitor.expect(SetMode(mode='RTL'))
+    monitor.observe_state(build_state(mode='RTL', altitude=10.0, vz=-1.0))
+    assert monitor.abort is None
+
+    monitor.expect(GoTo(latitude=-35.36, longitude=149.16, altitude=10.0))
+    monitor.observe_state(build_state(mode='LAND', altitude=10.0, vz=-1.0,
+                                      time_offset=1.0))
+    assert monitor.abort.reason == UNCOMMANDED_MODE
+
+    monitor = MissionMonitor()
+    monitor.observe_message(MAVLinkMessage('STATUSTEXT',
+                                           StatusText(b'Crash: Disarming')))
+    assert monitor.abort.reason == CRASH
+
+    trace = MissionTrace((), abort=CRASH)
+    assert MissionTrace.from_dict(trace.to_dict(), None).abort == CRASH
+
+
+def test_factory_commands():
+    # a commanded parachute release does not abort the mission
+    parachute = ArduCopter.commands['MAV_CMD_DO_PARACHUTE'](action=2)
+    release = MAVLinkMessage('STATUSTEXT', StatusText(b'Parachute: Released'))
+    monitor = MissionMonitor()
+    monitor.expect(parachute)
+    monitor.observe_message(release)
+    assert monitor.abort is None
+
+    waypoint = ArduCopter.commands['MAV_CMD_NAV_WAYPOINT']
+    monitor.expect(waypoint(delay=0.0, lat=-35.36, lon=149.16, alt=10.0))
+    monitor.observe_message(release)
+    assert monitor.abort.reason == PARACHUTE
+
+    # the vehicle is expected to hold its position while loitering
+    loiter = ArduCopter.commands['MAV_CMD_NAV_LOITER_TIME']
+    monitor = MissionMonitor(stall_time=10.0)
+    monitor.expect(loiter(time=30.0, lat=-35.36, lon=149.16, alt=10.0))
+    for t in range(30):
+        monitor.observe_state(build_state(altitude=10.0,
+                                          time_offset=float(t)))
+    assert monitor.abort is None
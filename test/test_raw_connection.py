@@ -0,0 +1,106 @@
+import time
+
+from pymavlink import mavutil
+from pymavlink.mavutil import mavlink
+
+from houston.ardu.raw_connection import RawMAVLinkConnection, \
+    VehicleCache, STREAM_RATE
+
+
+def test_heartbeat():
+    cache = VehicleCache()
+    assert cache.last_heartbeat == float('inf')
+    armed = mavlink.MAV_MODE_FLAG_SAFETY_ARMED
+    cache.update(mavlink.MAVLink_heartbeat_message(
+        mavlink.MAV_TYPE_QUADROTOR, mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA,
+        armed, 4, mavlink.MAV_STATE_ACTIVE, 3))
+    assert cache.armed
+    assert cache.mode.name == 'GUIDED'
+    assert cache.last_heartbeat < 1.0
+
+    # heartbeats from ground stations are ignored
+    cache.update(mavlink.MAVLink_heartbeat_message(
+        mavlink.MAV_TYPE_GCS, mavlink.MAV_AUTOPILOT_INVALID, 0, 0, 0, 3))
+    assert cache.armed
+    assert cache.mode.name == 'GUIDED'
+
+
+def test_position():
+    cache = VehicleCache()
+    cache.update(mavlink.MAVLink_global_position_int_message(
+        0, -353632607, 1491652351, 584000, 10500, 120, -35, 0, 9000))
+    loc = cache.location.global_relative_frame
+    assert abs(loc.lat - -35.3632607) < 1e-7
+    assert abs(loc.lon - 149.1652351) < 1e-7
+    assert loc.alt == 10.5
+    assert cache.velocity == [1.2, -0.35, 0.0]
+
+
+def test_armable():
+    cache = VehicleCache()
+    assert not cache.is_armable
+    assert not cache.ekf_ok
+    cache.update(mavlink.MAVLink_gps_raw_int_message(
+        0, 3, 0, 0, 0, 0, 0, 0, 0, 10))
+    cache.update(mavlink.MAVLink_ekf_status_report_message(
+        mavlink.EKF_PRED_POS_HORIZ_ABS, 0, 0, 0, 0, 0))
+    assert cache.is_armable
+    assert cache.ekf_ok
+
+
+def test_channels():
+    # channels are present (but unknown) before RC_CHANNELS is received
+    cache = VehicleCache()
+    assert cache.channels['1'] is None
+    assert cache.channels['8'] is None
+    cache.update(mavlink.MAVLink_rc_channels_message(
+        0, 8, *range(1000, 1018), 0))
+    assert cache.channels['3'] == 1002
+
+
+class FakeMAV(object):
+    def __init__(self) -> None:
+        self.sent = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.sent.append((name, args))
+
+
+class FakeMaster(object):
+    target_system = 1
+    target_component = 1
+
+    def __init__(self) -> None:
+        self.mav = FakeMAV()
+        self.__home = mavlink.MAVLink_home_position_message(
+            -353632607, 1491652351, 584000, 0, 0, 0, [1, 0, 0, 0], 0, 0, 0)
+        self.__home._header.srcSystem = 1
+
+    def wait_heartbeat(self, timeout):
+        return mavlink.MAVLink_heartbeat_message(
+            mavlink.MAV_TYPE_QUADROTOR, mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA,
+            0, 4, mavlink.MAV_STATE_STANDBY, 3)
+
+    def recv_match(self, blocking, timeout):
+        if any(name == 'command_long_send' for (name, _) in self.mav.sent):
+            return self.__home
+        time.sleep(0.01)
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+def test_requests_data_streams(monkeypatch):
+    master = FakeMaster()
+    monkeypatch.setattr(mavutil, 'mavlink_connection',
+                        lambda *args, **kwargs: master)
+    connection = RawMAVLinkConnection('udp:127.0.0.1:14550', timeout=5)
+    try:
+        assert connection.conn.home_location is not None
+        requests = [args for (name, args) in master.mav.sent
+                    if name == 'request_data_stream_send']
+        assert requests == [(1, 1, mavlink.MAV_DATA_STREAM_ALL,
+                             STREAM_RATE, 1)]
+    finally:
+        connection.close()
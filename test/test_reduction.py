@@ -0,0 +1,65 @@
+import attr
+
+from bugzoo.core.fileline import FileLineSet
+
+from houston.ardu.copter import Takeoff
+from houston.generator.reduction import reduce_suite, spec_branches
+from houston.generator.resources import ResourceLimits
+
+from .helpers import build_generator, build_mission, build_outcome, \
+    build_state
+
+
+def build(altitude, **state):
+    start = build_state(**state)
+    mission = build_mission([Takeoff(altitude=altitude)], initial_state=start)
+    return mission, build_outcome(mission, start)
+
+
+def test_spec_branches():
+    mission, outcome = build(10.0)
+    assert spec_branches(mission, outcome) == \
+        {('ardu:copter:takeoff', 'normal')}
+    mission, outcome = build(10.0, armed=False)
+    assert spec_branches(mission, outcome) == \
+        {('ardu:copter:takeoff', 'idle')}
+
+
+def test_reduce_suite():
+    m1, o1 = build(10.0)
+    m2, o2 = build(20.0)
+    m3, o3 = build(30.0, armed=False)
+    outcomes = {m1: o1, m2: o2, m3: o3}
+    coverage = {m1: FileLineSet.from_dict({'foo.cpp': [1, 2]}),
+                m2: FileLineSet.from_dict({'foo.cpp': [1, 2, 3]}),
+                m3: FileLineSet.from_dict({'foo.cpp': [1]})}
+
+    # m1 is subsumed by m2; m3 is the only mission that reaches Idle
+    missions = [m1, m2, m3, m1]
+    assert reduce_suite(missions, outcomes, coverage) == [m2, m3]
+    assert reduce_suite(missions, outcomes, coverage, max_size=1) == [m2]
+    assert reduce_suite([], outcomes, coverage) == []
+
+    # without coverage, missions are judged on spec branches alone
+    assert reduce_suite(missions, outcomes, {}) == [m1, m3]
+
+
+def test_generator_reduce():
+    m1, o1 = build(10.0)
+    m2, o2 = build(20.0)
+    m3, o3 = build(30.0, armed=False)
+    o3 = attr.evolve(o3, passed=False)
+    generator = build_generator()
+    generator.prepare(0, ResourceLimits(num_missions=3))
+    generator.record_outcome(m1, o1, FileLineSet.from_dict({'a.cpp': [1]}))
+    generator.record_outcome(m2, o2, FileLineSet.from_dict({'a.cpp': [2]}))
+    generator.record_outcome(m3, o3, FileLineSet.from_dict({'a.cpp': [3]}))
+
+    # failing missions are excluded from the suite
+    assert list(generator.reduce()) == [m1, m2]
+
+    generator.prepare(0, ResourceLimits(num_missions=3,
+                                        num_missions_selected=1))
+    generator.record_outcome(m1, o1, FileLineSet.from_dict({'a.cpp': [1]}))
+    generator.record_outcome(m2, o2, FileLineSet.from_dict({'a.cpp': [1, 2]}))
+    assert list(generator.reduce()) == [m2]
@@ -0,0 +1,61 @@
+from pymavlink.mavutil import mavlink
+
+from houston.ardu.copter.takeoff import Takeoff
+from houston.ardu.copter.goto import GoTo
+from houston.ardu.replay import mission_item_mapping, replay
+from houston.tlog import TlogWriter
+
+from . import helpers
+from .helpers import build_config, build_state
+
+
+def build_mission():
+    commands = [Takeoff(altitude=10.0),
+                GoTo(latitude=-35.3632, longitude=149.1652, altitude=10.0)]
+    return helpers.build_mission(
+        commands,
+        initial_state=build_state(armed=False),
+        config=build_config(time_per_metre_travelled=5.0))
+
+
+def test_mission_item_mapping():
+    mission = build_mission()
+    assert mission_item_mapping(mission.commands) == (3, {1: 0, 2: 1})
+
+
+def test_replay(tmpdir):
+    mission = build_mission()
+    mav = mavlink.MAVLink(None, srcSystem=1, srcComponent=1)
+
+    def position(alt):
+        return mavlink.MAVLink_global_position_int_message(
+            0, -353632607, 1491652351, 0, int(alt * 1000), 0, 0, 0, 0)
+
+    messages = [
+        mavlink.MAVLink_heartbeat_message(2, 3, 128, 3, 4, 3),
+        mavlink.MAVLink_rc_channels_message(0, 8, *([1500] * 18), 0),
+        mavlink.MAVLink_attitude_message(0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0),
+        mavlink.MAVLink_vfr_hud_message(0.0, 0.0, 0, 0, 0.0, 0.0),
+        position(0.0),
+        mavlink.MAVLink_mission_current_message(1),
+        position(5.0),
+        position(10.0),
+        mavlink.MAVLink_mission_current_message(2),
+        position(10.0),
+        mavlink.MAVLink_mission_item_reached_message(2),
+        position(10.0),
+    ]
+    fn = str(tmpdir.join('mission.tlog'))
+    with TlogWriter(fn) as writer:
+        for i, message in enumerate(messages):
+            message.pack(mav)
+            writer.write(message, timestamp=100.0 + i)
+
+    trace = replay(mission, fn)
+    assert trace.tlog == fn
+    assert [ct.command for ct in trace] == list(mission.commands)
+    takeoff, goto = trace.commands
+    assert [s['altitude'] for s in takeoff.states] == [5.0, 10.0, 10.0]
+    assert takeoff.states[0].time_offset == 6.0
+    assert len(goto.states) == 2
+    assert all(s['armed'] and s['mode'] == 'AUTO' for s in goto.states)
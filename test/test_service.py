@@ -0,0 +1,93 @@
+import threading
+import time
+
+import attr
+import pytest
+
+from houston.ardu.copter import Takeoff
+from houston.service import HoustonService, HoustonClient, serve, \
+    COMPLETED, CRASHED, CANCELLED
+
+from .helpers import build_mission
+
+
+class FakeService(HoustonService):
+    def __init__(self, **kwargs) -> None:
+        super().__init__(None, 'snapshot', num_workers=2, **kwargs)
+        self.gate = threading.Event()
+
+    def execute(self, mission, trace=False):
+        self.gate.wait(5.0)
+        if mission.commands[0]['altitude'] > 10.0:
+            raise ValueError('boom')
+        return {'outcome': {'passed': True}}
+
+
+def test_job():
+    service = FakeService()
+    service.start()
+    try:
+        mission = build_mission()
+        job = service.submit([mission, mission])
+        assert not job.done
+        service.gate.set()
+        results = list(job.stream(timeout=5.0))
+        assert sorted(r['index'] for r in results) == [0, 1]
+        assert all(r['status'] == COMPLETED for r in results)
+        assert job.to_dict()['done']
+        assert service.job(job.uid) is job
+    finally:
+        service.stop()
+
+    # missions that have not started when the job is cancelled are skipped
+    service = FakeService()
+    job = service.submit([build_mission()])
+    job.cancel()
+    service.start()
+    try:
+        results = list(job.stream(timeout=5.0))
+    finally:
+        service.stop()
+    assert results == [{'index': 0, 'status': CANCELLED}]
+
+
+def test_forget_finished_jobs():
+    service = FakeService(max_finished_jobs=1)
+    service.gate.set()
+    service.start()
+    try:
+        first = service.submit([build_mission()])
+        list(first.stream(timeout=5.0))
+        second = service.submit([build_mission(), build_mission()])
+        list(second.stream(timeout=5.0))
+
+        # the oldest finished job is forgotten once the second finishes
+        time_start = time.time()
+        while len(service.jobs()) > 1 and time.time() - time_start < 5.0:
+            time.sleep(0.01)
+        assert service.jobs() == [second]
+        with pytest.raises(KeyError):
+            service.job(first.uid)
+    finally:
+        service.stop()
+
+
+def test_http():
+    service = FakeService()
+    service.gate.set()
+    service.start()
+    server = serve(service, host='127.0.0.1', port=0)
+    try:
+        client = HoustonClient('http://127.0.0.1:{}'.format(server.port))
+        mission = build_mission()
+        crashing = attr.evolve(mission, commands=[Takeoff(altitude=20.0)])
+        uid = client.submit([mission, crashing])
+        results = sorted(client.results(uid), key=lambda r: r['index'])
+        assert results[0] == {'index': 0, 'status': COMPLETED,
+                              'outcome': {'passed': True}}
+        assert results[1]['status'] == CRASHED
+        assert results[1]['error'] == 'boom'
+        assert client.status(uid)['done']
+    finally:
+        server.stop()
+        service.stop()
@@ -0,0 +1,34 @@
+import pytest
+
+from houston.generator.shard import generate_sharded, read_shards
+
+from .helpers import build_generator
+
+
+def test_sharded(tmpdir):
+    one = str(tmpdir.join('one'))
+    two = str(tmpdir.join('two'))
+    files = generate_sharded(build_generator(), 3, 7, one, shard_size=3)
+    assert len(files) == 3
+    generate_sharded(build_generator(), 3, 7, two, shard_size=3, workers=2)
+
+    missions = list(read_shards(one))
+    assert len(missions) == 7
+    assert missions == list(read_shards(two))
+    assert missions[5] == build_generator().generate_mission_at(3, 5)
+    assert len(set(missions)) > 1
+
+
+def test_manifest(tmpdir):
+    directory = str(tmpdir.join('pool'))
+    generate_sharded(build_generator(), 3, 7, directory, shard_size=3)
+    generate_sharded(build_generator(), 3, 7, directory, shard_size=3)
+
+    # shards are not reused for a pool with different parameters
+    with pytest.raises(ValueError):
+        generate_sharded(build_generator(), 4, 7, directory, shard_size=3)
+    with pytest.raises(ValueError):
+        generate_sharded(build_generator(), 3, 7, directory, shard_size=2)
+    with pytest.raises(ValueError):
+        generate_sharded(build_generator(), 3, 8, directory, shard_size=3)
+    assert len(list(read_shards(directory))) == 7
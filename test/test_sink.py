@@ -0,0 +1,59 @@
+import os
+import shutil
+
+import pytest
+
+from houston.exceptions import OutcomeSinkError
+from houston.sink import OutcomeSink, read_outcomes
+from houston.trace import CommandTrace, MissionTrace
+
+from .helpers import build_mission, build_outcome, build_state
+
+
+def test_sink(tmpdir):
+    directory = str(tmpdir.join('outcomes'))
+    mission = build_mission()
+    outcome = build_outcome(mission)
+    trace = MissionTrace((CommandTrace(mission.commands[0],
+                                       (build_state(time_offset=1.0),)),))
+
+    with OutcomeSink(directory, records_per_file=2, max_pending=1) as sink:
+        for _ in range(3):
+            sink(mission, outcome)
+        sink.write(mission, None, trace=trace)
+    assert sink.num_written == 4
+    assert sorted(os.listdir(directory)) == ['outcomes-00000.jsonl',
+                                             'outcomes-00001.jsonl']
+
+    # a partially written record at the end of a file is skipped
+    with open(os.path.join(directory, 'outcomes-00001.jsonl'), 'a') as f:
+        f.write('{"mission": ')
+
+    records = list(read_outcomes(directory))
+    assert len(records) == 4
+    assert all(r.mission == mission for r in records)
+    assert records[0].outcome == outcome
+    assert records[3].outcome is None
+    assert records[3].trace.commands[0].states == trace.commands[0].states
+
+    # a new sink for the same directory continues after the existing files
+    with OutcomeSink(directory) as sink:
+        sink(mission, outcome)
+    assert 'outcomes-00002.jsonl' in os.listdir(directory)
+    assert len(list(read_outcomes(directory))) == 5
+
+
+def test_write_error(tmpdir):
+    directory = str(tmpdir.join('outcomes'))
+    mission = build_mission()
+    outcome = build_outcome(mission)
+    sink = OutcomeSink(directory, max_pending=1)
+    shutil.rmtree(directory)
+
+    # writes fail, rather than block, once the writer thread has failed
+    with pytest.raises(OutcomeSinkError):
+        for _ in range(10):
+            sink(mission, outcome)
+    with pytest.raises(OutcomeSinkError):
+        sink.close()
+    assert sink.num_written == 0
@@ -0,0 +1,103 @@
+import attr
+
+from houston.ardu.copter import ArduCopter
+from houston.ardu.copter.goto import GoTo
+from houston.ardu.copter.takeoff import Takeoff, TakeoffNormally
+from houston.timeouts import TimeoutModel, TimeoutSample, \
+    extract_features, samples_from_trace, set_timeout_model, \
+    MIN_LEARNED_TIMEOUT_FRACTION
+from houston.trace import CommandTrace, MissionTrace
+
+from .helpers import build_mission, build_state
+
+
+def test_samples_from_trace():
+    mission = build_mission()
+    cmd = mission.commands[0]
+    states = (build_state(altitude=5.0, time_offset=10.0),
+              build_state(altitude=10.0, time_offset=15.0),
+              build_state(altitude=10.0, time_offset=20.0))
+    trace = MissionTrace((CommandTrace(cmd, states),))
+    samples = samples_from_trace(mission, trace)
+    assert len(samples) == 1
+    assert samples[0].command == 'ardu:copter:takeoff'
+    assert samples[0].spec == 'normal'
+    assert samples[0].duration == 5.0
+    assert samples[0].features[2] == 10.0  # climb
+
+
+def test_factory_command():
+    mission = build_mission()
+    waypoint = ArduCopter.commands['MAV_CMD_NAV_WAYPOINT']
+    cmd = waypoint(delay=0.0, lat=-35.3632607, lon=149.1653351, alt=10.0)
+    mission = attr.evolve(mission, commands=[cmd])
+
+    # factory parameters are matched to the state variables they measure
+    features = extract_features(cmd, mission.initial_state,
+                                mission.configuration)
+    assert 9.0 < features[1] < 10.0  # distance
+    assert features[2] == 10.0  # climb
+
+    # the Idle specification is satisfied by the start state and so the
+    # time taken by the command is not measured
+    states = (build_state(altitude=5.0, time_offset=5.0),
+              build_state(altitude=10.0, time_offset=10.0))
+    trace = MissionTrace((CommandTrace(cmd, states),))
+    assert samples_from_trace(mission, trace) == []
+
+
+def test_fit():
+    # takeoff takes 2 seconds per metre, plus up to 4 seconds of noise
+    samples = [TimeoutSample('ardu:copter:takeoff', 'normal',
+                             (1.0, 0.0, climb, 0.0, 0.0),
+                             2.0 * climb + (i % 5))
+               for i, climb in enumerate(range(1, 51))]
+    model = TimeoutModel.fit(samples, quantile=1.0, margin=1.5)
+    model = TimeoutModel.from_dict(model.to_dict())
+    mission = build_mission()
+    config = mission.configuration
+    state = build_state()
+
+    timeout = model.predict(Takeoff(altitude=20.0), TakeoffNormally, state,
+                            config)
+    assert 1.5 * 44.0 <= timeout <= 1.5 * 46.0
+
+    # no fit for the given command
+    goto = GoTo(latitude=-35.3632607, longitude=149.1652351, altitude=10.0)
+    assert model.predict(goto, TakeoffNormally, state, config) is None
+
+    # the model is used by specifications
+    cmd = Takeoff(altitude=20.0)
+    env = mission.environment
+    default = TakeoffNormally.timeout(cmd, state, env, config)
+    set_timeout_model(model)
+    try:
+        assert TakeoffNormally.timeout(cmd, state, env, config) == timeout
+    finally:
+        set_timeout_model(None)
+    assert TakeoffNormally.timeout(cmd, state, env, config) == default
+
+
+def test_floor():
+    # the model predicts that takeoff is instantaneous
+    samples = [TimeoutSample('ardu:copter:takeoff', 'normal',
+                             (1.0, 0.0, float(climb), 0.0, 0.0), 0.0)
+               for climb in range(1, 11)]
+    model = TimeoutModel.fit(samples)
+    mission = build_mission()
+    cmd = Takeoff(altitude=20.0)
+    state = build_state()
+    env = mission.environment
+    config = mission.configuration
+    assert model.predict(cmd, TakeoffNormally, state, config) == 0.0
+
+    # specifications never use less than a fraction of the hand-written
+    # timeout
+    default = TakeoffNormally.timeout(cmd, state, env, config)
+    set_timeout_model(model)
+    try:
+        timeout = TakeoffNormally.timeout(cmd, state, env, config)
+        assert timeout == MIN_LEARNED_TIMEOUT_FRACTION * default
+        assert cmd.timeout(state, env, config) == timeout
+    finally:
+        set_timeout_model(None)
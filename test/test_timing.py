@@ -0,0 +1,37 @@
+import time
+
+from houston.timing import Span, Timeline, TimingStats
+from houston.trace import MissionTrace
+
+
+def test_timeline():
+    timeline = Timeline()
+    with timeline.span('connect'):
+        time.sleep(0.01)
+    try:
+        with timeline.span('command', 'ardu:copter:takeoff'):
+            raise ValueError
+    except ValueError:
+        pass
+    timeline.record('command', 0.0, 2.0)
+
+    spans = timeline.spans
+    assert [s.name for s in spans] == ['connect', 'command', 'command']
+    assert spans[0].duration >= 0.01
+    assert spans[1].label == 'ardu:copter:takeoff'
+    assert spans[0].start <= spans[1].start
+    totals = timeline.totals()
+    assert totals['command'] >= 2.0
+
+    trace = MissionTrace((), timings=spans)
+    assert MissionTrace.from_dict(trace.to_dict(), None).timings == spans
+
+
+def test_stats():
+    stats = TimingStats()
+    stats.add([Span('command', 0.0, 1.0), Span('command', 1.0, 3.0)])
+    stats.add([Span('provision', 0.0, 5.0)])
+    d = stats.to_dict()
+    assert d['command'] == {'count': 2, 'total': 4.0, 'mean': 2.0,
+                            'max': 3.0}
+    assert d['provision']['count'] == 1
@@ -0,0 +1,27 @@
+from pymavlink.mavutil import mavlink
+
+from houston.tlog import TlogWriter, read_tlog
+
+
+def test_round_trip(tmpdir):
+    mav = mavlink.MAVLink(None, srcSystem=1, srcComponent=1)
+    messages = [
+        mavlink.MAVLink_heartbeat_message(2, 3, 0, 4, 4, 3),
+        mavlink.MAVLink_attitude_message(100, 0.1, 0.2, 0.3, 0.0, 0.0, 0.0),
+        mavlink.MAVLink_heartbeat_message(2, 3, 128, 3, 4, 3),
+    ]
+    for message in messages:
+        message.pack(mav)
+
+    fn = str(tmpdir.join('capture.tlog'))
+    with TlogWriter(fn) as writer:
+        for i, message in enumerate(messages):
+            writer.write(message, timestamp=1000.0 + i)
+    assert writer.num_messages == 3
+
+    read = list(read_tlog(fn))
+    assert [m.get_type() for (_, m) in read] == \
+        ['HEARTBEAT', 'ATTITUDE', 'HEARTBEAT']
+    assert [t for (t, _) in read] == [1000.0, 1001.0, 1002.0]
+    assert abs(read[1][1].roll - 0.1) < 1e-6
+    assert read[2][1].base_mode == 128
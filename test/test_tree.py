@@ -0,0 +1,130 @@
+from typing import Set
+import json
+
+from houston.ardu.copter import ArduCopter
+from houston.generator.journal import CampaignJournal
+from houston.generator.resources import ResourceLimits
+from houston.generator.tree import PathTrie, TreeBasedMissionGenerator
+from houston.mission import Mission, MissionOutcome
+
+from .helpers import build_mission, build_outcome
+
+TAKEOFF = 'factory.MAV_CMD_NAV_TAKEOFF'
+LAND = 'factory.MAV_CMD_NAV_LAND'
+
+
+def key(commands):
+    # commands of different types cannot be compared, so missions are
+    # compared by the serialised form of their commands
+    return json.dumps([c.to_dict() for c in commands], sort_keys=True)
+
+
+def build_generator(max_num_commands, threads=2):
+    mission = build_mission()
+    return TreeBasedMissionGenerator(ArduCopter,
+                                     mission.initial_state,
+                                     mission.environment,
+                                     mission.configuration,
+                                     threads=threads,
+                                     max_num_commands=max_num_commands)
+
+
+def test_path_trie():
+    a = ('a', 'normal')
+    b = ('b', 'normal')
+    c = ('c', 'idle')
+    trie = PathTrie()
+    assert not trie.is_pruned((a, b))
+
+    trie.prune((a, b))
+    assert trie.is_pruned((a, b))
+    assert trie.is_pruned((a, b, c))
+    assert not trie.is_pruned((a,))
+    assert not trie.is_pruned((a, c))
+    assert not trie.is_pruned((b, a, b))
+
+    # pruning a prefix subsumes its extensions
+    trie.prune((a,))
+    assert trie.is_pruned((a, c))
+    trie.prune((a, b, c))
+    assert trie.is_pruned((a,))
+
+    trie.prune(())
+    assert trie.is_pruned((b,))
+
+
+def test_generate_and_run(monkeypatch):
+    # missions that end with a landing fail
+    def run(mission, bz, snapshot):
+        outcome = build_outcome(mission)
+        passed = mission.commands[-1].uid != LAND
+        return MissionOutcome(passed, outcome.outcomes, outcome.time_total)
+
+    monkeypatch.setattr(Mission, 'run', run)
+
+    # the search stops once the tree is exhausted
+    generator = build_generator(max_num_commands=2)
+    report = generator.generate_and_run(
+        0, ResourceLimits(num_missions=100), None, 'snapshot')
+    history = report.history
+    assert [c.uid for c in history[0].commands] == [TAKEOFF]
+    assert len(history) == 1 + len(history[0].commands[0].__class__
+                                   .get_next_allowed(ArduCopter))
+    assert all(m.size == 2 for m in history[1:])
+    assert generator.frontier_size == 0
+
+    # failing missions are never expanded
+    generator = build_generator(max_num_commands=3)
+    report = generator.generate_and_run(
+        0, ResourceLimits(num_missions=60), None, 'snapshot')
+    history = report.history
+    assert len(history) == 60
+    assert len(set(history)) == 60
+    # outcomes are reported out of order by the two workers, so missions
+    # need not be executed in order of size, but each mission extends a
+    # passing mission that was executed before it
+    failed = set(key(m.commands) for m in generator.failures)
+    executed = set()  # type: Set[str]
+    for mission in history:
+        if mission.size > 1:
+            parent = key(mission.commands[:-1])
+            assert parent in executed
+            assert parent not in failed
+        executed.add(key(mission.commands))
+    assert not any(m.size == 3 and m.commands[1].uid == LAND
+                   for m in history)
+    assert generator.failures
+
+
+def test_resume(tmpdir, monkeypatch):
+    fn = str(tmpdir.join('journal.jsonl'))
+    limits = ResourceLimits(num_missions=12)
+    executed = []
+    interrupt = [True]
+
+    # the first campaign is interrupted while running its fifth mission, and
+    # missions that end with a landing fail
+    def run(mission, bz, snapshot):
+        if interrupt[0] and len(executed) == 4:
+            raise SystemExit
+        executed.append(mission)
+        outcome = build_outcome(mission)
+        passed = mission.commands[-1].uid != LAND
+        return MissionOutcome(passed, outcome.outcomes, outcome.time_total)
+
+    monkeypatch.setattr(Mission, 'run', run)
+    build_generator(3, threads=1).generate_and_run(
+        0, limits, None, 'snapshot', journal=CampaignJournal(fn, ArduCopter))
+    assert len(executed) == 4
+
+    # the search continues from its journal, rather than starting again
+    executed.clear()
+    interrupt[0] = False
+    generator = build_generator(3, threads=1)
+    report = generator.generate_and_run(
+        0, limits, None, 'snapshot', journal=CampaignJournal(fn, ArduCopter))
+    history = report.history
+    assert len(history) == 12
+    assert all(m.size > 1 for m in executed)
+    keys = [(key(m.commands[:-1]), m.commands[-1].uid) for m in history]
+    assert len(set(keys)) == len(keys)
@@ -0,0 +1,50 @@
+import pytest
+
+from houston.ardu.copter.takeoff import Takeoff, TakeoffNormally
+from houston.environment import Environment
+from houston.exceptions import UnsupportedExpression
+from houston.specification import Expression
+from houston.vectorized import StateTable, first_satisfied
+
+from .helpers import build_config, build_state
+
+
+def test_satisfied_mask():
+    config = build_config()
+    env = Environment({})
+    cmd = Takeoff(altitude=10.0)
+    before = build_state()
+    states = [build_state(altitude=5.0, vz=-1.0, time_offset=1.0),
+              build_state(altitude=9.4, time_offset=2.0),
+              build_state(altitude=10.0, latitude=-35.37, time_offset=3.0),
+              build_state(altitude=10.05, time_offset=4.0),
+              build_state(altitude=7.0, vz=1.0, time_offset=5.0)]
+    table = StateTable.from_states(states)
+    assert len(table) == 5
+    assert list(table.time_offsets) == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+    # agrees with Z3, including noise
+    postcondition = TakeoffNormally.postcondition
+    mask = postcondition.satisfied_mask(cmd, before, table)
+    expected = [postcondition.is_satisfied(cmd, before, s, env, config)
+                for s in states]
+    assert list(mask) == expected == [False, False, False, True, False]
+    assert first_satisfied(mask) == 3
+    assert first_satisfied(mask[:3]) is None
+
+
+def test_arithmetic():
+    cmd = Takeoff(altitude=10.0)
+    before = build_state(altitude=2.0)
+    table = StateTable.from_states([build_state(altitude=a)
+                                    for a in (4.0, 6.0, 9.0)])
+    expr = Expression("(and (> (* 2 __altitude) $altitude) "
+                      "(not (= __mode \"AUTO\")) "
+                      "(< (- __altitude _altitude) 5))")
+    mask = expr.satisfied_mask(cmd, before, table)
+    assert list(mask) == [False, True, False]
+
+    with pytest.raises(UnsupportedExpression):
+        Expression("(= __unknown 1)").satisfied_mask(cmd, before, table)
+    with pytest.raises(UnsupportedExpression):
+        Expression("(foo __altitude 1)").satisfied_mask(cmd, before, table)
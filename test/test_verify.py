@@ -0,0 +1,29 @@
+from houston.trace import CommandTrace, MissionTrace
+from houston.verify import check_trace, summarise
+
+from .helpers import build_mission, build_state
+
+
+def test_check_trace():
+    mission = build_mission()
+    cmd = mission.commands[0]
+    states = (build_state(altitude=5.0, vz=-1.0, time_offset=10.0),
+              build_state(altitude=10.0, time_offset=15.0),
+              build_state(altitude=7.0, vz=1.0, time_offset=40.0))
+
+    # the last state does not satisfy the postcondition
+    checks = check_trace(mission, MissionTrace((CommandTrace(cmd, states),)))
+    assert len(checks) == 1
+    assert checks[0].spec == 'normal'
+    assert not checks[0].passed
+    assert checks[0].duration == 30.0
+
+    # an intermediate state satisfies it within the timeout
+    trace = MissionTrace((CommandTrace(cmd, states),))
+    checks = check_trace(mission, trace, intermediate=True)
+    assert checks[0].passed
+
+    summary = summarise(checks + check_trace(mission, trace))
+    report = summary[('ardu:copter:takeoff', 'normal')]
+    assert report.num_checked == 2
+    assert report.num_violations == 1